@@ -1,9 +1,27 @@
+import importlib
 import streamlit as st
-from creator import run_schema_creator
-from viewer import run_table_viewer
-from sql_generator import run_sql_generator
-from data_importer import run_data_importer
-from home import run_home_page
+from tracing import start_metrics_server
+
+# Page label -> (module, entry point, subheader, description, spinner text). A page's module is
+# imported only when the page is first opened, so the Home page never loads the generator,
+# importer or export dependencies
+PAGES = {
+    "🏠 Home": ("home", "run_home_page", None, None, None),
+    "📐 Schema Creator": ("creator", "run_schema_creator", "📐 Schema Creator",
+                         "Define new tables or upload existing schema files for your database.", "Loading schema tools..."),
+    "📥 Data Importer": ("data_importer", "run_data_importer", None, None, "Loading import tools..."),
+    "📊 Table Viewer": ("viewer", "run_table_viewer", "📊 Table Viewer",
+                       "Explore the contents of your tables easily and understand your data.", "Fetching table data..."),
+    "📝 SQL Query Generator": ("sql_generator", "run_sql_generator", "📝 SQL Query Generator",
+                              "Type a question in plain English and get the corresponding SQL query.", "Activating AI..."),
+    "📚 Batch Questions": ("batch", "run_batch_page", None, None, None),
+    "📈 Metrics": ("metrics", "run_metrics_page", None, None, None),
+}
+
+# Function to import a page's module on first use and return its entry point
+def load_page(page):
+    module_name, function_name = PAGES[page][:2]
+    return getattr(importlib.import_module(module_name), function_name)
 
 # Page Configuration
 st.set_page_config(
@@ -13,6 +31,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Prometheus endpoint (once per process; only when T2SQL_METRICS_PORT is set)
+start_metrics_server()
+
 # Custom Title and Header
 st.markdown("""
     <style>
@@ -96,63 +117,22 @@ st.sidebar.markdown("""
 """, unsafe_allow_html=True)
 
 # Improved radio buttons
-page = st.sidebar.radio(
-    "Select a Tool", 
-    [
-        "🏠 Home",
-        "📐 Schema Creator",
-        "📥 Data Importer",
-        "📊 Table Viewer",
-        "📝 SQL Query Generator"
-    ],
-    index=0
-)
+page = st.sidebar.radio("Select a Tool", list(PAGES), index=0)
 
 # Main Page Rendering with titles hidden when not in home page
-if page == "🏠 Home":
-    run_home_page()
-    
-elif page == "📐 Schema Creator":
-    st.markdown("<div class='main-title'>🧠 Text-to-SQL Toolkit</div>", unsafe_allow_html=True)
-    st.markdown("<div class='subtitle'>Create schemas, view data, and generate SQL using plain English</div>", unsafe_allow_html=True)
-    st.markdown("<hr style='border-top: 1px solid #bbb; margin-bottom: 2rem;'>", unsafe_allow_html=True)
-    
-    st.subheader("📐 Schema Creator")
-    st.write("Define new tables or upload existing schema files for your database.")
-    
-    # Progress animation
-    with st.spinner("Loading schema tools..."):
-        run_schema_creator()
-
-elif page == "📥 Data Importer":
+_, _, subheader, description, spinner = PAGES[page]
+if page != "🏠 Home":
     st.markdown("<div class='main-title'>🧠 Text-to-SQL Toolkit</div>", unsafe_allow_html=True)
     st.markdown("<div class='subtitle'>Create schemas, view data, and generate SQL using plain English</div>", unsafe_allow_html=True)
     st.markdown("<hr style='border-top: 1px solid #bbb; margin-bottom: 2rem;'>", unsafe_allow_html=True)
-    
-   
-    
-    with st.spinner("Loading import tools..."):
-        run_data_importer()
 
-elif page == "📊 Table Viewer":
-    st.markdown("<div class='main-title'>🧠 Text-to-SQL Toolkit</div>", unsafe_allow_html=True)
-    st.markdown("<div class='subtitle'>Create schemas, view data, and generate SQL using plain English</div>", unsafe_allow_html=True)
-    st.markdown("<hr style='border-top: 1px solid #bbb; margin-bottom: 2rem;'>", unsafe_allow_html=True)
-    
-    st.subheader("📊 Table Viewer")
-    st.write("Explore the contents of your tables easily and understand your data.")
-    
-    with st.spinner("Fetching table data..."):
-        run_table_viewer()
-
-elif page == "📝 SQL Query Generator":
-    st.markdown("<div class='main-title'>🧠 Text-to-SQL Toolkit</div>", unsafe_allow_html=True)
-    st.markdown("<div class='subtitle'>Create schemas, view data, and generate SQL using plain English</div>", unsafe_allow_html=True)
-    st.markdown("<hr style='border-top: 1px solid #bbb; margin-bottom: 2rem;'>", unsafe_allow_html=True)
-    
-    st.subheader("📝 SQL Query Generator")
-    st.write("Type a question in plain English and get the corresponding SQL query.")
-    
-    with st.spinner("Activating AI..."):
-        run_sql_generator()
+if subheader:
+    st.subheader(subheader)
+    st.write(description)
 
+if spinner:
+    # Progress animation; also covers the page's first import
+    with st.spinner(spinner):
+        load_page(page)()
+else:
+    load_page(page)()
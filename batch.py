@@ -0,0 +1,229 @@
+import csv
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import streamlit as st
+import pandas as pd
+from db import DB_PATH
+from llm_client import get_llm_client, LLMError, TokenBucket, RateLimitedClient
+from generation import generate_sql
+from query_results import QUERY_TIMEOUT, QueryBudget
+from result_cache import cached_fetch
+
+# Columns written for every question
+BATCH_FIELDS = [
+    "id", "question", "sql", "from_cache", "row_count", "truncated",
+    "generation_ms", "execution_ms", "total_ms", "error",
+]
+
+# Defaults matched to a modest API quota
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_EXECUTION_WORKERS = 4
+
+
+# Function to read questions from a CSV (needs a "question" column) or JSONL file
+def load_questions(path):
+    questions = []
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    questions.append(item if isinstance(item, dict) else {"question": str(item)})
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            questions = list(csv.DictReader(f))
+
+    rows = []
+    for index, item in enumerate(questions, start=1):
+        question = (item.get("question") or "").strip()
+        if question:
+            rows.append({"id": item.get("id") or index, "question": question})
+    return rows
+
+
+class BatchResultWriter:
+    """Appends one record per question to a CSV or JSONL file, flushing as it goes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.jsonl = path.lower().endswith((".jsonl", ".ndjson"))
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=BATCH_FIELDS)
+            self._csv.writeheader()
+
+    def write(self, record):
+        if self.jsonl:
+            self._file.write(json.dumps(record) + "\n")
+        else:
+            self._csv.writerow(record)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _generate(item, db_path, client, use_cache):
+    record = dict.fromkeys(BATCH_FIELDS)
+    record.update(id=item["id"], question=item["question"])
+    start = time.perf_counter()
+    try:
+        record["sql"], record["from_cache"], error = generate_sql(item["question"], db_path, use_cache=use_cache,
+                                                                  client=client)
+        # generate_sql returns its last attempt even when the repair failed
+        if error:
+            record["error"] = f"Invalid SQL: {error}"
+    except LLMError as e:
+        record["error"] = str(e)
+    except Exception as e:
+        # One bad question must not abort the batch
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["generation_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return record
+
+
+def _execute(record, db_path, timeout):
+    start = time.perf_counter()
+    try:
+        result = cached_fetch(record["sql"], db_path, budget=QueryBudget(timeout=timeout))
+        # row_count stops at the result limit; truncated says so ("Result truncated at 10,000 rows")
+        record["row_count"] = len(result.rows)
+        record["truncated"] = result.notice()
+    except Exception as e:
+        record["error"] = str(e) if isinstance(e, sqlite3.Error) else f"{type(e).__name__}: {e}"
+    record["execution_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    return record
+
+
+# Function to run many questions through generation and execution with bounded concurrency
+def run_batch(questions, output_path, db_path=DB_PATH, concurrency=DEFAULT_CONCURRENCY,
+              requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, execution_workers=DEFAULT_EXECUTION_WORKERS,
+              use_cache=True, timeout=QUERY_TIMEOUT, progress=None):
+    """Answer every question and stream one result row each to output_path.
+
+    Generation runs on `concurrency` threads and model calls are throttled by a
+    token bucket (cache hits do not spend tokens). Generated SQL runs on a
+    separate pool of read-only connections, each stopped after `timeout` seconds
+    (0 for no limit). Returns a summary dict.
+    """
+    client = RateLimitedClient(get_llm_client(), TokenBucket(requests_per_minute / 60.0))
+    total = len(questions)
+    started = time.perf_counter()
+    latencies = []
+    summary = {"questions": total, "succeeded": 0, "failed": 0, "truncated": 0, "cache_hits": 0}
+
+    with BatchResultWriter(output_path) as writer, \
+            ThreadPoolExecutor(concurrency, thread_name_prefix="batch-generate") as generate_pool, \
+            ThreadPoolExecutor(execution_workers, thread_name_prefix="batch-execute") as execute_pool:
+        queue = iter(questions)
+        pending = {}
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                pending[generate_pool.submit(_generate, item, db_path, client, use_cache)] = "generate"
+
+        # Keep a bounded window of questions in flight
+        for _ in range(concurrency * 2):
+            submit_next()
+
+        done_count = 0
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = pending.pop(future)
+                record = future.result()
+                if stage == "generate" and not record["error"]:
+                    pending[execute_pool.submit(_execute, record, db_path, timeout)] = "execute"
+                    submit_next()
+                    continue
+                if stage == "generate":
+                    submit_next()
+
+                record["total_ms"] = round((record["generation_ms"] or 0) + (record["execution_ms"] or 0), 2)
+                writer.write(record)
+                latencies.append(record["total_ms"])
+                summary["failed" if record["error"] else "succeeded"] += 1
+                summary["truncated"] += 1 if record["truncated"] else 0
+                summary["cache_hits"] += 1 if record["from_cache"] else 0
+                done_count += 1
+                if progress:
+                    progress(done_count, total)
+
+    elapsed = time.perf_counter() - started
+    summary["elapsed_s"] = round(elapsed, 2)
+    summary["questions_per_s"] = round(total / elapsed, 2) if elapsed else 0.0
+    if latencies:
+        summary["p50_ms"] = round(statistics.median(latencies), 2)
+        summary["p95_ms"] = round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 2)
+    return summary
+
+
+def run_batch_page():
+    st.title("📚 Batch Questions")
+    st.write("Run a CSV or JSONL file of questions through the SQL generator and download the results.")
+
+    uploaded_file = st.file_uploader("Questions file (CSV with a 'question' column, or JSONL)", type=["csv", "jsonl"])
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        concurrency = st.slider("Parallel generations", 1, 32, DEFAULT_CONCURRENCY)
+    with col2:
+        requests_per_minute = st.number_input("API requests per minute", min_value=1, value=DEFAULT_REQUESTS_PER_MINUTE)
+    with col3:
+        output_format = st.selectbox("Output format", ["csv", "jsonl"])
+    use_cache = st.checkbox("Use response cache", value=True)
+    timeout = st.number_input("Time limit per query (s)", min_value=0.0, value=QUERY_TIMEOUT, step=5.0,
+                              help="Queries running longer are stopped and recorded as failed; 0 means no limit")
+
+    if uploaded_file is None:
+        st.info("📁 Upload a questions file to start.")
+        return
+
+    suffix = os.path.splitext(uploaded_file.name)[1]
+    with tempfile.NamedTemporaryFile("wb", suffix=suffix, delete=False) as f:
+        f.write(uploaded_file.getvalue())
+        questions_path = f.name
+    questions = load_questions(questions_path)
+    os.unlink(questions_path)
+    st.write(f"Found **{len(questions)}** questions.")
+
+    if st.button("🚀 Run Batch") and questions:
+        output_path = os.path.join(tempfile.gettempdir(), f"batch_results_{int(time.time())}.{output_format}")
+        progress_bar = st.progress(0.0, text="Starting...")
+
+        def progress(done, total):
+            progress_bar.progress(done / total, text=f"{done} / {total} questions answered")
+
+        summary = run_batch(
+            questions, output_path,
+            concurrency=concurrency,
+            requests_per_minute=int(requests_per_minute),
+            use_cache=use_cache,
+            timeout=float(timeout),
+            progress=progress,
+        )
+        st.success(f"✅ Answered {summary['questions']} questions in {summary['elapsed_s']} s")
+        st.json(summary)
+
+        if output_format == "csv":
+            st.dataframe(pd.read_csv(output_path).head(100))
+        with open(output_path, "rb") as f:
+            st.download_button(
+                label="📥 Download results",
+                data=f,
+                file_name=f"batch_results.{output_format}",
+                mime="text/csv" if output_format == "csv" else "application/x-ndjson",
+            )
@@ -0,0 +1,333 @@
+"""Benchmarks for the hot paths of the toolkit, reported as JSON.
+
+    python benchmark.py --tables 20 --columns 12 --rows 50000 --output bench.json
+    python benchmark.py --only viewer_fetch import_throughput --compare bench.json
+    python benchmark.py --import-profile app2 sql_generator
+
+Synthetic data is generated once (see synthetic_data.py) and each benchmark
+runs in its own interpreter, so peak RSS and warm caches belong to that
+benchmark alone. Times are wall-clock milliseconds over --repeat runs after
+one warm-up run.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from synthetic_data import make_csv, make_database, make_xlsx
+
+# Question used for prompt building and generation round trips
+QUESTION = "What is the total amount per category in table_0?"
+
+# Sheets in the generated workbook, so the parallel sheet parsing is exercised
+XLSX_SHEETS = 2
+
+# Modules listed by --import-profile
+IMPORT_PROFILE_TOP = 15
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Register a benchmark: a function taking the context dict and returning (step, items_per_step)"""
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+@benchmark("schema_extraction")
+def _schema_extraction(ctx):
+    from schema_catalog import SchemaCatalog
+    # A fresh catalog each time: the full read that a schema change triggers, not the cached path
+    return lambda: SchemaCatalog(ctx["db"]).schema(), ctx["tables"]
+
+
+@benchmark("prompt_building")
+def _prompt_building(ctx):
+    from schema_catalog import get_catalog, format_schema_for_prompt
+    from schema_index import prune_schema_for_question
+    from generation import BASE_PROMPT, build_prompt
+    schema = get_catalog(ctx["db"]).schema()
+
+    def step():
+        build_prompt(format_schema_for_prompt(schema), QUESTION, BASE_PROMPT)
+        prune_schema_for_question(QUESTION, ctx["db"])
+    return step, ctx["tables"]
+
+
+@benchmark("import_throughput")
+def _import_throughput(ctx):
+    from importer import import_chunks, read_csv_chunks
+    from type_inference import infer_column_types, normalize_chunk, sample_csv
+    with open(ctx["csv"], "rb") as f:
+        inferred = infer_column_types(sample_csv(f))
+    col_types = {column: info["type"] for column, info in inferred.items()}
+    formats = {column: info["format"] for column, info in inferred.items()}
+    import_db = os.path.join(ctx["workdir"], "import.db")
+
+    def step():
+        with open(ctx["csv"], "rb") as f:
+            import_chunks(read_csv_chunks(f), "bench_import", col_types, import_db,
+                          transform=lambda chunk: normalize_chunk(chunk, col_types, formats))
+    return step, ctx["csv_rows"]
+
+
+@benchmark("xlsx_import_throughput")
+def _xlsx_import_throughput(ctx):
+    from importer import import_workbook
+    from excel_reader import preview_workbook
+    from type_inference import infer_column_types
+    plans = {}
+    for sheet, preview in preview_workbook(ctx["xlsx"], 1000).items():
+        inferred = infer_column_types(preview)
+        plans[sheet] = {
+            "table": f"bench_{sheet}".replace(" ", "_"),
+            "col_types": {column: info["type"] for column, info in inferred.items()},
+            "formats": {column: info["format"] for column, info in inferred.items()},
+        }
+    import_db = os.path.join(ctx["workdir"], "import.db")
+    return lambda: import_workbook(ctx["xlsx"], plans, import_db), ctx["xlsx_rows"] * len(plans)
+
+
+@benchmark("viewer_fetch")
+def _viewer_fetch(ctx):
+    from viewer import fetch_page
+    pages = 10
+
+    def step():
+        # The first page, then nine more by following the keyset cursor
+        cursor = None
+        for _ in range(pages):
+            _, cursor = fetch_page("table_0", 100, cursor=cursor, db_path=ctx["db"])
+    return step, pages * 100
+
+
+@benchmark("generation_round_trip")
+def _generation_round_trip(ctx):
+    from llm_client import GeminiClient
+    from mock_gemini_server import start_mock_server
+    from generation import generate_sql
+    server, base_url = start_mock_server(latency=ctx["llm_latency"], chunk_delay=0,
+                                         sql='SELECT "category", SUM("amount") FROM "table_0" GROUP BY "category"')
+    client = GeminiClient(api_key="benchmark", base_url=base_url)
+    # Cache off: prune, prompt, HTTP round trip, validation
+    return lambda: generate_sql(QUESTION, ctx["db"], use_cache=False, client=client), 1
+
+
+@benchmark("result_rendering")
+def _result_rendering(ctx):
+    import pandas as pd
+    import pyarrow as pa
+    from query_results import fetch_bounded
+    rows = min(ctx["rows"], 10000)
+
+    def step():
+        # What the generator does with a result: fetch it, build the DataFrame and
+        # serialize it to Arrow IPC, which is how st.dataframe ships it to the browser
+        result = fetch_bounded(f"SELECT * FROM table_0 LIMIT {rows}", ctx["db"])
+        table = pa.Table.from_pandas(pd.DataFrame(result.rows, columns=result.columns))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    return step, rows
+
+
+@benchmark("cold_start")
+def _cold_start(ctx):
+    # A fresh interpreter importing app2 renders the Home page in bare mode: every import and
+    # the first script run a new server process pays for. The work directory is the cwd, so
+    # dynamic.db there is an empty database rather than the user's
+    command = [sys.executable, "-c", f"import sys; sys.path.insert(0, {REPO_DIR!r}); import app2"]
+    return lambda: subprocess.run(command, cwd=ctx["workdir"], capture_output=True, check=True), 1
+
+
+# Function to run `python -X importtime -c "import <module>"` and parse its report
+def import_profile(module):
+    """Return (cumulative_ms, {direct import: cumulative_ms}) for a fresh import of module.
+
+    Runs in an empty directory so importing a page module never touches dynamic.db.
+    """
+    with tempfile.TemporaryDirectory() as cwd:
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                                    f"import sys; sys.path.insert(0, {REPO_DIR!r}); import {module}"],
+                                   capture_output=True, text=True, cwd=cwd, check=True)
+    # Children are reported before their parent, one indentation level (two spaces) deeper
+    children = {}
+    for line in completed.stderr.splitlines():
+        fields = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        cumulative = int(fields[1]) / 1000
+        if not name.startswith("  "):
+            if name.strip() == module:
+                return cumulative, children
+            children = {}
+        elif not name.startswith("    "):
+            children[name.strip()] = cumulative
+    return 0.0, {}
+
+
+def _print_import_profile(modules):
+    for module in modules:
+        total, direct = import_profile(module)
+        print(f"{module}: {total:,.1f} ms", file=sys.stderr)
+        for name, cumulative in sorted(direct.items(), key=lambda item: -item[1])[:IMPORT_PROFILE_TOP]:
+            print(f"  {cumulative:>9,.1f} ms  {name}", file=sys.stderr)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+# Function to time one benchmark in this process
+def run_benchmark(name, ctx, repeat):
+    step, items = BENCHMARKS[name](ctx)
+    step()  # warm-up: imports, page cache, connection pools
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        step()
+        samples.append((time.perf_counter() - start) * 1000)
+    median = statistics.median(samples)
+    return {
+        "runs": repeat,
+        "median_ms": round(median, 3),
+        "p95_ms": round(percentile(samples, 0.95), 3),
+        "min_ms": round(min(samples), 3),
+        "items_per_run": items,
+        "items_per_second": round(items / (median / 1000), 1) if median else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+# Function to generate (or reuse) the benchmark data in workdir
+def prepare_data(workdir, tables, columns, rows, csv_mb, xlsx_rows, seed):
+    ctx = {"workdir": workdir, "tables": tables, "columns": columns, "rows": rows, "xlsx_rows": xlsx_rows,
+           "db": os.path.join(workdir, "bench.db"), "csv": os.path.join(workdir, "bench.csv"),
+           "xlsx": os.path.join(workdir, "bench.xlsx")}
+    marker = os.path.join(workdir, "params.json")
+    params = {"tables": tables, "columns": columns, "rows": rows, "csv_mb": csv_mb, "xlsx_rows": xlsx_rows, "seed": seed}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            saved = json.load(f)
+        if saved["params"] == params:
+            ctx["csv_rows"] = saved["csv_rows"]
+            return ctx
+    make_database(ctx["db"], tables, columns, rows, seed)
+    ctx["csv_rows"] = make_csv(ctx["csv"], csv_mb, columns, seed)
+    make_xlsx(ctx["xlsx"], xlsx_rows, columns, XLSX_SHEETS, seed)
+    with open(marker, "w") as f:
+        json.dump({"params": params, "csv_rows": ctx["csv_rows"]}, f)
+    return ctx
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _print_comparison(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)["benchmarks"]
+    print(f"{'benchmark':<24}{'baseline ms':>14}{'now ms':>12}{'change':>10}", file=sys.stderr)
+    for name, result in report["benchmarks"].items():
+        before = baseline.get(name, {}).get("median_ms")
+        if before:
+            change = f"{result['median_ms'] / before - 1:+.1%}"
+            print(f"{name:<24}{before:>14.2f}{result['median_ms']:>12.2f}{change:>10}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark schema, prompt, import, viewer, generation and rendering paths")
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--rows", type=int, default=20000, help="rows per table")
+    parser.add_argument("--csv-mb", type=float, default=20, help="size of the CSV used for the import benchmark")
+    parser.add_argument("--xlsx-rows", type=int, default=20000, help="rows per sheet of the workbook used for the import benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds the mock Gemini server waits")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="run just these benchmarks")
+    parser.add_argument("--workdir", help="keep generated data here and reuse it on later runs")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare medians against")
+    parser.add_argument("--import-profile", nargs="+", metavar="MODULE",
+                        help="print the slowest imports of these modules (python -X importtime) and exit")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.import_profile:
+        _print_import_profile(args.import_profile)
+        return
+
+    if args.child:
+        ctx = json.loads(args.child)
+        print(json.dumps(run_benchmark(ctx.pop("benchmark"), ctx, args.repeat)))
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="t2sql_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    ctx = prepare_data(workdir, args.tables, args.columns, args.rows, args.csv_mb, args.xlsx_rows, args.seed)
+    ctx["llm_latency"] = args.llm_latency
+
+    # Side databases and caches go to the work directory, never next to the user's data
+    env = dict(os.environ, T2SQL_SIDE_DB_PATH=os.path.join(workdir, "cache.db"),
+               T2SQL_RESULT_CACHE_DIR=os.path.join(workdir, "results"))
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "params": {key: ctx[key] for key in ("tables", "columns", "rows", "csv_rows", "xlsx_rows", "llm_latency")},
+            "repeat": args.repeat,
+        },
+        "benchmarks": {},
+    }
+    for name in args.only or BENCHMARKS:
+        child = json.dumps(dict(ctx, benchmark=name))
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", child, "--repeat", str(args.repeat)],
+                                   capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+        if completed.returncode != 0:
+            report["benchmarks"][name] = {"error": completed.stderr.strip().splitlines()[-1:] or ["failed"]}
+            continue
+        report["benchmarks"][name] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{name}: {report['benchmarks'][name]['median_ms']:.2f} ms median", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        _print_comparison(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,79 +1,43 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import os
-
-# Database path constant
-DB_PATH = "dynamic.db"
+from db import DB_PATH
+from schema_catalog import get_catalog
+from schema_editor import create_table, insert_record as insert_row
+from viewer import DEFAULT_PAGE_SIZE, fetch_page
 
 # Function to create a database and user-defined table
 def create_database(table_name, columns):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-
-    # Construct CREATE TABLE SQL statement
-    column_definitions = ", ".join([f'"{col_name}" {col_type}' for col_name, col_type in columns.items()])
-    # Use double quotes for table name to preserve case
-    sql_query = f'CREATE TABLE IF NOT EXISTS "{table_name}" ({column_definitions})'
-
-    cur.execute(sql_query)
-    conn.commit()
-    conn.close()
+    create_table(table_name, columns, DB_PATH)
     st.success(f"✅ Table '{table_name}' created successfully!")
 
 # Function to check if a table exists
 def table_exists(table_name):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    # Query sqlite_master to check if table exists (case sensitive)
-    cur.execute('SELECT name FROM sqlite_master WHERE type="table" AND name=?', (table_name,))
-    result = cur.fetchone()
-    
-    conn.close()
-    return result is not None
+    # Case sensitive lookup in the schema catalog
+    return get_catalog(DB_PATH).table_exists(table_name)
 
 # Function to list all tables in the database
 def list_tables():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    cur.execute('SELECT name FROM sqlite_master WHERE type="table"')
-    tables = [row[0] for row in cur.fetchall()]
-    
-    conn.close()
-    return tables
+    return get_catalog(DB_PATH).tables()
 
 # Function to insert records dynamically
 def insert_record(table_name, column_names, values):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-
-        # Use double quotes for table and column names to preserve case
-        quoted_columns = [f'"{col}"' for col in column_names]
-        placeholders = ", ".join(["?" for _ in values])
-        sql_query = f'INSERT INTO "{table_name}" ({", ".join(quoted_columns)}) VALUES ({placeholders})'
-
-        cur.execute(sql_query, values)
-        conn.commit()
-        conn.close()
+        insert_row(table_name, column_names, values, DB_PATH)
         st.success("✅ Record inserted successfully!")
     except Exception as e:
         st.error(f"❌ Error: {e}")
 
-# Function to fetch records from a table
-def fetch_records(table_name):
+# Function to fetch the first page of records from a table
+def fetch_records(table_name, limit=DEFAULT_PAGE_SIZE):
     try:
         # First check if table exists
         if not table_exists(table_name):
             st.warning(f"⚠️ Table '{table_name}' does not exist.")
             return pd.DataFrame()
             
-        conn = sqlite3.connect(DB_PATH)
-        # Use double quotes for table name to preserve case
-        df = pd.read_sql(f'SELECT * FROM "{table_name}"', conn)
-        conn.close()
+        # Keyset-paginated read, never the whole table
+        df, _ = fetch_page(table_name, limit)
         return df
     except Exception as e:
         st.error(f"❌ Could not fetch records: {e}")
@@ -82,14 +46,7 @@ def fetch_records(table_name):
 # Function to get table schema
 def get_table_schema(table_name):
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        
-        # Use double quotes for table name
-        cur.execute(f'PRAGMA table_info("{table_name}")')
-        columns = {row[1]: row[2] for row in cur.fetchall()}
-        
-        conn.close()
+        columns = {col["name"]: col["type"] for col in get_catalog(DB_PATH).columns(table_name)}
         return columns
     except Exception as e:
         st.error(f"❌ Could not get table schema: {e}")
@@ -1,13 +1,266 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import io
 import os
+import tempfile
+import time
+from db import DB_PATH
+from schema_catalog import get_catalog
+from tracing import trace, span, annotate
+from import_optimizer import LAYOUT_DEFAULTS, suggest_layout
+from type_inference import SQL_TYPES, sample_csv, infer_column_types, normalize_chunk
+from excel_reader import preview_workbook
+from importer import (
+    PREVIEW_ROWS, IMPORT_ROOT, IMPORT_WORKERS, REPORT_FIELDS, read_csv_chunks, frame_chunks, import_chunks,
+    import_workbook, collect_sources, resolve_server_path, run_import_job,
+)
+
+# Function to render one type selectbox per column, preselected with the inferred type
+def column_type_inputs(columns, inferred, key_prefix=""):
+    col_types = {}
+    for column in columns:
+        suggestion = inferred.get(column, {"type": "TEXT", "confidence": 0.0, "nulls": 0.0, "format": None})
+        help_text = f"Suggested {suggestion['type']} ({suggestion['confidence']:.0%} of sampled values fit, {suggestion['nulls']:.0%} empty)"
+        if suggestion["format"]:
+            help_text += f", format {suggestion['format']}"
+        
+        col_types[column] = st.selectbox(
+            f"Data type for '{column}'",
+            SQL_TYPES,
+            index=SQL_TYPES.index(suggestion["type"]),
+            help=help_text,
+            key=f"{key_prefix}type_{column}" if key_prefix else None
+        )
+    return col_types
+
+# Function to render the post-import options: indexes, primary key, WITHOUT ROWID and maintenance
+def layout_inputs(columns, suggested, key_prefix=""):
+    key = lambda name: f"{key_prefix}{name}" if key_prefix else None
+    st.write("### Indexes & Layout:")
+    indexes = st.multiselect(
+        "Columns to index", list(columns), default=suggested["indexes"], key=key("indexes"),
+        help="Built after the rows are loaded, which is faster than maintaining them during the load. "
+             "Preselected: identifier, date and low-cardinality text columns."
+    )
+    candidates = suggested.get("key_candidates")
+    primary_key = st.multiselect(
+        "Primary key", list(columns), default=[], key=key("primary_key"),
+        help="Every row must have a unique key or the import fails."
+             + (f" Unique in the sample: {', '.join(candidates)}." if candidates else "")
+    )
+    without_rowid = st.checkbox(
+        "WITHOUT ROWID layout", value=False, key=key("without_rowid"),
+        help="Stores rows in primary key order: lookups by key skip one B-tree. Needs a primary key; best when the file is already sorted by it."
+    )
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        analyze = st.checkbox("ANALYZE", value=True, key=key("analyze"), help="Collect statistics for the query planner")
+    with col2:
+        optimize = st.checkbox("PRAGMA optimize", value=True, key=key("optimize"))
+    with col3:
+        vacuum = st.checkbox("VACUUM afterwards", value=False, key=key("vacuum"),
+                             help="Reclaims space from replaced tables; rewrites the whole database file")
+    return dict(LAYOUT_DEFAULTS, indexes=indexes, primary_key=primary_key, without_rowid=without_rowid,
+                analyze=analyze, optimize=optimize, vacuum=vacuum)
+
+# Function to describe a layout in one line for the import summary
+def layout_summary(layout):
+    parts = []
+    if layout["indexes"]:
+        parts.append(f"indexed {', '.join(layout['indexes'])}")
+    if layout["primary_key"]:
+        parts.append(f"primary key ({', '.join(layout['primary_key'])})" + (" WITHOUT ROWID" if layout["without_rowid"] else ""))
+    parts += [step for step, enabled in (("ANALYZE", layout["analyze"]), ("PRAGMA optimize", layout["optimize"]),
+                                         ("VACUUM", layout["vacuum"])) if enabled]
+    return "; ".join(parts)
+
+# Function to keep an uploaded workbook on disk (worker processes open it by path) with its sheet previews
+def load_workbook_upload(uploaded_file):
+    cached = st.session_state.get("excel_upload")
+    if cached and cached["file_id"] == uploaded_file.file_id:
+        return cached
+    if cached and os.path.exists(cached["path"]):
+        os.unlink(cached["path"])
+    
+    with tempfile.NamedTemporaryFile("wb", suffix=".xlsx", delete=False) as f:
+        uploaded_file.seek(0)
+        while True:
+            block = uploaded_file.read(1 << 20)
+            if not block:
+                break
+            f.write(block)
+    previews = preview_workbook(f.name, PREVIEW_ROWS)
+    cached = {
+        "file_id": uploaded_file.file_id,
+        "path": f.name,
+        "previews": previews,
+        "inferred": {sheet: infer_column_types(df) for sheet, df in previews.items()},
+    }
+    st.session_state["excel_upload"] = cached
+    return cached
+
+def run_excel_import(uploaded_file):
+    workbook = load_workbook_upload(uploaded_file)
+    previews = workbook["previews"]
+    base_name = os.path.splitext(uploaded_file.name)[0].replace(" ", "_")
+    
+    sheets = st.multiselect("Sheets to import (each becomes its own table)", list(previews), default=list(previews))
+    if not sheets:
+        st.info("Select at least one sheet to import.")
+        return
+    
+    with st.form("excel_import_config"):
+        st.subheader("Import Configuration")
+        plans = {}
+        for sheet in sheets:
+            df = previews[sheet]
+            inferred = workbook["inferred"][sheet]
+            with st.expander(f"📄 Sheet '{sheet}'", expanded=len(sheets) == 1):
+                st.dataframe(df.head(5))
+                default_name = base_name if len(previews) == 1 else f"{base_name}_{sheet}".replace(" ", "_")
+                table_name = st.text_input("Table Name", value=default_name, key=f"excel_table_{sheet}")
+                st.write("### Column Data Types:")
+                col_types = column_type_inputs(df.columns, inferred, key_prefix=f"excel_{sheet}_")
+                suggested = suggest_layout(df, {column: info["type"] for column, info in inferred.items()})
+                layout = layout_inputs(df.columns, suggested, key_prefix=f"excel_{sheet}_")
+            plans[sheet] = {
+                "table": table_name,
+                "col_types": col_types,
+                "formats": {column: info["format"] for column, info in inferred.items()},
+                "layout": layout,
+            }
+        submit_button = st.form_submit_button("Import Data")
+    
+    if submit_button:
+        tables = [plan["table"] for plan in plans.values()]
+        if len(set(tables)) != len(tables):
+            st.error("❌ Each sheet needs a different table name.")
+            return
+        if any(plan["layout"]["without_rowid"] and not plan["layout"]["primary_key"] for plan in plans.values()):
+            st.error("❌ A WITHOUT ROWID table needs a primary key.")
+            return
+        try:
+            catalog = get_catalog(DB_PATH)
+            replaced = [table for table in tables if catalog.table_exists(table)]
+            progress_bar = st.progress(0.0, text="Importing...")
+            
+            def report_progress(rows_done, elapsed):
+                rate = rows_done / elapsed if elapsed else 0
+                progress_bar.progress(0.0, text=f"{rows_done:,} rows imported · {rate:,.0f} rows/s")
+            
+            start = time.perf_counter()
+            with trace("import", mode="xlsx", bytes=uploaded_file.size, tables=len(plans)):
+                row_counts = import_workbook(workbook["path"], plans, DB_PATH, progress=report_progress)
+                annotate(rows=sum(row_counts.values()))
+            elapsed = time.perf_counter() - start
+            progress_bar.progress(1.0, text=f"{sum(row_counts.values()):,} rows imported in {elapsed:.1f} s")
+            
+            if replaced:
+                st.info(f"ℹ️ Existing tables replaced: {', '.join(replaced)}")
+            for sheet, rows in row_counts.items():
+                st.success(f"✅ Imported {rows} rows from sheet '{sheet}' into table '{plans[sheet]['table']}'!")
+                summary = layout_summary(plans[sheet]["layout"])
+                if summary:
+                    st.caption(f"⚙️ {plans[sheet]['table']}: {summary}")
+        
+        except Exception as e:
+            st.error(f"❌ Error during import: {str(e)}")
+
+# Function to copy uploads to disk so parse processes can open them by path
+def save_uploads(uploaded_files, directory):
+    paths = []
+    for index, uploaded_file in enumerate(uploaded_files):
+        # One folder per upload keeps the original file name even when two uploads share it
+        folder = os.path.join(directory, str(index))
+        os.makedirs(folder)
+        path = os.path.join(folder, os.path.basename(uploaded_file.name))
+        with open(path, "wb") as f:
+            uploaded_file.seek(0)
+            while True:
+                block = uploaded_file.read(1 << 20)
+                if not block:
+                    break
+                f.write(block)
+        paths.append(path)
+    return paths
+
+def run_multi_file_import():
+    st.write("Every CSV file, and every sheet of each workbook, becomes its own table with inferred column types and automatically chosen indexes. Existing tables with the same name are replaced.")
+    
+    uploaded_files = st.file_uploader("Choose CSV, Excel or zip files", type=['csv', 'xlsx', 'zip'], accept_multiple_files=True)
+    # Only offered when the operator has named a directory browser users may read from
+    server_path = ""
+    if IMPORT_ROOT:
+        server_path = st.text_input(f"...or a directory or .zip archive under {IMPORT_ROOT} on the server",
+                                    placeholder="nightly").strip()
+    workers = int(st.number_input("Parse processes", min_value=1, value=IMPORT_WORKERS))
+    
+    if not st.button("🚀 Import All"):
+        return
+    if server_path:
+        try:
+            server_path = resolve_server_path(server_path)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+        if not os.path.exists(server_path):
+            st.error(f"❌ Path not found: {server_path}")
+            return
+    
+    with tempfile.TemporaryDirectory() as upload_dir:
+        paths = save_uploads(uploaded_files or [], upload_dir)
+        sources = collect_sources(paths)
+        if server_path:
+            sources += collect_sources([server_path], root=IMPORT_ROOT)
+        if not sources:
+            st.warning("No CSV or XLSX files found.")
+            return
+        
+        progress_bar = st.progress(0.0, text=f"Importing {len(sources)} files...")
+        
+        def report_progress(files_done, rows_done, elapsed):
+            rate = rows_done / elapsed if elapsed else 0
+            progress_bar.progress(
+                files_done / len(sources),
+                text=f"{files_done} / {len(sources)} files · {rows_done:,} rows · {rate:,.0f} rows/s"
+            )
+        
+        try:
+            start = time.perf_counter()
+            # Parsing and writing happen in other processes and threads, so the whole job is one stage
+            with trace("import", mode="multi", files=len(sources), bytes=sum(source["bytes"] for source in sources)):
+                with span("load"):
+                    report = run_import_job(sources, DB_PATH, workers, progress=report_progress)
+                annotate(rows=sum(entry["rows"] for entry in report),
+                         failed_files=sum(1 for entry in report if entry["error"] is not None))
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            st.error(f"❌ Error during import: {str(e)}")
+            return
+    
+    report_df = pd.DataFrame(report, columns=REPORT_FIELDS)
+    report_df["tables"] = report_df["tables"].str.join(", ")
+    failed = int(report_df["error"].notna().sum())
+    st.success(f"✅ Imported {int(report_df['rows'].sum()):,} rows from {len(report_df) - failed} files in {elapsed:.1f} s")
+    if failed:
+        st.warning(f"⚠️ {failed} files failed; their tables were not created.")
+    st.dataframe(report_df)
+    st.download_button(
+        label="📥 Download import report",
+        data=report_df.to_csv(index=False),
+        file_name="import_report.csv",
+        mime="text/csv"
+    )
 
 def run_data_importer():
     st.title("📥 Data Import Tool")
     st.write("Import data from CSV or Excel files into your database.")
     
+    mode = st.radio("Import mode", ["Single file", "Multiple files"], horizontal=True)
+    if mode == "Multiple files":
+        run_multi_file_import()
+        return
+    
     # File uploader
     uploaded_file = st.file_uploader("Choose a CSV or Excel file", type=['csv', 'xlsx', 'xls'])
     
@@ -21,12 +274,25 @@ def run_data_importer():
         st.write("### File Details:")
         st.json(file_details)
         
+        # .xlsx workbooks are streamed sheet by sheet; .xls still goes through pandas
+        if uploaded_file.name.endswith('.xlsx'):
+            try:
+                run_excel_import(uploaded_file)
+            except Exception as e:
+                st.error(f"❌ Error reading file: {str(e)}")
+            return
+        
         try:
-            # Detect file type and read data
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
+            # Detect file type and read data (CSV: only the first rows, the rest is streamed on import)
+            is_csv = uploaded_file.name.endswith('.csv')
+            if is_csv:
+                df = pd.read_csv(uploaded_file, nrows=PREVIEW_ROWS)
+                # Types are inferred from the head plus a random sample of the whole file
+                sample = sample_csv(uploaded_file)
             else:
-                df = pd.read_excel(uploaded_file)
+                df = pd.read_excel(uploaded_file, dtype=str)
+                sample = df.astype("string")
+            inferred = infer_column_types(sample)
             
             st.write("### Data Preview:")
             st.dataframe(df.head(5))
@@ -37,20 +303,9 @@ def run_data_importer():
                 table_name = st.text_input("Table Name", value=os.path.splitext(uploaded_file.name)[0].replace(" ", "_"))
                 
                 st.write("### Column Data Types:")
-                col_types = {}
-                for column in df.columns:
-                    suggested_type = "TEXT"
-                    if pd.api.types.is_numeric_dtype(df[column]):
-                        if pd.api.types.is_integer_dtype(df[column]):
-                            suggested_type = "INTEGER"
-                        else:
-                            suggested_type = "REAL"
-                    
-                    col_types[column] = st.selectbox(
-                        f"Data type for '{column}'",
-                        ["TEXT", "INTEGER", "REAL", "BLOB"],
-                        index=["TEXT", "INTEGER", "REAL", "BLOB"].index(suggested_type)
-                    )
+                col_types = column_type_inputs(df.columns, inferred)
+                
+                layout = layout_inputs(df.columns, suggest_layout(sample, {column: info["type"] for column, info in inferred.items()}))
 
                 # Automatically set replace behavior
                 if_exists = "Replace"
@@ -58,33 +313,42 @@ def run_data_importer():
                 submit_button = st.form_submit_button("Import Data")
             
             if submit_button:
+                if layout["without_rowid"] and not layout["primary_key"]:
+                    st.error("❌ A WITHOUT ROWID table needs a primary key.")
+                    return
                 try:
-                    conn = sqlite3.connect("dynamic.db")
-                    cursor = conn.cursor()
-                    cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}';")
-                    table_exists = cursor.fetchone()
+                    table_exists = get_catalog(DB_PATH).table_exists(table_name)
                     
-                    if table_exists:
-                        cursor.execute(f"DROP TABLE {table_name};")
-                        conn.commit()
+                    progress_bar = st.progress(0.0, text="Importing...")
                     
-                    columns_sql = ", ".join([f'"{col}" {dtype}' for col, dtype in col_types.items()])
-                    create_table_sql = f'CREATE TABLE "{table_name}" ({columns_sql});'
-                    cursor.execute(create_table_sql)
-                    conn.commit()
+                    def report_progress(rows_done, elapsed):
+                        fraction = min(uploaded_file.tell() / uploaded_file.size, 1.0) if is_csv and uploaded_file.size else 0.0
+                        rate = rows_done / elapsed if elapsed else 0
+                        progress_bar.progress(fraction, text=f"{rows_done:,} rows imported · {rate:,.0f} rows/s")
                     
-                    df = df.replace({pd.NA: None})
-                    data = list(df.itertuples(index=False, name=None))
+                    if is_csv:
+                        uploaded_file.seek(0)
+                        chunks = read_csv_chunks(uploaded_file)
+                    else:
+                        chunks = frame_chunks(df)
                     
-                    placeholders = ", ".join(["?" for _ in col_types])
-                    columns = ", ".join([f'"{col}"' for col in col_types.keys()])
-                    insert_sql = f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders});'
+                    # Booleans are stored as 1/0 and dates as ISO-8601 text in the detected format
+                    formats = {column: info["format"] for column, info in inferred.items()}
+                    transform = lambda chunk: normalize_chunk(chunk, col_types, formats)
                     
-                    cursor.executemany(insert_sql, data)
-                    conn.commit()
-                    conn.close()
+                    start = time.perf_counter()
+                    with trace("import", mode="csv" if is_csv else "excel", bytes=uploaded_file.size, tables=1):
+                        row_count = import_chunks(chunks, table_name, col_types, DB_PATH, progress=report_progress, transform=transform, layout=layout)
+                        annotate(rows=row_count)
+                    elapsed = time.perf_counter() - start
+                    progress_bar.progress(1.0, text=f"{row_count:,} rows imported in {elapsed:.1f} s")
                     
-                    st.success(f"✅ Successfully imported {len(df)} rows into table '{table_name}'!")
+                    if table_exists:
+                        st.info(f"ℹ️ Existing table '{table_name}' was replaced.")
+                    st.success(f"✅ Successfully imported {row_count} rows into table '{table_name}'!")
+                    summary = layout_summary(layout)
+                    if summary:
+                        st.caption(f"⚙️ {summary}")
                 
                 except Exception as e:
                     st.error(f"❌ Error during import: {str(e)}")
@@ -0,0 +1,237 @@
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+# Database path constant shared by every page
+DB_PATH = "dynamic.db"
+
+# Side database holding the toolkit's caches and logs, kept apart from dynamic.db so their
+# traffic never touches the user's tables or their change counters
+SIDE_DB_PATH = os.getenv("T2SQL_SIDE_DB_PATH", "t2sql_cache.db")
+
+# Tables owned by SQLite or by the toolkit itself; hidden from users and prompts
+INTERNAL_TABLE_PREFIXES = ("sqlite_", "_t2sql_")
+
+# Maximum number of idle read connections kept per database
+MAX_IDLE_READERS = 8
+
+# PRAGMAs applied to every pooled connection when it is opened
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",       # 64 MB page cache
+    "PRAGMA mmap_size=268435456",     # 256 MB memory-mapped I/O
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+]
+
+# PRAGMAs switched on for the duration of a bulk import transaction
+BULK_PRAGMAS = [
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-262144",      # 256 MB page cache while loading
+]
+
+# How long a connection waits on a locked database before giving up (ms)
+BUSY_TIMEOUT_MS = 10000
+
+
+class ConnectionPool:
+    """Pool of SQLite connections for one database file.
+
+    Readers are pooled and switched to query-only mode; all writes go through
+    a single writer connection serialized by a lock.
+    """
+
+    def __init__(self, db_path, max_idle_readers=MAX_IDLE_READERS):
+        self.db_path = db_path
+        self.max_idle_readers = max_idle_readers
+        self._idle_readers = []
+        self._readers_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._monitor = None
+        self._monitor_id = None
+        self._monitor_lock = threading.Lock()
+        self._closed = False
+
+    def _open(self, read_only):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+        )
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _ensure_wal(self, conn):
+        # WAL is persistent in the database file, so this only needs to run once
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        if mode.lower() != "wal":
+            conn.execute("PRAGMA journal_mode=WAL")
+
+    def acquire_reader(self):
+        with self._readers_lock:
+            if self._idle_readers:
+                return self._idle_readers.pop()
+        # Make sure the database is in WAL mode before the first reader opens it
+        self._get_writer()
+        return self._open(read_only=True)
+
+    def release_reader(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._readers_lock:
+            if not self._closed and len(self._idle_readers) < self.max_idle_readers:
+                self._idle_readers.append(conn)
+                return
+        conn.close()
+
+    def _get_writer(self):
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._open(read_only=False)
+                self._ensure_wal(self._writer)
+            return self._writer
+
+    @contextmanager
+    def reader(self):
+        conn = self.acquire_reader()
+        try:
+            yield conn
+        finally:
+            self.release_reader(conn)
+
+    @contextmanager
+    def writer(self):
+        with self._writer_lock:
+            conn = self._get_writer()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextmanager
+    def bulk_writer(self):
+        # One explicit transaction around the whole load, with import-time PRAGMAs
+        with self._writer_lock:
+            conn = self._get_writer()
+            if conn.in_transaction:
+                conn.commit()
+            for pragma in BULK_PRAGMAS:
+                conn.execute(pragma)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                for pragma in CONNECTION_PRAGMAS:
+                    conn.execute(pragma)
+
+    def change_count(self):
+        # Every write this process makes goes through the single writer, so its
+        # total_changes moves whenever table data changes (DDL excluded)
+        writer = self._writer
+        return writer.total_changes if writer is not None else 0
+
+    def data_version(self):
+        # PRAGMA data_version changes whenever another connection commits. The
+        # monitor connection never writes, so it sees commits from the pooled
+        # writer, other processes and external tools alike. Its counter only
+        # means something for that one connection, hence the connection id prefix
+        with self._monitor_lock:
+            if self._monitor is None:
+                self._get_writer()
+                self._monitor = self._open(read_only=True)
+                self._monitor_id = uuid.uuid4().hex
+            version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+            return f"{self._monitor_id}:{version}"
+
+    def close(self):
+        with self._monitor_lock:
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+        with self._readers_lock:
+            self._closed = True
+            readers, self._idle_readers = self._idle_readers, []
+        for conn in readers:
+            conn.close()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+# Function to check whether a table is an internal bookkeeping table
+def is_internal_table(table_name):
+    return table_name.startswith(INTERNAL_TABLE_PREFIXES)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_side_stores = {}
+_side_stores_lock = threading.Lock()
+
+
+# Function to get (or create) the pool for a database path
+def get_pool(db_path=DB_PATH):
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = ConnectionPool(db_path)
+            _pools[db_path] = pool
+        return pool
+
+
+# Function to get the process-wide instance of a side database store (response cache, query log, ...)
+def side_store(store_class):
+    with _side_stores_lock:
+        store = _side_stores.get(store_class)
+        if store is None:
+            store = store_class()
+            _side_stores[store_class] = store
+        return store
+
+
+# Borrow a pooled query-only connection
+def read_connection(db_path=DB_PATH):
+    return get_pool(db_path).reader()
+
+
+# Borrow the single writer connection; commits on success, rolls back on error
+def write_connection(db_path=DB_PATH):
+    return get_pool(db_path).writer()
+
+
+# Borrow the writer for a bulk load: one transaction, relaxed durability, bigger cache
+def bulk_write_connection(db_path=DB_PATH):
+    return get_pool(db_path).bulk_writer()
+
+
+# Counter that changes whenever this process inserts, updates or deletes rows
+def change_count(db_path=DB_PATH):
+    return get_pool(db_path).change_count()
+
+
+# Token that changes whenever anyone commits to the database (see ConnectionPool.data_version)
+def data_version(db_path=DB_PATH):
+    return get_pool(db_path).data_version()
+
+
+# Close every pooled connection (used by scripts and when a database is replaced)
+def close_all():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -0,0 +1,115 @@
+import datetime
+import os
+import pandas as pd
+from type_inference import check_columns, normalize_chunk
+
+# Rows parsed per batch handed to the writer
+EXCEL_BATCH_ROWS = int(os.getenv("T2SQL_EXCEL_BATCH_ROWS", "10000"))
+
+# Worker processes parsing sheets in parallel
+EXCEL_WORKERS = int(os.getenv("T2SQL_EXCEL_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def _cell_text(value):
+    # Same raw-string form as the CSV path, so type inference and affinity behave identically
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _header(row):
+    names = [str(value).strip() if value not in (None, "") else f"column_{index + 1}" for index, value in enumerate(row)]
+    # A repeated name gets a suffix, as pd.read_csv gives it: name, name.1, name.2
+    header = []
+    counts = {}
+    for name in names:
+        count = counts.get(name, 0)
+        while count:
+            counts[name] = count + 1
+            name = f"{name}.{count}"
+            count = counts.get(name, 0)
+        header.append(name)
+        counts[name] = count + 1
+    check_columns(header)
+    return header
+
+
+# Function to list the sheet names of a workbook without loading its cells
+def list_sheets(path):
+    # openpyxl is imported on first use: pages that never open a workbook skip its import time
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+# Function to stream a sheet as DataFrames of raw strings, `batch_rows` rows at a time
+def iter_sheet_batches(path, sheet, batch_rows=EXCEL_BATCH_ROWS, max_rows=None):
+    """Yield DataFrames for one sheet; the first row is the header.
+
+    The workbook is opened in read-only mode, so rows are parsed from the sheet
+    XML as they are iterated and memory stays flat regardless of the sheet size.
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+        width = len(header)
+        batch = []
+        seen = 0
+        for row in rows:
+            if max_rows is not None and seen >= max_rows:
+                break
+            # Read-only sheets often report trailing blank rows
+            if all(value is None for value in row):
+                continue
+            values = [_cell_text(value) for value in row[:width]]
+            values += [None] * (width - len(values))
+            batch.append(values)
+            seen += 1
+            if len(batch) >= batch_rows:
+                yield pd.DataFrame(batch, columns=header, dtype="string")
+                batch = []
+        if batch or not seen:
+            yield pd.DataFrame(batch, columns=header, dtype="string")
+    finally:
+        workbook.close()
+
+
+# Function to read the first rows of every sheet, for previews and type suggestions
+def preview_workbook(path, rows):
+    return {sheet: next(iter_sheet_batches(path, sheet, rows, max_rows=rows)) for sheet in list_sheets(path)}
+
+
+_queue = None
+
+
+def init_worker(queue):
+    # Runs once in each pool process; batches go back to the single writer through this queue
+    global _queue
+    _queue = queue
+
+
+# Function run in a worker process: parse and normalize one sheet, sending row batches to the writer
+def parse_sheet(path, sheet, col_types, formats, batch_rows=EXCEL_BATCH_ROWS):
+    rows_done = 0
+    try:
+        for chunk in iter_sheet_batches(path, sheet, batch_rows):
+            chunk = normalize_chunk(chunk, col_types, formats)
+            values = chunk.astype(object).where(chunk.notna(), None)
+            rows = list(values.itertuples(index=False, name=None))
+            if rows:
+                _queue.put((sheet, rows))
+            rows_done += len(rows)
+    except Exception as e:
+        _queue.put((sheet, f"{type(e).__name__}: {e}"))
+        raise
+    _queue.put((sheet, None))
+    return rows_done
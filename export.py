@@ -0,0 +1,214 @@
+import csv
+import gzip
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+from db import DB_PATH, read_connection
+
+# Rows fetched per fetchmany() call; also the Parquet row group size
+EXPORT_BATCH_ROWS = int(os.getenv("T2SQL_EXPORT_BATCH_ROWS", "50000"))
+
+# Where finished exports are written before they are downloaded
+EXPORT_DIR = os.getenv("T2SQL_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "t2sql_exports"))
+
+# Exports older than this are removed when a new one starts (seconds)
+EXPORT_MAX_AGE = 3600
+
+# Format name -> (file suffix, MIME type)
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+class CsvSink:
+    """Writes batches of rows to a CSV file, optionally gzip-compressed"""
+
+    def __init__(self, path, columns, compress=False):
+        if compress:
+            self._file = gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6)
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+def _arrow_type(values):
+    # pyarrow is imported on first Parquet use, so CSV exports and the pages never pay for it
+    import pyarrow as pa
+    # Widest type seen in the first batch; SQLite columns may mix storage classes
+    kinds = {type(value) for value in values if value is not None}
+    if not kinds:
+        return pa.string()
+    if kinds <= {int}:
+        return pa.int64()
+    if kinds <= {int, float}:
+        return pa.float64()
+    if kinds <= {bytes}:
+        return pa.binary()
+    return pa.string()
+
+
+def _wider(current, new):
+    # Types only move towards string: null -> int64 -> float64 -> string (bytes mixed with anything else too)
+    import pyarrow as pa
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if {current, new} == {pa.int64(), pa.float64()}:
+        return pa.float64()
+    return pa.string()
+
+
+def _arrow_array(values, arrow_type):
+    import pyarrow as pa
+    if pa.types.is_string(arrow_type):
+        values = [value if value is None or isinstance(value, str) else str(value) for value in values]
+    elif pa.types.is_integer(arrow_type) and any(isinstance(value, float) for value in values):
+        # pyarrow would truncate 1.5 to 1 here; a float needs a wider column
+        raise TypeError("a float value in an integer column")
+    # Integers go into float64 columns as-is: pyarrow refuses those a double cannot hold exactly
+    return pa.array(values, type=arrow_type)
+
+
+# Function to build a pyarrow Table from row tuples
+def arrow_table(columns, rows, schema=None):
+    """Column types come from schema, or are inferred from these rows; values are coerced to them.
+
+    Raises TypeError, ValueError or pyarrow.ArrowException when a value does not fit its column.
+    """
+    import pyarrow as pa
+    values = list(zip(*rows)) if rows else [() for _ in columns]
+    if schema is None:
+        schema = pa.schema([(name, _arrow_type(column)) for name, column in zip(columns, values)])
+    return pa.Table.from_arrays([_arrow_array(column, field.type) for column, field in zip(values, schema)], schema=schema)
+
+
+class ParquetSink:
+    """Writes batches of rows to a Parquet file, one row group per batch.
+
+    A Parquet file has a single schema, so when a batch needs a wider column type
+    than the batches before it (see _wider), the row groups already written are
+    copied into a new file with the wider type, one group at a time. A value that
+    does not fit its column exactly raises ValueError; nothing is truncated.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self._writer = None
+        self._schema = None
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        values = list(zip(*rows)) if rows else [() for _ in self.columns]
+        types = [pa.null() if all(value is None for value in column) else _arrow_type(column) for column in values]
+        if self._schema is not None:
+            types = [_wider(field.type, arrow_type) for field, arrow_type in zip(self._schema, types)]
+        schema = pa.schema(list(zip(self.columns, types)))
+        try:
+            if self._writer is not None and schema != self._schema:
+                self._widen(schema)
+            table = arrow_table(self.columns, rows, schema)
+        except (TypeError, ValueError, pa.ArrowException) as e:
+            raise ValueError(f"A value does not fit its Parquet column ({e}); export as CSV instead") from e
+        if self._writer is None:
+            self._schema = schema
+            self._writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+        self._writer.write_table(table)
+
+    def _widen(self, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._writer.close()
+        narrow = f"{self.path}.narrow"
+        os.replace(self.path, narrow)
+        try:
+            self._writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+            self._schema = schema
+            source = pq.ParquetFile(narrow)
+            for group in range(source.num_row_groups):
+                table = source.read_row_group(group)
+                # Through Python for strings, so earlier rows read exactly like the batches still to come
+                self._writer.write_table(pa.Table.from_arrays([
+                    _arrow_array(column.to_pylist(), field.type) if pa.types.is_string(field.type)
+                    else column.cast(field.type) for column, field in zip(table.columns, schema)
+                ], schema=schema))
+        finally:
+            os.unlink(narrow)
+
+    def close(self):
+        if self._writer is None:
+            # Empty result: still produce a valid file with the column names
+            self.write([])
+        self._writer.close()
+
+
+def _open_sink(path, fmt, columns):
+    if fmt == "Parquet":
+        return ParquetSink(path, columns)
+    return CsvSink(path, columns, compress=fmt == "CSV (gzip)")
+
+
+# Function to pick the export format from a file name (.csv, .csv.gz, .parquet)
+def format_for_path(path):
+    name = path.lower()
+    for fmt, (suffix, _) in sorted(EXPORT_FORMATS.items(), key=lambda item: -len(item[1][0])):
+        if name.endswith(suffix):
+            return fmt
+    raise ValueError(f"Unknown export format for '{path}'; use one of: "
+                     + ", ".join(suffix for suffix, _ in EXPORT_FORMATS.values()))
+
+
+# Function to stream a query's rows into a CSV, gzip CSV or Parquet file
+def export_query(sql, path, fmt="CSV", params=None, db_path=DB_PATH, batch_rows=EXPORT_BATCH_ROWS, progress=None,
+                 budget=None):
+    """Write the result of `sql` to `path`; returns the number of rows written.
+
+    Rows are pulled from the cursor with fetchmany(batch_rows) and written as
+    they arrive, so memory is bounded by one batch whatever the result size.
+    progress, if given, is called as progress(rows_done, elapsed_seconds) after each batch.
+    A query_results.QueryBudget, if given, bounds the whole export; running out of it
+    raises QueryInterrupted, even while SQLite has not produced a row yet.
+    """
+    start = time.perf_counter()
+    rows_done = 0
+    with read_connection(db_path) as conn, (budget.attach(conn) if budget else nullcontext()):
+        cursor = conn.execute(sql, params or [])
+        columns = [description[0] for description in cursor.description or []]
+        sink = _open_sink(path, fmt, columns)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                sink.write(rows)
+                rows_done += len(rows)
+                if progress:
+                    progress(rows_done, time.perf_counter() - start)
+        finally:
+            sink.close()
+            cursor.close()
+    return rows_done
+
+
+# Function to remove finished exports older than EXPORT_MAX_AGE from EXPORT_DIR
+def prune_exports():
+    cutoff = time.time() - EXPORT_MAX_AGE
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+import streamlit as st
+from db import DB_PATH
+from export import EXPORT_DIR, EXPORT_FORMATS, export_query, prune_exports
+from query_results import QueryBudget
+
+# Largest export offered as a browser download (MB); Streamlit holds a download's bytes in memory,
+# so bigger files are only left on the server
+EXPORT_DOWNLOAD_MAX_MB = float(os.getenv("T2SQL_EXPORT_DOWNLOAD_MAX_MB", "100"))
+
+
+# Function to render format choice, export button, progress and download for a query
+def render_export(sql, base_name, params=None, total_rows=None, key="export", db_path=DB_PATH, timeout=None):
+    # timeout (seconds, 0 for none) stops exports of statements that may run for hours, like generated SQL
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        fmt = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}_format")
+    with col2:
+        st.write("")
+        start_export = st.button("📦 Export all rows", key=f"{key}_button")
+    if not start_export:
+        return
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    prune_exports()
+    suffix, mime = EXPORT_FORMATS[fmt]
+    handle, path = tempfile.mkstemp(prefix=f"{base_name}_", suffix=suffix, dir=EXPORT_DIR)
+    os.close(handle)
+
+    progress_bar = st.progress(0.0, text="Exporting...")
+
+    def report_progress(rows_done, elapsed):
+        fraction = min(rows_done / total_rows, 1.0) if total_rows else 0.0
+        rate = rows_done / elapsed if elapsed else 0
+        progress_bar.progress(fraction, text=f"{rows_done:,} rows exported · {rate:,.0f} rows/s")
+
+    try:
+        start = time.perf_counter()
+        budget = QueryBudget(timeout=timeout) if timeout is not None else None
+        row_count = export_query(sql, path, fmt, params, db_path, progress=report_progress, budget=budget)
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        os.unlink(path)
+        st.error(f"❌ Export failed: {e}")
+        return
+
+    size = os.path.getsize(path)
+    progress_bar.progress(1.0, text=f"{row_count:,} rows exported in {elapsed:.1f} s ({size / 1024 / 1024:.1f} MB)")
+    if size > EXPORT_DOWNLOAD_MAX_MB * 1024 * 1024:
+        st.warning(f"⚠️ The file is larger than the {EXPORT_DOWNLOAD_MAX_MB:g} MB that can be downloaded here. "
+                   f"Copy it from the server, or write it where you need it with `python t2sql.py export`.")
+    else:
+        with open(path, "rb") as f:
+            st.download_button(
+                label=f"📥 Download {fmt}",
+                data=f,
+                file_name=f"{base_name}{suffix}",
+                mime=mime,
+                key=f"{key}_download",
+            )
+    st.caption(f"Saved on the server as {path}")
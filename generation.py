@@ -0,0 +1,237 @@
+import re
+import sqlite3
+import time
+from db import DB_PATH
+from schema_catalog import get_catalog
+from llm_cache import get_response_cache, text_hash
+from llm_client import get_llm_client, LLMError
+from schema_index import prune_schema_for_question, pruning_signature, SCHEMA_TOP_K, SCHEMA_MIN_SCORE
+from query_results import RESULT_MAX_ROWS, QUERY_TIMEOUT, QueryBudget, fetch_bounded
+from result_cache import cached_fetch
+from sql_validation import InvalidSQLError, validate_sql, get_validation_log
+from tracing import span, annotate
+
+# Base prompt for Gemini
+BASE_PROMPT = """
+You are an expert SQL query generator. Your task is to generate accurate SQL queries based on natural language questions and the provided database schema.
+
+### Rules:
+1️⃣ Generate only the raw SQL query - no explanations, no backticks, no "SQL" keyword
+2️⃣ Use ONLY the exact table and column names from the provided schema
+3️⃣ Ensure all string comparisons are case-insensitive using LOWER()
+4️⃣ Be precise and specific - don't include columns that don't exist in the schema
+5️⃣ Use appropriate joins when querying across multiple tables
+6️⃣ If the question is ambiguous, make reasonable assumptions based on the schema
+7️⃣ Include only the SQL query in your response - nothing else
+"""
+
+# Sent once when generated SQL fails validation, with the exact error
+REPAIR_PROMPT = """
+The SQL query below was generated for the question but failed validation against the database.
+Return only the corrected SQL query: a single SELECT statement, no explanations, no backticks.
+Use ONLY the exact table and column names from the schema, and single quotes for text values.
+"""
+
+# A fenced block anywhere in the response, with or without a language tag
+_FENCED_SQL = re.compile(r"```[ \t]*(?:sqlite|sql)?[ \t]*\n?(.*?)(?:```|$)", re.IGNORECASE | re.DOTALL)
+
+# Marks "no validation result yet" for validate_and_repair
+_UNCHECKED = object()
+
+# Function to get database schema
+def get_db_schema(db_path):
+    """Extract complete database schema including tables and their columns"""
+    return get_catalog(db_path).schema()
+
+# Function to build the full prompt sent to the model
+def build_prompt(schema_text, question, prompt):
+    # Include schema in the prompt
+    return f"{prompt}\n\n{schema_text}\n\nQuestion: {question}\nSQL Query:"
+
+# Function to generate SQL query using Gemini
+def get_gemini_response(schema_text, question, prompt):
+    try:
+        return get_llm_client().generate(build_prompt(schema_text, question, prompt)).strip()
+    except LLMError as e:
+        return str(e)
+
+# Function to strip markdown code fences and labels from a model response
+def clean_sql(sql_query):
+    text = sql_query.strip()
+    fenced = _FENCED_SQL.search(text)
+    if fenced:
+        text = fenced.group(1)
+    text = text.replace("```", "").strip()
+    # Labels some responses put in front of the statement
+    return re.sub(r"^(?:SQL(?: Query)?:|sqlite\b|sql\b)\s*", "", text, flags=re.IGNORECASE).strip()
+
+# Function to identify a cache-worthy prompt/model/pruning combination
+def prompt_version(prompt, top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE, client=None):
+    client = client or get_llm_client()
+    return text_hash(f"{client.name}\n{pruning_signature(top_k, min_score)}\n{prompt}")[:16]
+
+# Function to look up a previously generated answer; None on a miss
+def _cached_sql(question, catalog, version):
+    try:
+        return get_response_cache().get(question, catalog.fingerprint(), version)
+    except sqlite3.Error:
+        # A broken cache must never block generation
+        return None
+
+# Function to remember a generated answer for later identical questions
+def _store_sql(question, catalog, version, sql_query):
+    try:
+        get_response_cache().put(question, catalog.fingerprint(), version, sql_query)
+    except sqlite3.Error:
+        pass
+
+# Function to turn a question into SQL, answering repeated questions from the response cache
+def generate_sql(question, db_path=DB_PATH, prompt=BASE_PROMPT, use_cache=True,
+                 top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE, client=None):
+    """Return (sql_query, from_cache, error) for a natural language question; raises LLMError.
+
+    error is validate_sql's verdict on the returned SQL: None when it is valid,
+    else the reason the repaired attempt still fails. Cached SQL passed when stored.
+    """
+    client = client or get_llm_client()
+    catalog = get_catalog(db_path)
+    version = prompt_version(prompt, top_k, min_score, client)
+    
+    if use_cache:
+        with span("cache_lookup"):
+            cached = _cached_sql(question, catalog, version)
+        annotate(response_cache_hit=cached is not None)
+        if cached is not None:
+            return cached, True, None
+    
+    # Send only the tables relevant to the question (full schema when unsure)
+    full_prompt = _traced_prompt(question, db_path, prompt, top_k, min_score)
+    with span("llm"):
+        response = client.generate(full_prompt)
+    annotate(response_chars=len(response))
+    sql_query = clean_sql(response)
+    sql_query, error, _ = validate_and_repair(question, sql_query, db_path, client)
+    # Only SQL that passed validation is worth answering the next identical question with
+    if error is None:
+        _store_sql(question, catalog, version, sql_query)
+    
+    return sql_query, False, error
+
+# Function to build the prompt for a question, timing schema pruning and prompt assembly
+def _traced_prompt(question, db_path, prompt, top_k, min_score):
+    with span("schema"):
+        schema_text, tables = prune_schema_for_question(question, db_path, top_k, min_score)
+    with span("prompt"):
+        full_prompt = build_prompt(schema_text, question, prompt)
+    annotate(prompt_chars=len(full_prompt), prompt_tables=len(tables) if tables is not None else None)
+    return full_prompt
+
+# Function to stream SQL for a question as the model writes it
+def stream_sql(question, db_path=DB_PATH, prompt=BASE_PROMPT, use_cache=True,
+               top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE, client=None):
+    """Return (chunks, from_cache); chunks yields raw response text and may raise LLMError.
+
+    Streamed SQL is not validated here: the caller validates (and repairs) it once
+    and passes valid SQL to remember_sql so the next identical question is cached.
+    """
+    client = client or get_llm_client()
+    catalog = get_catalog(db_path)
+    version = prompt_version(prompt, top_k, min_score, client)
+    
+    if use_cache:
+        with span("cache_lookup"):
+            cached = _cached_sql(question, catalog, version)
+        annotate(response_cache_hit=cached is not None)
+        if cached is not None:
+            return iter([cached]), True
+    
+    full_prompt = _traced_prompt(question, db_path, prompt, top_k, min_score)
+    
+    def chunks():
+        chars = 0
+        for piece in client.stream(full_prompt):
+            chars += len(piece)
+            yield piece
+        annotate(response_chars=chars)
+    
+    return chunks(), False
+
+# Function to cache streamed SQL once the caller has validated (or repaired) it
+def remember_sql(question, sql_query, db_path=DB_PATH, prompt=BASE_PROMPT,
+                 top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE, client=None):
+    _store_sql(question, get_catalog(db_path), prompt_version(prompt, top_k, min_score, client), sql_query)
+
+# Function to validate generated SQL and, when it fails, ask the model once to fix it
+def validate_and_repair(question, sql_query, db_path=DB_PATH, client=None, error=_UNCHECKED):
+    """Return (sql_query, error, original_error).
+
+    error is None when the final SQL passed validation; original_error is set
+    when the first attempt failed and a repair was requested. Pass `error` when
+    the first attempt was already validated. Every outcome goes to the validation log.
+    """
+    if error is _UNCHECKED:
+        with span("validate"):
+            error = validate_sql(sql_query, db_path)
+    log = get_validation_log()
+    annotate(valid=error is None)
+    if error is None:
+        _log_outcome(log, "ok")
+        return sql_query, None, None
+    
+    client = client or get_llm_client()
+    # The full schema: the failure may come from a table the pruned prompt left out
+    schema_text = get_catalog(db_path).prompt_text()
+    repair_prompt = (f"{REPAIR_PROMPT}\n\n{schema_text}\n\nQuestion: {question}\n"
+                     f"Failed SQL:\n{sql_query}\nError: {error}\nCorrected SQL Query:")
+    start = time.perf_counter()
+    try:
+        with span("repair"):
+            repaired = clean_sql(client.generate(repair_prompt))
+            repaired_error = validate_sql(repaired, db_path)
+    except LLMError as e:
+        repaired, repaired_error = sql_query, f"{error} (repair request failed: {e})"
+    repair_ms = (time.perf_counter() - start) * 1000
+    annotate(repaired=repaired_error is None)
+    _log_outcome(log, "repaired" if repaired_error is None else "failed", error, repair_ms)
+    return repaired, repaired_error, error
+
+def _log_outcome(log, outcome, error=None, repair_ms=None):
+    try:
+        log.record(outcome, error, repair_ms)
+    except sqlite3.Error:
+        # Metrics must never block generation
+        pass
+
+# Function to execute SQL (at most max_rows rows are returned; repeated queries come from result_cache)
+def read_sql_query(sql, db, params=None, max_rows=RESULT_MAX_ROWS, budget=None):
+    try:
+        result = cached_fetch(sql, db, params, max_rows=max_rows, budget=budget)
+        return result.rows, result.columns
+    except sqlite3.Error as e:
+        return str(e), []
+
+class Answer:
+    """SQL generated for a question and the rows it returned"""
+
+    def __init__(self, question, sql, from_cache, result):
+        self.question = question
+        self.sql = sql
+        self.from_cache = from_cache  # SQL came from the response cache
+        self.result = result          # query_results.QueryResult
+
+# Function to answer a question end to end: generate SQL, check it, run it
+def ask(question, db_path=DB_PATH, max_rows=RESULT_MAX_ROWS, timeout=QUERY_TIMEOUT, use_cache=True,
+        preview_limit=True, client=None):
+    """Return an Answer; raises LLMError, InvalidSQLError when no valid SQL could be generated,
+    or sqlite3.Error (QueryInterrupted on time-out) when the query fails.
+    """
+    sql_query, from_cache, error = generate_sql(question, db_path, use_cache=use_cache, client=client)
+    # generate_sql returns its last attempt even when the repair failed
+    if error:
+        raise InvalidSQLError(sql_query, error)
+    fetch = cached_fetch if use_cache else fetch_bounded
+    with span("query"):
+        result = fetch(sql_query, db_path, max_rows=max_rows, preview_limit=preview_limit,
+                       budget=QueryBudget(timeout=timeout))
+    annotate(rows=len(result.rows), truncated=bool(result.truncated), result_cache_hit=result.cached)
+    return Answer(question, sql_query, from_cache, result)
@@ -1,8 +1,8 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
 import os
-from PIL import Image
+from db import DB_PATH
+from table_stats import analyze_tables
+from schema_catalog import get_catalog
 
 def run_home_page():
     # Custom styling for the home page
@@ -126,25 +126,16 @@ def run_home_page():
    
     
     # Quick stats based on database information
-    conn = sqlite3.connect("dynamic.db")
-    cursor = conn.cursor()
+    tables = get_catalog(DB_PATH).tables()
     
     # Get number of tables
-    cursor.execute("SELECT count(name) FROM sqlite_master WHERE type='table';")
-    table_count = cursor.fetchone()[0]
+    table_count = len(tables)
     
-    # Estimate total records across all tables (approximate)
-    total_records = 0
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = cursor.fetchall()
-    for table in tables:
-        try:
-            cursor.execute(f"SELECT COUNT(*) FROM '{table[0]}'")
-            total_records += cursor.fetchone()[0]
-        except:
-            pass
-    
-    conn.close()
+    # Total records from the maintained table statistics (no table scans)
+    stats = get_catalog(DB_PATH).table_stats()
+    total_records = sum(info["rows"] or 0 for info in stats.values())
+    unknown_tables = [table for table, info in stats.items() if info["rows"] is None]
+    estimated = unknown_tables or any(not info["exact"] for info in stats.values())
     
     # Dashboard stats
     st.markdown("<h2 style='text-align: center; margin-top: 2rem;'>Database Dashboard</h2>", unsafe_allow_html=True)
@@ -165,7 +156,11 @@ def run_home_page():
             <div class="stat-number">{}</div>
             <div class="stat-label">Total Records</div>
         </div>
-        """.format(total_records), unsafe_allow_html=True)
+        """.format(f"~{total_records:,}" if estimated else f"{total_records:,}"), unsafe_allow_html=True)
+        
+        if unknown_tables and st.button("📏 Estimate missing counts", help=f"{len(unknown_tables)} tables have no statistics yet"):
+            analyze_tables(unknown_tables, DB_PATH)
+            st.rerun()
     
     with col3:
         st.markdown("""
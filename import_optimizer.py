@@ -0,0 +1,92 @@
+import re
+from db import DB_PATH, write_connection
+from index_advisor import IndexSuggestion
+from tracing import span
+from type_inference import NULL_TOKENS
+
+# Indexes proposed automatically per imported table
+MAX_AUTO_INDEXES = 4
+
+# Column names that look like identifiers or references to other tables
+KEY_NAME = re.compile(r"(^|_|\b)(id|key|code|no|num|number)$|[a-z]Id$", re.IGNORECASE)
+
+# A sampled column with at most this share of distinct values is treated as a category people filter on
+CATEGORY_MAX_DISTINCT = 0.5
+
+# Physical options applied to a table after its rows are loaded
+LAYOUT_DEFAULTS = {
+    "indexes": [],           # columns to index once the bulk load is done
+    "primary_key": [],       # declared in CREATE TABLE
+    "without_rowid": False,  # store the table clustered on its primary key
+    "analyze": True,         # collect planner statistics (sqlite_stat1)
+    "optimize": True,        # PRAGMA optimize after the load
+    "vacuum": False,         # rebuild the database file afterwards
+}
+
+
+# Function to pick the columns of a freshly sampled table worth indexing, best first
+def suggest_layout(sample, col_types):
+    """Return a layout (see LAYOUT_DEFAULTS) with heuristic index columns and primary key candidates.
+
+    Identifier-like columns come first (they are joined on), then dates (range
+    filters), then low-cardinality text (equality filters). Free text and
+    measures are left alone.
+    """
+    keys, dates, categories, candidates = [], [], [], []
+    # By position: sample[column] would be a DataFrame for a repeated name
+    for position, column in enumerate(sample.columns):
+        values = sample.iloc[:, position].dropna().astype("string")
+        values = values[~values.str.strip().str.lower().isin(NULL_TOKENS)]
+        if values.empty:
+            continue
+        distinct = values.nunique() / len(values)
+        col_type = col_types.get(column, "TEXT")
+        if KEY_NAME.search(str(column)):
+            keys.append(column)
+            if distinct == 1.0 and len(values) == len(sample):
+                candidates.append(column)
+        elif col_type in ("DATE", "DATETIME"):
+            dates.append(column)
+        elif col_type == "TEXT" and values.nunique() > 1 and distinct <= CATEGORY_MAX_DISTINCT:
+            categories.append(column)
+    layout = dict(LAYOUT_DEFAULTS, indexes=(keys + dates + categories)[:MAX_AUTO_INDEXES])
+    layout["key_candidates"] = candidates
+    return layout
+
+
+# Function to turn an index column into an index key
+def index_key(column, col_type):
+    # Generated SQL compares text through LOWER(), so text filters get an index on that expression;
+    # identifier columns are joined on as-is
+    if col_type == "TEXT" and not KEY_NAME.search(str(column)):
+        return f'LOWER("{column}")'
+    return column
+
+
+# Function to build a layout's indexes and statistics for a loaded table, inside the load's transaction
+def optimize_table(conn, table_name, col_types, layout):
+    """Create the layout's indexes on table_name and refresh its statistics; returns the index names"""
+    names = []
+    primary_key = list(layout.get("primary_key") or [])
+    with span("indexes"):
+        for column in layout.get("indexes") or []:
+            if primary_key[:1] == [column]:
+                continue  # the primary key already orders the table by this column
+            suggestion = IndexSuggestion(table_name, [index_key(column, col_types.get(column, "TEXT"))], "import")
+            conn.execute(suggestion.sql)
+            names.append(suggestion.name)
+    with span("analyze"):
+        if layout.get("analyze"):
+            # A full pass, unlike the sampled ANALYZE of table_stats: the new pages are still in the cache,
+            # and skewed columns need exact counts for the planner to skip an index that would not help
+            conn.execute(f'ANALYZE "{table_name}"')
+        if layout.get("optimize"):
+            conn.execute("PRAGMA optimize")
+    return names
+
+
+# Function to rebuild the database file, reclaiming space left by replaced tables
+def vacuum_database(db_path=DB_PATH):
+    # VACUUM cannot run inside a transaction; the writer has none open between writes
+    with span("vacuum"), write_connection(db_path) as conn:
+        conn.execute("VACUUM")
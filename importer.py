@@ -0,0 +1,464 @@
+import io
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait
+import pandas as pd
+from db import DB_PATH, bulk_write_connection
+from tracing import span, traced
+from table_stats import record_table_loaded, record_table_dropped
+from import_optimizer import LAYOUT_DEFAULTS, suggest_layout, optimize_table, vacuum_database
+from type_inference import sample_csv, infer_column_types, normalize_chunk
+from excel_reader import (
+    EXCEL_BATCH_ROWS, EXCEL_WORKERS, list_sheets, iter_sheet_batches, init_worker, parse_sheet,
+)
+
+# Rows converted and inserted per batch, so memory follows the chunk size rather than the file size
+IMPORT_CHUNK_ROWS = 50000
+
+# Rows parsed up front for the preview and the column type suggestions
+PREVIEW_ROWS = 1000
+
+# Function to get the start method for parse processes
+def process_context():
+    # Forking would copy locks held by this process's other threads (Streamlit, the writer thread) into the
+    # child, so workers come from a fork server, or are spawned where there is none
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Preloaded once in the server, so each worker starts with pandas and the parsers already imported
+    context.set_forkserver_preload(["importer"])
+    return context
+
+# Function to start parse processes without re-running the caller's script in them
+@contextmanager
+def worker_main():
+    # Fork-server and spawned children re-import the parent's __main__, which Streamlit sets to the page script:
+    # while workers start, __main__ is this module instead, whose import has no side effects
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = sys.modules[__name__]
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+# Function to read a CSV lazily, one DataFrame of raw strings per chunk
+def read_csv_chunks(source, chunksize=IMPORT_CHUNK_ROWS):
+    # Strings are handed to SQLite as-is; column affinity does the numeric conversion
+    return pd.read_csv(source, chunksize=chunksize, dtype=str)
+
+# Function to yield a chunk's rows as plain Python tuples with missing values as None
+def chunk_rows(chunk):
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+# Function to build the CREATE TABLE and INSERT statements for an imported table
+def table_statements(table_name, col_types, primary_key=None, without_rowid=False):
+    columns_sql = ", ".join([f'"{col}" {dtype}' for col, dtype in col_types.items()])
+    if primary_key:
+        columns_sql += ", PRIMARY KEY (" + ", ".join(f'"{col}"' for col in primary_key) + ")"
+    # WITHOUT ROWID stores rows in the primary key's B-tree, so it needs one
+    suffix = " WITHOUT ROWID" if primary_key and without_rowid else ""
+    create_table_sql = f'CREATE TABLE "{table_name}" ({columns_sql}){suffix};'
+    
+    placeholders = ", ".join(["?" for _ in col_types])
+    columns = ", ".join([f'"{col}"' for col in col_types.keys()])
+    insert_sql = f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders});'
+    return create_table_sql, insert_sql
+
+# Function to stream DataFrame chunks into a (re)created table inside one transaction
+def import_chunks(chunks, table_name, col_types, db_path=DB_PATH, progress=None, transform=None, layout=None):
+    """Replace table_name with the rows of `chunks`; returns the number of rows imported.
+
+    transform, if given, rewrites each chunk before insert (see normalize_chunk).
+    progress, if given, is called as progress(rows_done, elapsed_seconds) after each chunk.
+    layout (see import_optimizer.LAYOUT_DEFAULTS) declares the primary key and the
+    indexes and statistics built once the rows are in.
+    """
+    layout = dict(LAYOUT_DEFAULTS, **(layout or {}))
+    create_table_sql, insert_sql = table_statements(table_name, col_types, layout["primary_key"], layout["without_rowid"])
+    
+    rows_done = 0
+    start = time.perf_counter()
+    # Drop, create and load atomically: readers keep seeing the old table until commit
+    with bulk_write_connection(db_path) as conn:
+        conn.execute(f'DROP TABLE IF EXISTS "{table_name}";')
+        conn.execute(create_table_sql)
+        for chunk in traced(chunks, "read"):
+            if transform:
+                with span("transform"):
+                    chunk = transform(chunk)
+            with span("insert"):
+                conn.executemany(insert_sql, chunk_rows(chunk))
+            rows_done += len(chunk)
+            if progress:
+                progress(rows_done, time.perf_counter() - start)
+        # Building indexes over loaded rows is cheaper than maintaining them row by row
+        optimize_table(conn, table_name, col_types, layout)
+        record_table_loaded(conn, table_name, rows_done)
+    if layout["vacuum"]:
+        vacuum_database(db_path)
+    return rows_done
+
+# Function to discard sheet batches until every parse process has reported, after the writer failed
+def _drain_sheets(batches, futures, remaining):
+    while remaining:
+        try:
+            _, rows = batches.get(timeout=1.0)
+        except queue.Empty:
+            if all(future.done() for future in futures):
+                return
+            continue
+        if rows is None or isinstance(rows, str):
+            remaining -= 1
+
+# Function to import several sheets of an .xlsx workbook, each into its own table
+def import_workbook(path, plans, db_path=DB_PATH, workers=EXCEL_WORKERS, batch_rows=EXCEL_BATCH_ROWS, progress=None):
+    """Import the sheets in `plans` ({sheet: {"table", "col_types", "formats", "layout"}}); returns {sheet: rows}.
+
+    Sheets are parsed in parallel by a process pool; row batches come back over a
+    bounded queue to this process, where a single writer connection inserts them
+    all inside one transaction. progress, if given, is called as
+    progress(rows_done, elapsed_seconds) after each batch.
+    """
+    layouts = {sheet: dict(LAYOUT_DEFAULTS, **(plan.get("layout") or {})) for sheet, plan in plans.items()}
+    statements = {
+        sheet: table_statements(plan["table"], plan["col_types"], layouts[sheet]["primary_key"], layouts[sheet]["without_rowid"])
+        for sheet, plan in plans.items()
+    }
+    rows_done = {sheet: 0 for sheet in plans}
+    start = time.perf_counter()
+
+    context = process_context()
+    batches = context.Queue(maxsize=max(1, workers) * 4)
+    with ProcessPoolExecutor(max(1, min(workers, len(plans))), mp_context=context,
+                             initializer=init_worker, initargs=(batches,)) as pool:
+        # The pool starts a worker per submit, so every process starts inside worker_main
+        with worker_main():
+            futures = [
+                pool.submit(parse_sheet, path, sheet, plan["col_types"], plan.get("formats"), batch_rows)
+                for sheet, plan in plans.items()
+            ]
+        remaining = len(plans)
+        try:
+            with bulk_write_connection(db_path) as conn:
+                for sheet, plan in plans.items():
+                    conn.execute(f'DROP TABLE IF EXISTS "{plan["table"]}";')
+                    conn.execute(statements[sheet][0])
+
+                while remaining:
+                    try:
+                        # Time spent here is time the writer waited for the parse processes
+                        with span("parse_wait"):
+                            sheet, rows = batches.get(timeout=1.0)
+                    except queue.Empty:
+                        # A worker that died without reporting would otherwise leave us waiting forever
+                        for future in futures:
+                            if future.done() and future.exception() is not None:
+                                raise future.exception()
+                        continue
+                    if rows is None:
+                        remaining -= 1
+                    elif isinstance(rows, str):
+                        remaining -= 1
+                        raise RuntimeError(f"Sheet '{sheet}': {rows}")
+                    else:
+                        with span("insert"):
+                            conn.executemany(statements[sheet][1], rows)
+                        rows_done[sheet] += len(rows)
+                        if progress:
+                            progress(sum(rows_done.values()), time.perf_counter() - start)
+                for sheet, plan in plans.items():
+                    optimize_table(conn, plan["table"], plan["col_types"], layouts[sheet])
+                    record_table_loaded(conn, plan["table"], rows_done[sheet])
+        except BaseException:
+            # Workers blocked on the full queue would keep the pool's shutdown waiting forever
+            _drain_sheets(batches, futures, remaining)
+            raise
+    if any(layout["vacuum"] for layout in layouts.values()):
+        vacuum_database(db_path)
+    return rows_done
+
+# Function to split an in-memory DataFrame into import-sized chunks
+def frame_chunks(df, chunksize=IMPORT_CHUNK_ROWS):
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+# File types picked up from uploads, directories and zip archives in multi-file mode
+MULTI_IMPORT_EXTENSIONS = (".csv", ".xlsx")
+
+# Server directory the multi-file page may import from; unset (the default) turns server paths off
+IMPORT_ROOT = os.getenv("T2SQL_IMPORT_ROOT", "")
+
+# Parse worker processes for multi-file imports
+IMPORT_WORKERS = int(os.getenv("T2SQL_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+
+# Rows the writer inserts between commits in multi-file mode
+GROUP_COMMIT_ROWS = int(os.getenv("T2SQL_GROUP_COMMIT_ROWS", "500000"))
+
+# Columns of the per-file import report
+REPORT_FIELDS = ["file", "tables", "rows", "bytes", "seconds", "error"]
+
+def _inside(root, path):
+    return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+# Function to resolve a path typed into the page, refusing anything outside the import root
+def resolve_server_path(path, root=IMPORT_ROOT):
+    """Return the real path of `path` (relative paths start at root); raises ValueError when it leaves root"""
+    if not root:
+        raise ValueError("Importing from server paths is disabled; set T2SQL_IMPORT_ROOT to allow it")
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if not _inside(root, resolved):
+        raise ValueError(f"Path is outside the import root {root}: {path}")
+    return resolved
+
+# Function to expand files, directories and zip archives into a list of importable sources
+def collect_sources(paths, root=None):
+    """root, when given, drops files a directory links to from outside it"""
+    root = os.path.realpath(root) if root else None
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for walk_root, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    if name.lower().endswith(MULTI_IMPORT_EXTENSIONS):
+                        full_path = os.path.join(walk_root, name)
+                        if root is not None and not _inside(root, full_path):
+                            continue
+                        sources.append({"name": os.path.relpath(full_path, path), "path": full_path,
+                                        "member": None, "bytes": os.path.getsize(full_path)})
+        # Checked before is_zipfile: an .xlsx workbook is itself a zip archive
+        elif path.lower().endswith(MULTI_IMPORT_EXTENSIONS):
+            sources.append({"name": os.path.basename(path), "path": path, "member": None, "bytes": os.path.getsize(path)})
+        elif zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(MULTI_IMPORT_EXTENSIONS):
+                        sources.append({"name": f"{os.path.basename(path)}/{info.filename}", "path": path,
+                                        "member": info.filename, "bytes": info.file_size})
+    return sources
+
+# Function to turn a file (and sheet) name into a table name
+def source_table_name(name, sheet=None):
+    base = os.path.splitext(os.path.basename(name))[0]
+    if sheet is not None:
+        base = f"{base}_{sheet}"
+    return re.sub(r"\W+", "_", base).strip("_") or "imported"
+
+@contextmanager
+def open_source(source):
+    if source["member"] is None:
+        with open(source["path"], "rb") as f:
+            yield f
+    else:
+        with zipfile.ZipFile(source["path"]) as archive, archive.open(source["member"]) as f:
+            yield f
+
+_import_queue = None
+
+def init_import_worker(batches):
+    # Runs once in each parse process; everything it parses goes to the writer thread through this queue
+    global _import_queue
+    _import_queue = batches
+
+def _send_chunks(index, key, chunks, col_types, formats):
+    for chunk in chunks:
+        rows = list(chunk_rows(normalize_chunk(chunk, col_types, formats)))
+        if rows:
+            _import_queue.put(("rows", index, key, rows))
+
+# Function run in a parse process: infer types for one source and stream its converted rows to the writer
+def parse_source(index, source, chunksize=IMPORT_CHUNK_ROWS):
+    start = time.perf_counter()
+    try:
+        with open_source(source) as raw:
+            if source["name"].lower().endswith(".xlsx"):
+                # openpyxl needs random access; zip members are small next to their sheets' rows
+                workbook = raw if source["member"] is None else io.BytesIO(raw.read())
+                sheets = list_sheets(workbook)
+                for sheet in sheets:
+                    head = next(iter_sheet_batches(workbook, sheet, PREVIEW_ROWS, max_rows=PREVIEW_ROWS))
+                    inferred = infer_column_types(head)
+                    col_types = {column: info["type"] for column, info in inferred.items()}
+                    formats = {column: info["format"] for column, info in inferred.items()}
+                    table = source_table_name(source["name"], sheet if len(sheets) > 1 else None)
+                    _import_queue.put(("create", index, sheet, (table, col_types, suggest_layout(head, col_types))))
+                    _send_chunks(index, sheet, iter_sheet_batches(workbook, sheet, EXCEL_BATCH_ROWS), col_types, formats)
+            else:
+                sample = sample_csv(raw)
+                inferred = infer_column_types(sample)
+                col_types = {column: info["type"] for column, info in inferred.items()}
+                formats = {column: info["format"] for column, info in inferred.items()}
+                layout = suggest_layout(sample, col_types)
+                _import_queue.put(("create", index, None, (source_table_name(source["name"]), col_types, layout)))
+                _send_chunks(index, None, read_csv_chunks(raw, chunksize), col_types, formats)
+    except Exception as e:
+        _import_queue.put(("error", index, None, f"{type(e).__name__}: {e}"))
+        return
+    _import_queue.put(("done", index, None, time.perf_counter() - start))
+
+class ImportWriter(threading.Thread):
+    """The only thread that writes during a multi-file import.
+
+    Applies create/rows/done/error messages from the parse processes and commits
+    every `group_rows` rows, so many files share a few large transactions. Each
+    table gets its suggested indexes and statistics when its file is done.
+    """
+
+    def __init__(self, batches, sources, db_path=DB_PATH, group_rows=GROUP_COMMIT_ROWS):
+        super().__init__(name="import-writer", daemon=True)
+        self.batches = batches
+        self.db_path = db_path
+        self.group_rows = group_rows
+        self.report = [
+            {"file": source["name"], "tables": [], "rows": 0, "bytes": source["bytes"], "seconds": None, "error": None}
+            for source in sources
+        ]
+        self.rows_done = 0
+        self.files_done = 0
+        self.error = None
+        self._targets = {}      # (index, key) -> (table, insert_sql)
+        self._table_rows = {}   # table -> rows inserted
+        self._layouts = {}      # table -> (col_types, layout)
+        self._used_names = set()
+
+    def _unique_name(self, table):
+        name, suffix = table, 2
+        while name in self._used_names:
+            name, suffix = f"{table}_{suffix}", suffix + 1
+        self._used_names.add(name)
+        return name
+
+    def _fail(self, conn, index, message):
+        entry = self.report[index]
+        if entry["error"] is None and entry["seconds"] is None:
+            self.files_done += 1
+        entry["error"] = entry["error"] or message
+        # Do not leave a half-loaded table behind
+        for table in entry["tables"]:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}";')
+            record_table_dropped(conn, table)
+        entry["tables"] = []
+        self.rows_done -= entry["rows"]
+        entry["rows"] = 0
+
+    def _apply(self, conn, kind, index, key, payload):
+        entry = self.report[index]
+        if entry["error"] is not None:
+            return 0
+        if kind == "create":
+            table, col_types, layout = payload
+            table = self._unique_name(table)
+            create_table_sql, insert_sql = table_statements(table, col_types)
+            conn.execute(f'DROP TABLE IF EXISTS "{table}";')
+            conn.execute(create_table_sql)
+            entry["tables"].append(table)
+            self._targets[(index, key)] = (table, insert_sql)
+            self._table_rows[table] = 0
+            # PRAGMA optimize runs once for the whole job, not per table
+            self._layouts[table] = (col_types, dict(layout, optimize=False))
+        elif kind == "rows":
+            table, insert_sql = self._targets[(index, key)]
+            conn.executemany(insert_sql, payload)
+            self._table_rows[table] += len(payload)
+            entry["rows"] += len(payload)
+            self.rows_done += len(payload)
+            return len(payload)
+        elif kind == "done":
+            for table in entry["tables"]:
+                optimize_table(conn, table, *self._layouts[table])
+                record_table_loaded(conn, table, self._table_rows[table])
+            entry["seconds"] = round(payload, 3)
+            self.files_done += 1
+        elif kind == "error":
+            self._fail(conn, index, payload)
+        return 0
+
+    def run(self):
+        finished = False
+        try:
+            with bulk_write_connection(self.db_path) as conn:
+                uncommitted = 0
+                while True:
+                    message = self.batches.get()
+                    if message is None:
+                        finished = True
+                        conn.execute("PRAGMA optimize")
+                        break
+                    kind, index, key, payload = message
+                    try:
+                        uncommitted += self._apply(conn, kind, index, key, payload)
+                    except sqlite3.Error as e:
+                        self._fail(conn, index, f"{type(e).__name__}: {e}")
+                    if uncommitted >= self.group_rows:
+                        conn.commit()
+                        conn.execute("BEGIN IMMEDIATE")
+                        uncommitted = 0
+        except Exception as e:
+            self.error = e
+            # Keep draining so parse processes blocked on a full queue can finish
+            while not finished and self.batches.get() is not None:
+                pass
+
+# Function to import many CSV/XLSX sources in parallel through a single writer
+def run_import_job(sources, db_path=DB_PATH, workers=IMPORT_WORKERS, group_rows=GROUP_COMMIT_ROWS, progress=None):
+    """Import every source into its own table (one per sheet for workbooks); returns the per-file report.
+
+    Parsing and type inference run in a process pool; converted batches flow through
+    a bounded queue to one writer thread. progress, if given, is called as
+    progress(files_done, rows_done, elapsed_seconds) while the job runs.
+    """
+    start = time.perf_counter()
+    context = process_context()
+    batches = context.Queue(maxsize=max(1, workers) * 4)
+    writer = ImportWriter(batches, sources, db_path, group_rows)
+    writer.start()
+    try:
+        with ProcessPoolExecutor(max(1, min(workers, len(sources))), mp_context=context,
+                                 initializer=init_import_worker, initargs=(batches,)) as pool:
+            with worker_main():
+                futures = {pool.submit(parse_source, index, source): index for index, source in enumerate(sources)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5)
+                for future in done:
+                    if future.exception() is not None:
+                        # The worker process died before it could report
+                        batches.put(("error", futures[future], None, f"{type(future.exception()).__name__}: {future.exception()}"))
+                if progress:
+                    progress(writer.files_done, writer.rows_done, time.perf_counter() - start)
+    finally:
+        batches.put(None)
+        writer.join()
+    if writer.error is not None:
+        raise writer.error
+    if progress:
+        progress(writer.files_done, writer.rows_done, time.perf_counter() - start)
+    return writer.report
+
+# Function to import one CSV file with inferred column types and the suggested layout
+def import_csv(path, table_name=None, db_path=DB_PATH, layout=None, progress=None):
+    """Replace table_name (default: from the file name) with the rows of the CSV at path.
+
+    Returns (table_name, rows). Column types are inferred from a sample as in the
+    importer page; layout entries override the suggested indexes and options.
+    """
+    table_name = table_name or source_table_name(path)
+    with open(path, "rb") as f:
+        sample = sample_csv(f)
+        inferred = infer_column_types(sample)
+        col_types = {column: info["type"] for column, info in inferred.items()}
+        formats = {column: info["format"] for column, info in inferred.items()}
+        layout = dict(suggest_layout(sample, col_types), **(layout or {}))
+        f.seek(0)
+        rows = import_chunks(read_csv_chunks(f), table_name, col_types, db_path, progress=progress,
+                             transform=lambda chunk: normalize_chunk(chunk, col_types, formats), layout=layout)
+    return table_name, rows
@@ -0,0 +1,325 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from db import DB_PATH, SIDE_DB_PATH, read_connection, side_store, write_connection
+from schema_catalog import get_catalog
+from sql_text import sql_tokens
+from table_stats import ANALYSIS_LIMIT
+
+# A suggested index "paid off" when the query got at least this much faster
+PAYOFF_RATIO = 0.8
+
+# Extra columns appended to make an index covering, at most this many columns in total
+COVERING_MAX_COLUMNS = 5
+
+INDEX_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS _t2sql_index_log (
+    id INTEGER PRIMARY KEY,
+    shape_hash TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    index_sql TEXT NOT NULL,
+    query_sql TEXT NOT NULL,
+    before_ms REAL NOT NULL,
+    after_ms REAL NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+_EQUALITY_OPS = {"=", "==", "is", "in"}
+_RANGE_OPS = {"<", ">", "<=", ">=", "between"}
+
+# Plan lines for a full pass over a table: "SCAN t", but not "SCAN t USING ... INDEX"
+_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW|SUBQUERY|\()(\S+)(?: AS \S+)?$")
+_TEMP_BTREE = re.compile(r"^USE TEMP B-TREE FOR (.+)$")
+
+
+class IndexSuggestion:
+    """A CREATE INDEX proposed for one table of a query"""
+
+    def __init__(self, table, keys, reason):
+        self.table = table
+        self.keys = keys                     # column names or LOWER("col") expressions, in index order
+        self.reason = reason
+        self.history = None                  # earlier (before_ms, after_ms) for this query shape, if any
+
+    @property
+    def name(self):
+        parts = [re.sub(r"\W+", "_", key.replace("LOWER", "lower")).strip("_") for key in self.keys]
+        name = re.sub(r"\W+", "_", f"idx_{self.table}_{'_'.join(parts)}")
+        if len(name) <= 60:
+            return name
+        # Cut names keep a hash of table and keys, so long table names cannot make two indexes collide
+        digest = hashlib.sha1("\0".join([self.table, *self.keys]).encode("utf-8")).hexdigest()[:8]
+        return f"{name[:51]}_{digest}"
+
+    @property
+    def sql(self):
+        columns = ", ".join(key if key.startswith("LOWER(") else _quote(key) for key in self.keys)
+        return f'CREATE INDEX IF NOT EXISTS "{self.name}" ON {_quote(self.table)} ({columns})'
+
+
+class PlanReport:
+    """EXPLAIN QUERY PLAN output of one query, with its full scans, temp sorts and index suggestions"""
+
+    def __init__(self, plan, scans, sorts, suggestions):
+        self.plan = plan                     # [(id, parent, detail)]
+        self.scans = scans                   # tables read in full
+        self.sorts = sorts                   # "ORDER BY", "GROUP BY", "DISTINCT", ...
+        self.suggestions = suggestions
+
+    def plan_text(self):
+        depth = {0: -1}
+        lines = []
+        for node, parent, detail in self.plan:
+            depth[node] = depth.get(parent, -1) + 1
+            lines.append("  " * depth[node] + detail)
+        return "\n".join(lines)
+
+    def issues(self):
+        return ([f"Full table scan of {table}" for table in self.scans]
+                + [f"Temporary B-tree for {what}" for what in self.sorts])
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# Function to pull the tables, aliases and WHERE/JOIN/ORDER BY columns out of a SELECT
+def _query_columns(sql):
+    """Return (aliases, references); references are (qualifier, column, role, lowered).
+
+    role is "eq", "range" or "order". This is a token scan, not a parser: it is
+    only used to rank index candidates, and SQLite's plan has the final word.
+    """
+    tokens = sql_tokens(sql)
+    aliases = {}
+    references = []
+    clause_stack = []
+    clause = None
+    for i, (kind, text) in enumerate(tokens):
+        previous = tokens[i - 1] if i else (None, None)
+        following = tokens[i + 1] if i + 1 < len(tokens) else (None, None)
+        if kind == "op" and text == "(":
+            clause_stack.append(clause)
+            continue
+        if kind == "op" and text == ")":
+            clause = clause_stack.pop() if clause_stack else None
+            continue
+        if kind == "keyword":
+            if text in ("select", "from", "where", "on", "having", "limit"):
+                clause = text
+            elif text == "join":
+                clause = "from"
+            elif text == "by" and previous[1] in ("group", "order"):
+                clause = "order"
+            continue
+        if kind != "name" or following == ("op", "("):
+            continue
+
+        if clause == "from":
+            # "table [AS] alias" right after FROM, JOIN or a comma
+            if previous in (("keyword", "from"), ("keyword", "join"), ("op", ",")):
+                aliases.setdefault(text, text)
+                alias = tokens[i + 2] if following == ("keyword", "as") and i + 2 < len(tokens) else following
+                if alias[0] == "name":
+                    aliases[alias[1]] = text
+            continue
+        if clause not in ("where", "on", "order"):
+            continue
+        if following == ("op", "."):
+            continue                         # qualifier; the column comes next
+        qualifier = tokens[i - 2][1] if previous == ("op", ".") and i >= 2 else None
+        start = i - 2 if qualifier else i
+        after = i + 1
+        # LOWER(col) compares the lowered value; only an index on that expression can serve it
+        lowered = (start >= 2 and tokens[start - 1] == ("op", "(") and tokens[start - 2][0] == "name"
+                   and tokens[start - 2][1].lower() == "lower")
+        if lowered:
+            if after >= len(tokens) or tokens[after] != ("op", ")"):
+                continue
+            start -= 2
+            after += 1
+        operator = tokens[after][1] if after < len(tokens) else None
+        before = tokens[start - 1][1] if start >= 1 else None
+        if clause == "order":
+            role = "order"
+        elif operator in _EQUALITY_OPS or before in ("=", "=="):
+            role = "eq"
+        elif operator in _RANGE_OPS or before in _RANGE_OPS:
+            role = "range"
+        else:
+            continue
+        references.append((qualifier, text, role, lowered))
+    return aliases, references
+
+
+# Function to run EXPLAIN QUERY PLAN and record which columns of which tables the query reads
+def explain_plan(sql, db_path=DB_PATH):
+    """Return (plan rows, {table: [columns read]}); raises sqlite3.Error"""
+    read = {}
+
+    def authorizer(action, table, column, database, trigger):
+        if action == sqlite3.SQLITE_READ and table and column and not trigger:
+            columns = read.setdefault(table, [])
+            if column not in columns:
+                columns.append(column)
+        return sqlite3.SQLITE_OK
+
+    with read_connection(db_path) as conn:
+        conn.set_authorizer(authorizer)
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        finally:
+            conn.set_authorizer(None)
+    return [(node, parent, detail) for node, parent, _, detail in plan], read
+
+
+def _existing_indexes(table, db_path):
+    # Key columns of every index on the table (None for expression columns)
+    with read_connection(db_path) as conn:
+        names = [row[1] for row in conn.execute(f"PRAGMA index_list({_quote(table)})")]
+        return [[row[2] for row in conn.execute(f"PRAGMA index_info({_quote(name)})")] for name in names]
+
+
+# Function to analyze a query's plan and propose indexes for the tables it scans in full
+def analyze_query(sql, db_path=DB_PATH):
+    plan, read = explain_plan(sql, db_path)
+    catalog = get_catalog(db_path)
+    aliases, references = _query_columns(sql)
+
+    scans = []
+    sorts = []
+    for _, _, detail in plan:
+        scan = _FULL_SCAN.match(detail)
+        if scan:
+            table = aliases.get(scan.group(1), scan.group(1))
+            if catalog.table_exists(table) and table not in scans:
+                scans.append(table)
+        sort = _TEMP_BTREE.match(detail)
+        if sort:
+            sorts.append(sort.group(1))
+
+    # Resolve each reference to a table: through its qualifier, or the only scanned table having that column
+    by_table = {}
+    for qualifier, column, role, lowered in references:
+        if qualifier:
+            table = aliases.get(qualifier, qualifier)
+        else:
+            owners = [name for name in dict.fromkeys(aliases.values())
+                      if any(col["name"].lower() == column.lower() for col in catalog.columns(name))]
+            table = owners[0] if len(owners) == 1 else None
+        if table is None:
+            continue
+        real = next((col["name"] for col in catalog.columns(table) if col["name"].lower() == column.lower()), None)
+        if real is None:
+            continue
+        key = f"LOWER({_quote(real)})" if lowered else real
+        by_table.setdefault(table, []).append((key, role))
+
+    suggestions = []
+    for table in scans:
+        refs = by_table.get(table, [])
+        keys = list(dict.fromkeys(key for key, role in refs if role == "eq"))
+        ranges = [key for key, role in refs if role == "range" and key not in keys]
+        if ranges:
+            keys.append(ranges[0])
+        elif len(set(aliases.values())) == 1:
+            # Single-table query: the index order can also replace the sort
+            keys += [key for key, role in refs if role == "order" and key not in keys]
+        if not keys:
+            continue
+        if any(index[:len(keys)] == keys for index in _existing_indexes(table, db_path)):
+            continue
+        reason = "covers the filter" if any(role != "order" for _, role in refs) else "replaces the sort"
+        covering = [column for column in read.get(table, []) if column not in keys]
+        if covering and len(keys) + len(covering) <= COVERING_MAX_COLUMNS:
+            keys += covering
+            reason += " and every column read (covering)"
+        suggestions.append(IndexSuggestion(table, keys, reason))
+    return PlanReport(plan, scans, sorts, suggestions)
+
+
+# Function to reduce a query to its shape: literals become ?, whitespace and case are normalized
+def query_shape(sql):
+    parts = []
+    for kind, text in sql_tokens(sql):
+        parts.append("?" if kind in ("string", "number") else text.lower())
+    return hashlib.sha256(" ".join(parts).encode("utf-8")).hexdigest()
+
+
+class IndexLog:
+    """Before/after timings of indexes created from suggestions, keyed by query shape"""
+
+    def __init__(self, path=SIDE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                with write_connection(self.path) as conn:
+                    conn.execute(INDEX_LOG_SCHEMA)
+                self._ready = True
+
+    def record(self, sql, suggestion, before_ms, after_ms):
+        self._ensure_schema()
+        with write_connection(self.path) as conn:
+            conn.execute(
+                "INSERT INTO _t2sql_index_log (shape_hash, table_name, index_sql, query_sql, before_ms, after_ms, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (query_shape(sql), suggestion.table, suggestion.sql, sql, before_ms, after_ms, time.time()),
+            )
+
+    def history(self, sql):
+        # {index_sql: (before_ms, after_ms)} of the latest run of each index for this query shape
+        self._ensure_schema()
+        with read_connection(self.path) as conn:
+            rows = conn.execute(
+                "SELECT index_sql, before_ms, after_ms FROM _t2sql_index_log WHERE shape_hash = ? ORDER BY created_at",
+                (query_shape(sql),),
+            ).fetchall()
+        return {index_sql: (before_ms, after_ms) for index_sql, before_ms, after_ms in rows}
+
+    def entries(self, limit=100):
+        self._ensure_schema()
+        with read_connection(self.path) as conn:
+            return conn.execute(
+                "SELECT table_name, index_sql, before_ms, after_ms, created_at FROM _t2sql_index_log "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+
+def paid_off(before_ms, after_ms):
+    return after_ms <= before_ms * PAYOFF_RATIO
+
+
+# Function to analyze a query and rank its suggestions by what earlier indexes did for the same shape
+def advise(sql, db_path=DB_PATH, index_log=None):
+    report = analyze_query(sql, db_path)
+    history = (index_log or get_index_log()).history(sql)
+    for suggestion in report.suggestions:
+        suggestion.history = history.get(suggestion.sql)
+    # Indexes that paid off for this shape before come first
+    report.suggestions.sort(key=lambda s: not (s.history and paid_off(*s.history)))
+    return report
+
+
+# Function to build a suggested index on the user database
+def create_index(suggestion, db_path=DB_PATH):
+    with write_connection(db_path) as conn:
+        conn.execute(suggestion.sql)
+        # Fresh statistics let the planner weigh the new index against the others
+        conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+        conn.execute(f'ANALYZE "{suggestion.name}"')
+        conn.execute("PRAGMA analysis_limit=0")
+
+
+# Function to get the process-wide index log
+def get_index_log():
+    return side_store(IndexLog)
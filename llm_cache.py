@@ -0,0 +1,178 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from db import SIDE_DB_PATH, read_connection, side_store, write_connection
+
+# Eviction settings (entries older than the TTL are never served)
+CACHE_TTL_SECONDS = int(os.getenv("T2SQL_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("T2SQL_LLM_CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("T2SQL_LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+CACHE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS _t2sql_llm_cache (
+        cache_key TEXT PRIMARY KEY,
+        question TEXT NOT NULL,
+        schema_hash TEXT NOT NULL,
+        prompt_version TEXT NOT NULL,
+        response TEXT NOT NULL,
+        size_bytes INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used_at REAL NOT NULL,
+        hit_count INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS _t2sql_llm_cache_lru ON _t2sql_llm_cache (last_used_at)",
+    """
+    CREATE TABLE IF NOT EXISTS _t2sql_llm_cache_stats (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    """,
+]
+
+
+# Function to normalize a question so trivial differences share a cache entry
+def normalize_question(question):
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?.!; ").strip()
+
+
+# Function to fingerprint any text (schema, prompt) for use in cache keys
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of generated SQL, persisted in a SQLite side table.
+
+    Entries are keyed by the normalized question, the schema fingerprint and
+    the prompt version, so databases sharing the side file (and a schema
+    before and after a change) keep separate entries. Entries of schemas no
+    longer in use are never hit again and age out through the TTL and LRU limits.
+    """
+
+    def __init__(self, path=SIDE_DB_PATH, ttl_seconds=CACHE_TTL_SECONDS,
+                 max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            with write_connection(self.path) as conn:
+                for statement in CACHE_SCHEMA:
+                    conn.execute(statement)
+            self._ready = True
+
+    def _key(self, question, schema_hash, prompt_version):
+        raw = "\x1f".join([normalize_question(question), schema_hash, prompt_version])
+        return text_hash(raw)
+
+    def _bump(self, conn, name):
+        conn.execute(
+            "INSERT INTO _t2sql_llm_cache_stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, question, schema_hash, prompt_version):
+        self._ensure_schema()
+        key = self._key(question, schema_hash, prompt_version)
+        now = time.time()
+
+        with write_connection(self.path) as conn:
+            row = conn.execute(
+                "SELECT response, created_at FROM _t2sql_llm_cache WHERE cache_key = ?",
+                (key,),
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM _t2sql_llm_cache WHERE cache_key = ?", (key,))
+                self._bump(conn, "misses")
+                return None
+            conn.execute(
+                "UPDATE _t2sql_llm_cache SET last_used_at = ?, hit_count = hit_count + 1 "
+                "WHERE cache_key = ?",
+                (now, key),
+            )
+            self._bump(conn, "hits")
+        return row[0]
+
+    def put(self, question, schema_hash, prompt_version, response):
+        self._ensure_schema()
+        key = self._key(question, schema_hash, prompt_version)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+
+        with write_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO _t2sql_llm_cache "
+                "(cache_key, question, schema_hash, prompt_version, response, size_bytes, "
+                "created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_question(question), schema_hash, prompt_version,
+                 response, size, now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM _t2sql_llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM _t2sql_llm_cache"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Walk entries from least to most recently used until both limits hold
+        victims = []
+        for key, size in conn.execute(
+            "SELECT cache_key, size_bytes FROM _t2sql_llm_cache ORDER BY last_used_at"
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM _t2sql_llm_cache WHERE cache_key = ?", victims)
+        for _ in victims:
+            self._bump(conn, "evictions")
+
+    def stats(self):
+        self._ensure_schema()
+        with read_connection(self.path) as conn:
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM _t2sql_llm_cache"
+            ).fetchone()
+            counters = dict(conn.execute("SELECT name, value FROM _t2sql_llm_cache_stats"))
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": count,
+            "bytes": total,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def clear(self):
+        self._ensure_schema()
+        with write_connection(self.path) as conn:
+            conn.execute("DELETE FROM _t2sql_llm_cache")
+            conn.execute("DELETE FROM _t2sql_llm_cache_stats")
+
+
+# Function to get the process-wide response cache
+def get_response_cache():
+    return side_store(ResponseCache)
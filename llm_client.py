@@ -0,0 +1,273 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Which backend answers prompts: "gemini" (default) or "mock" for offline load testing
+LLM_BACKEND = os.getenv("T2SQL_LLM_BACKEND", "gemini")
+
+# Gemini endpoint; the base URL can point at a local stand-in
+GEMINI_MODEL = os.getenv("T2SQL_GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_BASE_URL = os.getenv("T2SQL_GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+
+# Timeouts in seconds: connect and read are separate so a hung upstream cannot block forever
+CONNECT_TIMEOUT = float(os.getenv("T2SQL_LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("T2SQL_LLM_READ_TIMEOUT", "60"))
+
+# Retry policy for 429 and 5xx responses (jittered exponential backoff)
+MAX_RETRIES = int(os.getenv("T2SQL_LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("T2SQL_LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("T2SQL_LLM_BACKOFF_MAX", "8"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Send a second, hedged request when the first takes longer than this (0 disables hedging)
+HEDGE_AFTER = float(os.getenv("T2SQL_LLM_HEDGE_AFTER", "0"))
+
+# Keep-alive connections held open to the API
+POOL_SIZE = int(os.getenv("T2SQL_LLM_POOL_SIZE", "16"))
+
+# Mock backend settings
+MOCK_DELAY = float(os.getenv("T2SQL_MOCK_DELAY", "0.5"))
+MOCK_SQL = os.getenv("T2SQL_MOCK_SQL")
+
+
+class LLMError(Exception):
+    """Raised when the model backend could not produce a response"""
+
+
+# Function to compute a full-jitter backoff delay for a retry attempt
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Function to pull the generated text out of a generateContent response body
+def extract_text(response_json):
+    candidates = response_json.get("candidates", [])
+    if not candidates:
+        raise LLMError("No response generated")
+
+    content = candidates[0].get("content", {}).get("parts", [])
+    if not content:
+        raise LLMError("No content generated")
+
+    return content[0].get("text", "No text found")
+
+
+# Function to pull the text out of one streamed chunk (the last chunk may carry no text)
+def extract_chunk_text(chunk):
+    candidates = chunk.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+
+class GeminiClient:
+    """Gemini REST client with a pooled keep-alive session, timeouts, retries and hedging"""
+
+    def __init__(self, api_key=API_KEY, model=GEMINI_MODEL, base_url=GEMINI_BASE_URL,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, hedge_after=HEDGE_AFTER, pool_size=POOL_SIZE):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+        self.name = f"gemini:{model}"
+
+        # requests is imported with the first client, not when a page merely imports this module
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm-hedge")
+
+    def endpoint(self, method):
+        return f"{self.base_url}/models/{self.model}:{method}"
+
+    def _post(self, method, payload, stream=False):
+        import requests
+        if not self.api_key:
+            raise LLMError("API Error: GOOGLE_API_KEY is not set")
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    self.endpoint(method),
+                    params={"key": self.api_key, "alt": "sse"} if stream else {"key": self.api_key},
+                    json=payload,
+                    timeout=self.timeout,
+                    stream=stream,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise LLMError(f"API Error: {e}") from e
+                time.sleep(backoff_delay(attempt))
+                continue
+
+            if response.status_code == 200:
+                return response
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else backoff_delay(attempt)
+                response.close()
+                time.sleep(min(delay, BACKOFF_MAX))
+                continue
+
+            raise LLMError(f"API Error: {response.status_code}, {response.text}")
+
+        raise LLMError("API Error: retries exhausted")
+
+    def _generate_once(self, payload):
+        response = self._post("generateContent", payload)
+        try:
+            return extract_text(response.json())
+        except ValueError as e:
+            raise LLMError("Invalid JSON response from API") from e
+
+    def generate(self, prompt):
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        if not self.hedge_after:
+            return self._generate_once(payload)
+
+        # Hedged request: if the first call is slow, race a second one and keep the winner
+        first = self._executor.submit(self._generate_once, payload)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        pending = {first, self._executor.submit(self._generate_once, payload)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def stream(self, prompt):
+        """Yield response text as the server sends it (server-sent events)"""
+        import requests
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        # Retries only cover failures before the first byte; a broken stream is an error
+        response = self._post("streamGenerateContent", payload, stream=True)
+        with response:
+            lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+            while True:
+                try:
+                    line = next(lines, None)
+                except requests.RequestException as e:
+                    raise LLMError(f"API Error: stream interrupted: {e}") from e
+                if line is None:
+                    break
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    chunk = json.loads(line[len("data:"):].strip())
+                except ValueError as e:
+                    raise LLMError("Invalid JSON response from API") from e
+                text = extract_chunk_text(chunk)
+                if text:
+                    yield text
+
+
+class MockLLMClient:
+    """Offline backend returning canned SQL after a fixed delay, for load tests"""
+
+    def __init__(self, delay=MOCK_DELAY, sql=MOCK_SQL):
+        self.delay = delay
+        self.sql = sql
+        self.name = "mock"
+
+    def _response(self, prompt):
+        if self.sql:
+            return self.sql
+        # Query the first table in the prompt's schema so the SQL actually runs
+        match = re.search(r"^Table: (.+)$", prompt, re.MULTILINE)
+        if not match:
+            return "SELECT 1"
+        return f'SELECT * FROM "{match.group(1)}" LIMIT 10;'
+
+    def generate(self, prompt):
+        time.sleep(self.delay)
+        return self._response(prompt)
+
+    def stream(self, prompt):
+        # Spread the same total delay over a handful of word-sized chunks
+        words = self._response(prompt).split(" ")
+        for index, word in enumerate(words):
+            time.sleep(self.delay / len(words))
+            yield word if index == 0 else " " + word
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class RateLimitedClient:
+    """Wraps a client so every model call first takes a token from a shared bucket"""
+
+    def __init__(self, client, bucket):
+        self.client = client
+        self.bucket = bucket
+        self.name = client.name
+
+    def generate(self, prompt):
+        self.bucket.acquire()
+        return self.client.generate(prompt)
+
+    def stream(self, prompt):
+        self.bucket.acquire()
+        return self.client.stream(prompt)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# Function to get the configured, process-wide LLM client
+def get_llm_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = MockLLMClient() if LLM_BACKEND == "mock" else GeminiClient()
+        return _client
+
+
+# Function to replace the process-wide client (tests, benchmarks, scripts)
+def set_llm_client(client):
+    global _client
+    with _client_lock:
+        _client = client
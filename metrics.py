@@ -0,0 +1,107 @@
+import json
+import sqlite3
+import streamlit as st
+import pandas as pd
+from tracing import METRICS_HOST, METRICS_PORT, get_query_log
+
+# Stages in pipeline order; anything else recorded is listed after these
+STAGE_ORDER = [
+    "cache_lookup", "schema", "prompt", "llm", "validate", "repair", "query", "dataframe", "render",
+    "read", "parse_wait", "transform", "insert", "load", "indexes", "analyze", "vacuum", "total",
+]
+
+# Traces summarized by default
+DEFAULT_WINDOW = 500
+
+
+# Function to build the per-stage percentile table for the newest `window` traces of a kind
+def stage_table(kind, window):
+    summary = get_query_log().stage_summary(kind, window)
+    order = {stage: index for index, stage in enumerate(STAGE_ORDER)}
+    stages = sorted(summary, key=lambda stage: (order.get(stage, len(order) - 1), stage))
+    return pd.DataFrame(
+        [[stage, summary[stage]["count"], summary[stage]["p50_ms"], summary[stage]["p95_ms"],
+          summary[stage]["p99_ms"], summary[stage]["mean_ms"]] for stage in stages],
+        columns=["Stage", "Count", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Mean (ms)"],
+    )
+
+
+# Function to count hits per cache from the <cache>_cache_hit attributes of traces
+def cache_hit_rates(traces):
+    lookups = {}
+    for record in traces:
+        for name, value in record["attributes"].items():
+            if name.endswith("_cache_hit") and isinstance(value, bool):
+                hits, total = lookups.get(name[:-len("_cache_hit")], (0, 0))
+                lookups[name[:-len("_cache_hit")]] = (hits + value, total + 1)
+    return {cache: hits / total for cache, (hits, total) in lookups.items()}
+
+
+def run_metrics_page():
+    st.title("📈 Pipeline Metrics")
+    st.write("Where the time goes in SQL generation and imports: per-stage latency over the most recent requests.")
+
+    log = get_query_log()
+    try:
+        kinds = log.kinds()
+    except sqlite3.Error as e:
+        st.error(f"❌ Could not read the query log: {e}")
+        return
+    if not kinds:
+        st.info("ℹ️ No requests traced yet. Generate SQL or import a file, then come back.")
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        kind = st.selectbox("Request type", kinds, index=kinds.index("generate") if "generate" in kinds else 0)
+    with col2:
+        window = int(st.number_input("Most recent requests", min_value=10, value=DEFAULT_WINDOW, step=100))
+
+    traces = log.recent(kind, window)
+    errors = sum(1 for record in traces if record["error"])
+    table = stage_table(kind, window)
+    total = table[table["Stage"] == "total"]
+
+    cols = st.columns(3)
+    cols[0].metric("Requests", len(traces))
+    cols[1].metric("Errors", f"{errors / len(traces):.0%}" if traces else "0%")
+    if not total.empty:
+        cols[2].metric("Median total", f"{total['p50 (ms)'].iloc[0]:,.0f} ms")
+    rates = cache_hit_rates(traces)
+    if rates:
+        st.caption(" · ".join(f"{cache.replace('_', ' ')} cache hit rate {rate:.0%}" for cache, rate in rates.items()))
+
+    st.subheader("⏱️ Stage latency")
+    st.dataframe(table.round(2), hide_index=True)
+    st.bar_chart(table[table["Stage"] != "total"].set_index("Stage")[["p50 (ms)", "p95 (ms)"]])
+
+    st.subheader("🧾 Recent requests")
+    recent = pd.DataFrame([
+        {
+            "Started": pd.to_datetime(record["started_at"], unit="s"),
+            "Total (ms)": record["total_ms"],
+            **{f"{stage} (ms)": ms for stage, ms in record["stages"].items()},
+            **record["attributes"],
+            "Error": record["error"],
+        }
+        for record in traces[:100]
+    ])
+    st.dataframe(recent, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📥 Download traces (JSONL)",
+            data="".join(json.dumps(record, default=str) + "\n" for record in traces),
+            file_name=f"traces_{kind}.jsonl",
+            mime="application/x-ndjson",
+        )
+    with col2:
+        if st.button("🗑️ Clear query log"):
+            log.clear()
+            st.rerun()
+
+    if METRICS_PORT:
+        st.caption(f"Prometheus endpoint: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    else:
+        st.caption("Set T2SQL_METRICS_PORT to serve these timings to Prometheus at /metrics.")
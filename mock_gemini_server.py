@@ -0,0 +1,124 @@
+"""Local stand-in for the Gemini generateContent / streamGenerateContent endpoints.
+
+Point the app at it with
+    T2SQL_GEMINI_BASE_URL=http://127.0.0.1:8765/v1beta GOOGLE_API_KEY=test
+and run
+    python mock_gemini_server.py --port 8765 --latency 0.8
+
+With --drop-after N the stream is cut after N events, as a dropped connection would.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_SQL = "SELECT 1;"
+
+
+class MockGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Set per server by start_mock_server()
+    latency = 0.0
+    chunk_delay = 0.05
+    chunk_size = 8
+    sql = DEFAULT_SQL
+    drop_after = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, prompt):
+        if self.sql != DEFAULT_SQL:
+            return self.sql
+        # Without a configured answer, query the first table named in the prompt
+        match = re.search(r"^Table: (.+)$", prompt, re.MULTILINE)
+        return f'SELECT * FROM "{match.group(1)}" LIMIT 10;' if match else self.sql
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data):
+        # HTTP/1.1 chunked framing, as the real API uses, so clients see each event immediately
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            prompt = payload["contents"][0]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError):
+            self._send_json(400, {"error": {"message": "Invalid request body"}})
+            return
+
+        time.sleep(self.latency)
+        answer = self._answer(prompt)
+
+        if ":streamGenerateContent" in self.path:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for index, start in enumerate(range(0, len(answer), self.chunk_size)):
+                if index == self.drop_after:
+                    # No terminating chunk: the client sees the connection end mid-stream
+                    self.close_connection = True
+                    return
+                piece = answer[start:start + self.chunk_size]
+                chunk = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\r\n\r\n".encode("utf-8"))
+                time.sleep(self.chunk_delay)
+            self._write_chunk(b"")
+        elif ":generateContent" in self.path:
+            time.sleep(self.chunk_delay * (len(answer) // self.chunk_size))
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": answer}], "role": "model"}}]})
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown method {self.path}"}})
+
+
+# Function to start the mock server on a background thread; returns (server, base_url)
+def start_mock_server(host="127.0.0.1", port=0, latency=0.0, chunk_delay=0.05, chunk_size=8, sql=DEFAULT_SQL,
+                      drop_after=None):
+    handler = type("ConfiguredMockGeminiHandler", (MockGeminiHandler,), {
+        "latency": latency,
+        "chunk_delay": chunk_delay,
+        "chunk_size": chunk_size,
+        "sql": sql,
+        "drop_after": drop_after,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}/v1beta"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Gemini API for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first byte")
+    parser.add_argument("--chunk-delay", type=float, default=0.05, help="seconds between streamed chunks")
+    parser.add_argument("--chunk-size", type=int, default=8, help="characters per streamed chunk")
+    parser.add_argument("--sql", default=DEFAULT_SQL, help="answer to return for every prompt")
+    parser.add_argument("--drop-after", type=int, default=None, help="cut the stream after this many events")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.host, args.port, args.latency, args.chunk_delay, args.chunk_size, args.sql,
+                                         args.drop_after)
+    print(f"Mock Gemini API listening on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
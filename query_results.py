@@ -0,0 +1,183 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from db import DB_PATH, read_connection
+from sql_text import sql_tokens
+
+# Largest result kept in memory for display; bigger results are truncated (the export streams everything)
+RESULT_MAX_ROWS = int(os.getenv("T2SQL_RESULT_MAX_ROWS", "10000"))
+RESULT_MAX_BYTES = int(os.getenv("T2SQL_RESULT_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Rows pulled from the cursor per fetchmany() call
+FETCH_BATCH_ROWS = 1000
+
+# Execution budget for generated SQL: wall-clock seconds and SQLite VM instructions (0 disables either)
+QUERY_TIMEOUT = float(os.getenv("T2SQL_QUERY_TIMEOUT", "30"))
+QUERY_MAX_INSTRUCTIONS = int(os.getenv("T2SQL_QUERY_MAX_INSTRUCTIONS", "0"))
+
+# VM instructions between budget checks
+PROGRESS_INTERVAL = 10000
+
+# Statements that can be wrapped in SELECT * FROM (...) LIMIT n
+_QUERY_START = re.compile(r"^\s*(SELECT|WITH|VALUES)\b", re.IGNORECASE)
+
+
+class QueryInterrupted(sqlite3.OperationalError):
+    """A query was stopped by its budget or cancelled; `reason` says which"""
+
+    def __init__(self, reason):
+        super().__init__(f"Query stopped: {reason}")
+        self.reason = reason
+
+
+class QueryBudget:
+    """Time and instruction budget for one query, enforced by an SQLite progress handler.
+
+    cancel() may be called from any thread; it also interrupts a statement that
+    is busy inside a single step.
+    """
+
+    def __init__(self, timeout=QUERY_TIMEOUT, max_instructions=QUERY_MAX_INSTRUCTIONS):
+        self.timeout = timeout
+        self.max_instructions = max_instructions
+        self.instructions = 0
+        self.reason = None
+        self._deadline = None
+        self._cancelled = threading.Event()
+        self._conn = None
+
+    def cancel(self):
+        self._cancelled.set()
+        conn = self._conn
+        if conn is not None:
+            conn.interrupt()
+
+    def _check(self):
+        # Returning non-zero makes SQLite abort the statement with SQLITE_INTERRUPT
+        self.instructions += PROGRESS_INTERVAL
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif self._deadline is not None and time.monotonic() > self._deadline:
+            self.reason = f"time limit of {self.timeout:g} s reached"
+        elif self.max_instructions and self.instructions > self.max_instructions:
+            self.reason = f"instruction budget of {self.max_instructions:,} reached"
+        return 1 if self.reason else 0
+
+    @contextmanager
+    def attach(self, conn):
+        self._deadline = time.monotonic() + self.timeout if self.timeout else None
+        self._conn = conn
+        conn.set_progress_handler(self._check, PROGRESS_INTERVAL)
+        try:
+            if self._cancelled.is_set():
+                self.reason = "cancelled"
+                raise QueryInterrupted(self.reason)
+            yield
+        except sqlite3.OperationalError as e:
+            if self.reason is None and self._cancelled.is_set():
+                # interrupt() stopped the statement before the handler ran
+                self.reason = "cancelled"
+            if self.reason and not isinstance(e, QueryInterrupted):
+                raise QueryInterrupted(self.reason) from e
+            raise
+        finally:
+            # The connection goes back to the pool; it must not carry this handler
+            conn.set_progress_handler(None, 0)
+            self._conn = None
+
+
+class QueryResult:
+    """Rows of a query, capped in rows and bytes, with the reason it was cut short (if it was)"""
+
+    def __init__(self, columns, rows, truncated=None, size=0, cached=False):
+        self.columns = columns
+        self.rows = rows
+        self.truncated = truncated   # None, "rows" or "bytes"
+        self.size = size
+        self.cached = cached         # served by result_cache instead of SQLite
+
+    def __len__(self):
+        return len(self.rows)
+
+    def notice(self):
+        if self.truncated == "rows":
+            return f"Result truncated at {len(self.rows):,} rows"
+        if self.truncated == "bytes":
+            return f"Result truncated at {len(self.rows):,} rows ({self.size / 1024 / 1024:.0f} MB limit)"
+        return None
+
+
+# Function to roughly size a row in memory without walking Python object internals
+def row_size(row):
+    size = 56 + 8 * len(row)
+    for value in row:
+        if isinstance(value, (str, bytes)):
+            size += 49 + len(value)
+        elif value is not None:
+            size += 32
+    return size
+
+
+# Function to check that sql is a single SELECT / WITH / VALUES statement
+def is_read_only(sql):
+    statement = sql.strip().rstrip(";").strip()
+    # A ; inside a string literal or comment is not a statement separator
+    tokens = sql_tokens(statement)
+    if tokens and tokens[-1] == ("op", ";"):
+        tokens.pop()
+    return bool(_QUERY_START.match(statement)) and ("op", ";") not in tokens
+
+
+# Function to cap a SELECT with an outer LIMIT so SQLite can stop (or top-N sort) early
+def inject_limit(sql, limit):
+    """Return sql wrapped as SELECT * FROM (sql) LIMIT n; other statements are returned unchanged"""
+    if not is_read_only(sql):
+        return sql
+    statement = sql.strip().rstrip(";").strip()
+    if ("op", ";") in sql_tokens(statement):
+        # The terminating ; sits before a trailing comment; wrapping would put it inside the subquery
+        return sql
+    return f"SELECT * FROM ({statement}\n) LIMIT {int(limit)}"
+
+
+# Function to run a query and keep at most max_rows rows / max_bytes bytes of its result
+def fetch_bounded(sql, db_path=DB_PATH, params=None, max_rows=RESULT_MAX_ROWS, max_bytes=RESULT_MAX_BYTES,
+                  preview_limit=False, budget=None):
+    """Execute `sql` on a pooled reader and return a QueryResult.
+
+    Rows are pulled with fetchmany() and counted as they arrive, so a huge result
+    never materializes. With preview_limit, a LIMIT of max_rows + 1 is added to
+    SELECT statements so SQLite itself stops early. A QueryBudget (default: the
+    configured time and instruction limits) bounds execution; running out of it
+    raises QueryInterrupted. Raises sqlite3.Error.
+    """
+    if preview_limit:
+        sql = inject_limit(sql, max_rows + 1)
+    rows = []
+    size = 0
+    truncated = None
+    budget = budget or QueryBudget()
+    with read_connection(db_path) as conn, budget.attach(conn):
+        cursor = conn.execute(sql, params or [])
+        try:
+            columns = [description[0] for description in cursor.description] if cursor.description else []
+            while truncated is None:
+                batch = cursor.fetchmany(FETCH_BATCH_ROWS)
+                if not batch:
+                    break
+                for row in batch:
+                    if len(rows) >= max_rows:
+                        truncated = "rows"
+                        break
+                    size += row_size(row)
+                    if size > max_bytes:
+                        truncated = "bytes"
+                        break
+                    rows.append(row)
+        finally:
+            # Closing the cursor finalizes the statement, so SQLite stops producing rows
+            cursor.close()
+    return QueryResult(columns, rows, truncated, size)
@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from db import DB_PATH, SIDE_DB_PATH, data_version, read_connection, side_store, write_connection
+from export import ParquetSink
+from sql_text import sql_tokens
+from query_results import RESULT_MAX_BYTES, RESULT_MAX_ROWS, QueryResult, fetch_bounded, is_read_only
+
+# Directory holding the Parquet files of cached results (indexed in the side database)
+RESULT_CACHE_DIR = os.getenv("T2SQL_RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "t2sql_results"))
+
+# Total size of the Parquet files kept; least recently used results go first
+RESULT_CACHE_MAX_BYTES = int(os.getenv("T2SQL_RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Functions whose result changes between runs of the same SQL
+VOLATILE_FUNCTIONS = {"random", "randomblob", "changes", "total_changes", "last_insert_rowid"}
+VOLATILE_WORDS = {"now", "current_date", "current_time", "current_timestamp", "localtime"}
+
+RESULT_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS _t2sql_result_cache (
+    cache_key TEXT PRIMARY KEY,
+    db_path TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    truncated TEXT,
+    result_bytes INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+)
+"""
+
+
+# Function to normalize SQL so equivalent spellings share a cache entry
+def normalize_sql(sql):
+    """Collapse whitespace and comments, lower-case keywords and names, and sort IN (...) literal lists.
+
+    String literals keep their case; they are part of what the query means.
+    """
+    tokens = [(kind, text.lower() if kind == "name" else text) for kind, text in sql_tokens(sql)]
+    while tokens and tokens[-1] == ("op", ";"):
+        tokens.pop()
+    parts = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        # IN ('b', 'a') and IN ('a', 'b') select the same rows
+        if (kind, text) == ("keyword", "in") and i + 1 < len(tokens) and tokens[i + 1] == ("op", "("):
+            end = i + 2
+            literals = []
+            while end < len(tokens) and tokens[end][0] in ("string", "number"):
+                literals.append(tokens[end][1])
+                if end + 1 < len(tokens) and tokens[end + 1] == ("op", ","):
+                    end += 2
+                    continue
+                end += 1
+                break
+            if literals and end < len(tokens) and tokens[end] == ("op", ")"):
+                parts += ["in", "(", ",".join(sorted(literals)), ")"]
+                i = end + 1
+                continue
+        parts.append(text)
+        i += 1
+    return " ".join(parts)
+
+
+# Function to decide whether a query's result can be reused while the data stays the same
+def is_cacheable(sql):
+    if not is_read_only(sql):
+        return False
+    tokens = sql_tokens(sql)
+    for i, (kind, text) in enumerate(tokens):
+        word = text.lower()
+        if word in VOLATILE_WORDS:
+            return False
+        if kind == "name" and word in VOLATILE_FUNCTIONS and i + 1 < len(tokens) and tokens[i + 1] == ("op", "("):
+            return False
+    return True
+
+
+class ResultCache:
+    """Executed query results stored as Parquet files, bounded by their total size.
+
+    Entries are keyed by the normalized SQL, its parameters and row limits, and
+    the database's data_version: any commit (from the importer, creator, viewer
+    or another process) moves data_version, so results read before it are never
+    served again and are removed on the next store.
+    """
+
+    def __init__(self, path=SIDE_DB_PATH, directory=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.path = path
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                os.makedirs(self.directory, exist_ok=True)
+                with write_connection(self.path) as conn:
+                    conn.execute(RESULT_CACHE_SCHEMA)
+                self._ready = True
+
+    def key(self, sql, db_path, params, max_rows, preview_limit):
+        raw = json.dumps([normalize_sql(sql), os.path.abspath(db_path), list(params or []), max_rows, preview_limit],
+                         default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remove(self, conn, rows):
+        conn.executemany("DELETE FROM _t2sql_result_cache WHERE cache_key = ?", [(key,) for key, _ in rows])
+        for _, file_name in rows:
+            try:
+                os.unlink(os.path.join(self.directory, file_name))
+            except OSError:
+                pass
+
+    def get(self, key, db_path, version):
+        self._ensure_schema()
+        with write_connection(self.path) as conn:
+            row = conn.execute(
+                "SELECT file_name, columns, truncated, result_bytes FROM _t2sql_result_cache "
+                "WHERE cache_key = ? AND data_version = ?",
+                (key, version),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE _t2sql_result_cache SET last_used_at = ? WHERE cache_key = ?", (time.time(), key))
+        file_name, columns, truncated, size = row
+        import pyarrow.parquet as pq
+        try:
+            table = pq.read_table(os.path.join(self.directory, file_name))
+        except OSError:
+            return None
+        rows = list(zip(*(column.to_pylist() for column in table.columns))) if table.num_columns else []
+        return QueryResult(json.loads(columns), rows, truncated, size, cached=True)
+
+    def put(self, key, db_path, version, result):
+        if not result.columns:
+            return
+        # A Parquet column has one type: values mixing SQLite storage classes (1 and 1.5, 1 and 'a')
+        # would come back converted, so such results are not cached
+        if any(len({type(value) for value in column if value is not None}) > 1 for column in zip(*result.rows)):
+            return
+        self._ensure_schema()
+        file_name = f"{key}.parquet"
+        path = os.path.join(self.directory, file_name)
+        partial = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            sink = ParquetSink(partial, [f"c{i}" for i in range(len(result.columns))])
+            sink.write(result.rows)
+            sink.close()
+        except (ValueError, OSError):
+            # Values Parquet cannot hold: just don't cache this result
+            if os.path.exists(partial):
+                os.unlink(partial)
+            return
+        os.replace(partial, path)
+        now = time.time()
+        with write_connection(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO _t2sql_result_cache (cache_key, db_path, data_version, file_name, columns, "
+                "truncated, result_bytes, size_bytes, created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, os.path.abspath(db_path), version, file_name, json.dumps(result.columns), result.truncated,
+                 result.size, os.path.getsize(path), now, now),
+            )
+            self._evict(conn, os.path.abspath(db_path), version)
+
+    def _evict(self, conn, db_path, version):
+        # Results of an older data_version can never be hit again
+        self._remove(conn, conn.execute(
+            "SELECT cache_key, file_name FROM _t2sql_result_cache WHERE db_path = ? AND data_version != ?",
+            (db_path, version),
+        ).fetchall())
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM _t2sql_result_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, file_name, size in conn.execute(
+            "SELECT cache_key, file_name, size_bytes FROM _t2sql_result_cache ORDER BY last_used_at"
+        ):
+            if total <= self.max_bytes:
+                break
+            victims.append((key, file_name))
+            total -= size
+        self._remove(conn, victims)
+
+    def stats(self):
+        self._ensure_schema()
+        with read_connection(self.path) as conn:
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM _t2sql_result_cache"
+            ).fetchone()
+        return {"entries": count, "bytes": total}
+
+    def clear(self):
+        self._ensure_schema()
+        with write_connection(self.path) as conn:
+            self._remove(conn, conn.execute("SELECT cache_key, file_name FROM _t2sql_result_cache").fetchall())
+
+
+# Function to run a read-only query through the result cache
+def cached_fetch(sql, db_path=DB_PATH, params=None, max_rows=RESULT_MAX_ROWS, max_bytes=RESULT_MAX_BYTES,
+                 preview_limit=False, budget=None, cache=None):
+    """Same as query_results.fetch_bounded, but answered from the cache while the data has not changed"""
+    if not is_cacheable(sql):
+        return fetch_bounded(sql, db_path, params, max_rows, max_bytes, preview_limit, budget)
+    cache = cache or get_result_cache()
+    key = cache.key(sql, db_path, params, max_rows, preview_limit)
+    version = data_version(db_path)
+    result = cache.get(key, db_path, version)
+    if result is not None:
+        return result
+    result = fetch_bounded(sql, db_path, params, max_rows, max_bytes, preview_limit, budget)
+    # Only store what was read from the version we looked up; a commit in between means the rows may be newer
+    if data_version(db_path) == version:
+        cache.put(key, db_path, version, result)
+    return result
+
+
+# Function to get the process-wide result cache
+def get_result_cache():
+    return side_store(ResultCache)
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from db import DB_PATH, read_connection, is_internal_table
+from table_stats import get_table_stats
+
+# One query for every column of every table, instead of one PRAGMA per table
+SCHEMA_QUERY = """
+SELECT m.name, p.cid, p.name, p.type, p."notnull", p.dflt_value, p.pk
+FROM sqlite_master AS m
+JOIN pragma_table_info(m.name) AS p
+WHERE m.type = 'table'
+ORDER BY m.rowid, p.cid
+"""
+
+# Declared foreign keys of every table, also in one query
+FOREIGN_KEY_QUERY = """
+SELECT m.name, f."from", f."table", f."to"
+FROM sqlite_master AS m
+JOIN pragma_foreign_key_list(m.name) AS f
+WHERE m.type = 'table'
+"""
+
+
+# Format schema as human-readable text
+def format_schema_for_prompt(schema):
+    schema_text = "DATABASE SCHEMA:\n"
+
+    for table, columns in schema.items():
+        schema_text += f"Table: {table}\n"
+        schema_text += "Columns:\n"
+
+        for col in columns:
+            pk_indicator = " (Primary Key)" if col["pk"] == 1 else ""
+            nullable = "NOT NULL" if col["notnull"] == 1 else "NULL"
+            schema_text += f"  - {col['name']} ({col['type']}) {nullable}{pk_indicator}\n"
+
+        schema_text += "\n"
+
+    return schema_text
+
+
+class SchemaCatalog:
+    """In-memory copy of a database schema, rebuilt only when DDL changes it.
+
+    SQLite bumps `PRAGMA schema_version` on every committed CREATE/ALTER/DROP,
+    so comparing it against the version the catalog was built from is enough to
+    detect changes made by this process, other sessions or external tools.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._version = None
+        self._schema = {}
+        self._foreign_keys = {}
+        self._prompt_text = None
+        self._fingerprint = None
+
+    @property
+    def version(self):
+        self.refresh()
+        return self._version
+
+    def refresh(self):
+        with read_connection(self.db_path) as conn:
+            version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            if version == self._version:
+                return
+            with self._lock:
+                if version == self._version:
+                    return
+                rows = conn.execute(SCHEMA_QUERY).fetchall()
+                schema = {}
+                for table, cid, name, col_type, notnull, default, pk in rows:
+                    if is_internal_table(table):
+                        continue
+                    schema.setdefault(table, []).append({
+                        "cid": cid,
+                        "name": name,
+                        "type": col_type,
+                        "notnull": notnull,
+                        "default": default,
+                        "pk": pk,
+                    })
+                foreign_keys = {}
+                for table, column, ref_table, ref_column in conn.execute(FOREIGN_KEY_QUERY):
+                    if is_internal_table(table):
+                        continue
+                    foreign_keys.setdefault(table, []).append({
+                        "column": column,
+                        "ref_table": ref_table,
+                        "ref_column": ref_column,
+                    })
+                self._schema = schema
+                self._foreign_keys = foreign_keys
+                self._prompt_text = None
+                self._fingerprint = None
+                self._version = version
+
+    def schema(self):
+        self.refresh()
+        return dict(self._schema)
+
+    def tables(self):
+        self.refresh()
+        return list(self._schema)
+
+    def table_exists(self, table_name):
+        self.refresh()
+        return table_name in self._schema
+
+    def columns(self, table_name):
+        self.refresh()
+        return list(self._schema.get(table_name, []))
+
+    def table_stats(self, table_name=None):
+        # Maintained row counts and sizes; one table, or every table when no name is given
+        stats = get_table_stats(self.tables() if table_name is None else [table_name], self.db_path)
+        return stats if table_name is None else stats[table_name]
+
+    def foreign_keys(self, table_name=None):
+        # Foreign keys of one table, or of every table when no name is given
+        self.refresh()
+        if table_name is None:
+            return dict(self._foreign_keys)
+        return list(self._foreign_keys.get(table_name, []))
+
+    def prompt_text(self):
+        self.refresh()
+        with self._lock:
+            if self._prompt_text is None:
+                self._prompt_text = format_schema_for_prompt(self._schema)
+            return self._prompt_text
+
+    def fingerprint(self):
+        # Hash of the full prompt schema; changes whenever the visible schema does
+        self.refresh()
+        with self._lock:
+            if self._prompt_text is None:
+                self._prompt_text = format_schema_for_prompt(self._schema)
+            if self._fingerprint is None:
+                self._fingerprint = hashlib.sha256(self._prompt_text.encode("utf-8")).hexdigest()
+            return self._fingerprint
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+# Function to get the shared catalog for a database path
+def get_catalog(db_path=DB_PATH):
+    with _catalogs_lock:
+        catalog = _catalogs.get(db_path)
+        if catalog is None:
+            catalog = SchemaCatalog(db_path)
+            _catalogs[db_path] = catalog
+        return catalog
@@ -0,0 +1,36 @@
+from db import DB_PATH, write_connection
+from table_stats import record_table_loaded, record_rows_changed, record_table_dropped
+
+
+# Function to create a user-defined table; returns True when it did not exist before
+def create_table(table_name, columns, db_path=DB_PATH):
+    """columns maps column name -> SQL type; raises sqlite3.Error"""
+    # Double quotes preserve the case of table and column names
+    column_definitions = ", ".join([f'"{col_name}" {col_type}' for col_name, col_type in columns.items()])
+    sql_query = f'CREATE TABLE IF NOT EXISTS "{table_name}" ({column_definitions})'
+
+    with write_connection(db_path) as conn:
+        # IF NOT EXISTS: only a new table starts its statistics at zero rows
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+        conn.execute(sql_query)
+        if not exists:
+            record_table_loaded(conn, table_name, 0)
+    return not exists
+
+
+# Function to insert one row; raises sqlite3.Error
+def insert_record(table_name, column_names, values, db_path=DB_PATH):
+    quoted_columns = [f'"{col}"' for col in column_names]
+    placeholders = ", ".join(["?" for _ in values])
+    sql_query = f'INSERT INTO "{table_name}" ({", ".join(quoted_columns)}) VALUES ({placeholders})'
+
+    with write_connection(db_path) as conn:
+        conn.execute(sql_query, values)
+        record_rows_changed(conn, table_name, 1)
+
+
+# Function to drop a table and its statistics; raises sqlite3.Error
+def drop_table(table_name, db_path=DB_PATH):
+    with write_connection(db_path) as conn:
+        conn.execute(f'DROP TABLE "{table_name}";')
+        record_table_dropped(conn, table_name)
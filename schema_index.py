@@ -0,0 +1,219 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from contextlib import nullcontext
+import numpy as np
+from db import DB_PATH, read_connection
+from schema_catalog import get_catalog, format_schema_for_prompt
+
+# Number of best-matching tables sent to the model (foreign-key neighbours are added on top)
+SCHEMA_TOP_K = int(os.getenv("T2SQL_SCHEMA_TOP_K", "8"))
+
+# Best BM25 score a question must reach before pruning is trusted; below it the full schema is used
+SCHEMA_MIN_SCORE = float(os.getenv("T2SQL_SCHEMA_MIN_SCORE", "1.5"))
+
+# Distinct text values sampled per column and indexed with the table (0 disables sampling)
+SCHEMA_SAMPLE_VALUES = int(os.getenv("T2SQL_SCHEMA_SAMPLE_VALUES", "0"))
+
+# BM25 parameters and per-field weights
+BM25_K1 = 1.2
+BM25_B = 0.75
+TABLE_NAME_WEIGHT = 3.0
+COLUMN_NAME_WEIGHT = 1.0
+VALUE_WEIGHT = 0.5
+
+STOPWORDS = {
+    "a", "all", "an", "and", "any", "are", "as", "at", "be", "by", "can", "do", "does",
+    "each", "every", "find", "for", "from", "get", "give", "have", "how", "i", "in", "is",
+    "it", "list", "many", "me", "much", "of", "on", "or", "per", "please", "show", "than",
+    "that", "the", "their", "there", "to", "what", "when", "where", "which", "who", "with",
+}
+
+
+# Function to stem a token just enough to match singular and plural forms
+def _stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+# Function to split identifiers and text into normalized search terms
+def tokenize(text):
+    # Break camelCase and snake_case identifiers into words
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text))
+    words = re.findall(r"[A-Za-z0-9]+", text.lower())
+    return [_stem(word) for word in words if word not in STOPWORDS]
+
+
+class SchemaIndex:
+    """BM25 index with one document per table (table name, column names, sampled values).
+
+    Documents are rebuilt only for tables whose columns changed since the last
+    schema version; the inverted index itself is cheap to rebuild from them.
+    """
+
+    def __init__(self, db_path, sample_values=SCHEMA_SAMPLE_VALUES):
+        self.db_path = db_path
+        self.sample_values = sample_values
+        self._lock = threading.Lock()
+        self._version = None
+        self._documents = {}   # table -> (signature, Counter of weighted terms)
+        self._tables = []
+        self._postings = {}    # term -> (doc index array, term frequency array)
+        self._doc_lengths = np.zeros(0)
+        self._neighbours = {}
+
+    def _sample_terms(self, conn, table, columns):
+        terms = Counter()
+        quoted = ", ".join(f'"{col["name"]}"' for col in columns)
+        try:
+            rows = conn.execute(f'SELECT {quoted} FROM "{table}" LIMIT ?', (self.sample_values * 4,)).fetchall()
+        except Exception:
+            return terms
+        for index in range(len(columns)):
+            values = {row[index] for row in rows if isinstance(row[index], str)}
+            for value in list(values)[: self.sample_values]:
+                for token in tokenize(value):
+                    terms[token] += VALUE_WEIGHT
+        return terms
+
+    def _document(self, table, columns, conn):
+        terms = Counter()
+        for token in tokenize(table):
+            terms[token] += TABLE_NAME_WEIGHT
+        for col in columns:
+            for token in tokenize(col["name"]):
+                terms[token] += COLUMN_NAME_WEIGHT
+        if self.sample_values and conn is not None:
+            terms.update(self._sample_terms(conn, table, columns))
+        return terms
+
+    def _link_tables(self, schema, foreign_keys):
+        # Declared foreign keys plus the "<table>_id" naming convention, in both directions
+        by_stem = {}
+        for table in schema:
+            by_stem.setdefault(" ".join(tokenize(table)), set()).add(table)
+        neighbours = {table: set() for table in schema}
+        for table, columns in schema.items():
+            for fk in foreign_keys.get(table, []):
+                if fk["ref_table"] in neighbours and fk["ref_table"] != table:
+                    neighbours[table].add(fk["ref_table"])
+                    neighbours[fk["ref_table"]].add(table)
+            for col in columns:
+                tokens = tokenize(col["name"])
+                if len(tokens) > 1 and tokens[-1] == "id":
+                    for other in by_stem.get(" ".join(tokens[:-1]), ()):
+                        if other != table:
+                            neighbours[table].add(other)
+                            neighbours[other].add(table)
+        return neighbours
+
+    def refresh(self):
+        catalog = get_catalog(self.db_path)
+        version = catalog.version
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            schema = catalog.schema()
+            documents = {}
+            with (read_connection(self.db_path) if self.sample_values else nullcontext()) as conn:
+                for table, columns in schema.items():
+                    signature = tuple((col["name"], col["type"]) for col in columns)
+                    previous = self._documents.get(table)
+                    if previous is not None and previous[0] == signature:
+                        documents[table] = previous
+                    else:
+                        documents[table] = (signature, self._document(table, columns, conn))
+
+            tables = list(documents)
+            postings = {}
+            for doc_index, table in enumerate(tables):
+                for term, weight in documents[table][1].items():
+                    postings.setdefault(term, ([], []))
+                    postings[term][0].append(doc_index)
+                    postings[term][1].append(weight)
+
+            self._documents = documents
+            self._tables = tables
+            self._postings = {
+                term: (np.array(docs, dtype=np.int64), np.array(weights, dtype=np.float64))
+                for term, (docs, weights) in postings.items()
+            }
+            self._doc_lengths = np.array(
+                [sum(documents[table][1].values()) for table in tables], dtype=np.float64
+            )
+            self._neighbours = self._link_tables(schema, catalog.foreign_keys())
+            self._version = version
+
+    def score(self, question):
+        """Return BM25 scores for every table as a {table: score} dict"""
+        self.refresh()
+        with self._lock:
+            tables = self._tables
+            if not tables:
+                return {}
+            scores = np.zeros(len(tables))
+            avg_length = self._doc_lengths.mean() or 1.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths / avg_length)
+            for term in set(tokenize(question)):
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                docs, tf = posting
+                idf = math.log(1 + (len(tables) - len(docs) + 0.5) / (len(docs) + 0.5))
+                np.add.at(scores, docs, idf * tf * (BM25_K1 + 1) / (tf + norm[docs]))
+        return dict(zip(tables, scores.tolist()))
+
+    def select_tables(self, question, top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE):
+        """Return the tables relevant to a question, or None when the full schema should be used"""
+        scores = self.score(question)
+        if len(scores) <= top_k:
+            return None
+        ranked = sorted((item for item in scores.items() if item[1] > 0), key=lambda item: -item[1])
+        if not ranked or ranked[0][1] < min_score:
+            # Low confidence: better a big prompt than a missing table
+            return None
+        selected = [table for table, _ in ranked[:top_k]]
+        with self._lock:
+            for table in list(selected):
+                for neighbour in sorted(self._neighbours.get(table, ())):
+                    if neighbour not in selected:
+                        selected.append(neighbour)
+        return selected
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# Function to get the shared index for a database path
+def get_schema_index(db_path=DB_PATH):
+    with _indexes_lock:
+        index = _indexes.get(db_path)
+        if index is None:
+            index = SchemaIndex(db_path)
+            _indexes[db_path] = index
+        return index
+
+
+# Function to build the schema text for a question, pruned to the relevant tables
+def prune_schema_for_question(question, db_path=DB_PATH, top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE):
+    """Return (schema_text, tables_used); tables_used is None when the full schema is sent"""
+    catalog = get_catalog(db_path)
+    selected = get_schema_index(db_path).select_tables(question, top_k, min_score)
+    if selected is None:
+        return catalog.prompt_text(), None
+    schema = catalog.schema()
+    subset = {table: schema[table] for table in schema if table in selected}
+    return format_schema_for_prompt(subset), list(subset)
+
+
+# Function describing the pruning settings, so cached answers are tied to them
+def pruning_signature(top_k=SCHEMA_TOP_K, min_score=SCHEMA_MIN_SCORE):
+    return f"top_k={top_k};min_score={min_score};values={SCHEMA_SAMPLE_VALUES}"
@@ -0,0 +1,421 @@
+#!/usr/bin/env python
+"""HTTP API (ASGI) over the text-to-SQL pipeline and the importer, for programs rather than browsers.
+
+    python service.py --port 8500                # or: uvicorn service:app --port 8500
+    curl -s localhost:8500/ask -d '{"question": "Average salary per department?"}'
+    curl -s localhost:8500/ask -d '{"question": "...", "format": "arrow"}' -o result.arrow
+    curl -s localhost:8500/execute -d '{"sql": "SELECT * FROM people LIMIT 5"}'
+    curl -s localhost:8500/generate -d '{"question": "...", "stream": true}'
+    curl -s "localhost:8500/import?filename=people.csv&table=staff" --data-binary @people.csv
+
+The event loop never waits on the model or on SQLite: model calls run in their own
+thread pool (sized for requests that mostly wait on the network), queries and
+validation in a smaller one, and imports one at a time, as SQLite has a single
+writer. Each client may have at most T2SQL_SERVICE_CLIENT_CONCURRENCY requests
+in flight; more are refused with 429. Clients are told apart by address, or by
+the X-Client-Id header on requests from T2SQL_SERVICE_TRUSTED_PROXIES.
+
+Results are JSON lines (a header object with the SQL and columns, then one array
+per row) or, with "format": "arrow", an Arrow IPC stream with the header in the
+X-T2SQL-Meta response header.
+"""
+import argparse
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from db import DB_PATH
+from export import arrow_table
+from generation import clean_sql, generate_sql, stream_sql, remember_sql, validate_and_repair
+from importer import IMPORT_WORKERS, MULTI_IMPORT_EXTENSIONS, collect_sources, import_csv, run_import_job
+from llm_client import LLMError
+from query_results import RESULT_MAX_ROWS, QUERY_TIMEOUT, QueryBudget, QueryInterrupted, fetch_bounded, is_read_only
+from result_cache import cached_fetch
+from schema_catalog import get_catalog
+from sql_validation import validate_sql
+from tracing import trace, span, annotate, record_error, record_trace, get_metrics
+
+SERVICE_HOST = os.getenv("T2SQL_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("T2SQL_SERVICE_PORT", "8500"))
+
+# Model calls in flight at once; these threads spend nearly all their time waiting on the network
+SERVICE_LLM_WORKERS = int(os.getenv("T2SQL_SERVICE_LLM_WORKERS", "128"))
+
+# Threads running validation, queries and result serialization (CPU and SQLite bound)
+SERVICE_QUERY_WORKERS = int(os.getenv("T2SQL_SERVICE_QUERY_WORKERS", str(min(8, (os.cpu_count() or 1) * 2))))
+
+# Requests one client may have in flight; 0 disables the limit
+CLIENT_CONCURRENCY = int(os.getenv("T2SQL_SERVICE_CLIENT_CONCURRENCY", "32"))
+
+# Largest upload /import accepts (MB)
+MAX_UPLOAD_MB = int(os.getenv("T2SQL_SERVICE_MAX_UPLOAD_MB", "1024"))
+
+# Rows per JSON-lines chunk written to the response
+NDJSON_BATCH_ROWS = 1000
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Endpoints that never count against a client's limit
+UNLIMITED_PATHS = ("/health", "/metrics")
+
+# Proxy addresses whose X-Client-Id header is believed; anyone else is keyed on their own address
+TRUSTED_PROXIES = {address.strip() for address in os.getenv("T2SQL_SERVICE_TRUSTED_PROXIES", "").split(",") if address.strip()}
+
+_llm_executor = ThreadPoolExecutor(max_workers=SERVICE_LLM_WORKERS, thread_name_prefix="api-llm")
+_query_executor = ThreadPoolExecutor(max_workers=SERVICE_QUERY_WORKERS, thread_name_prefix="api-query")
+_import_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-import")
+# Finished traces are written to the query log here, never on the event loop
+_trace_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-trace")
+
+_DONE = object()
+
+
+# Function to run blocking work in a pool without blocking the event loop
+async def run_in(executor, function, *args, **kwargs):
+    # The copied context carries the current trace into the worker thread, so spans there count
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, functools.partial(context.run, function, *args, **kwargs))
+
+
+# Function to iterate a blocking iterator (a streamed model response) from a coroutine
+async def iterate_in(executor, iterator):
+    # One context for every step, as a generator must resume in the context it started in
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(executor, context.run, next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
+
+
+# Function to trace one API request; the finished trace is recorded on a background thread
+def api_trace(kind, **attributes):
+    return trace(kind, recorder=lambda current: _trace_executor.submit(record_trace, current),
+                 interface="api", **attributes)
+
+
+def _line(value):
+    return json.dumps(value, default=str) + "\n"
+
+
+def client_id(scope):
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    # A client-chosen id would let one caller dodge its limit by rotating ids
+    if address in TRUSTED_PROXIES:
+        for name, value in scope.get("headers", []):
+            if name == b"x-client-id" and value:
+                return value.decode("latin-1")
+    return address
+
+
+class ClientConcurrencyLimit:
+    """ASGI middleware capping the requests one client has in flight.
+
+    A request over the limit is refused with 429 at once rather than queued, so one
+    busy client cannot fill the worker pools; the slot is held until the response
+    (including a streamed body) is finished.
+    """
+
+    def __init__(self, app, limit=CLIENT_CONCURRENCY):
+        self.app = app
+        self.limit = limit
+        self.active = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.limit or scope["path"] in UNLIMITED_PATHS:
+            await self.app(scope, receive, send)
+            return
+        client = client_id(scope)
+        if self.active.get(client, 0) >= self.limit:
+            response = JSONResponse({"error": f"more than {self.limit} concurrent requests from this client"},
+                                    status_code=429, headers={"Retry-After": "1"})
+            await response(scope, receive, send)
+            return
+        self.active[client] = self.active.get(client, 0) + 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active[client] -= 1
+            if not self.active[client]:
+                del self.active[client]
+
+
+async def _json_body(request):
+    try:
+        body = json.loads(await request.body() or b"{}")
+    except ValueError:
+        raise HTTPException(400, "request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(400, "request body must be a JSON object")
+    return body
+
+
+def _field(body, name, kind, default=None):
+    value = body.get(name, default)
+    if value is None:
+        raise HTTPException(400, f"'{name}' is required")
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise HTTPException(400, f"'{name}' must be {kind.__name__}")
+
+
+def _result_format(body):
+    fmt = body.get("format", "ndjson")
+    if fmt not in ("ndjson", "arrow"):
+        raise HTTPException(400, "'format' must be 'ndjson' or 'arrow'")
+    return fmt
+
+
+# Function to run a read-only query in the query pool, stopping it if the client goes away
+async def execute(sql, db_path, max_rows, timeout, use_cache):
+    budget = QueryBudget(timeout=timeout)
+    try:
+        with span("query"):
+            result = await run_in(_query_executor, cached_fetch if use_cache else fetch_bounded, sql, db_path,
+                                  max_rows=max_rows, preview_limit=True, budget=budget)
+    except asyncio.CancelledError:
+        budget.cancel()
+        raise
+    except QueryInterrupted as e:
+        raise HTTPException(504, str(e))
+    except sqlite3.Error as e:
+        raise HTTPException(400, f"query failed: {e}")
+    annotate(rows=len(result.rows), truncated=bool(result.truncated), result_cache_hit=result.cached)
+    return result
+
+
+def _arrow_stream(columns, rows):
+    import pyarrow as pa
+    table = arrow_table(columns, rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+async def _ndjson_rows(header, rows):
+    yield _line(header)
+    for start in range(0, len(rows), NDJSON_BATCH_ROWS):
+        yield "".join(_line(list(row)) for row in rows[start:start + NDJSON_BATCH_ROWS])
+
+
+async def result_response(fmt, result, **header):
+    header.update(columns=result.columns, rows=len(result.rows), truncated=result.truncated,
+                  result_cache_hit=result.cached)
+    if fmt == "arrow":
+        try:
+            body = await run_in(_query_executor, _arrow_stream, result.columns, result.rows)
+        except Exception as e:
+            raise HTTPException(400, f"result cannot be sent as Arrow ({e}); use the ndjson format")
+        # json.dumps escapes newlines and non-ASCII, so the header value stays one latin-1 line
+        return Response(body, media_type=ARROW_MEDIA_TYPE, headers={"X-T2SQL-Meta": json.dumps(header, default=str)})
+    return StreamingResponse(_ndjson_rows(header, result.rows), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics(request):
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4")
+
+
+async def schema(request):
+    db_path = request.app.state.db_path
+    tables = await run_in(_query_executor, lambda: get_catalog(db_path).schema())
+    return JSONResponse({"tables": {table: [{"name": column["name"], "type": column["type"]} for column in columns]
+                                    for table, columns in tables.items()}})
+
+
+async def _generate_stream(question, db_path, use_cache):
+    # In-band results: once the first chunk is sent the status code can no longer change
+    with api_trace("generate", streaming=True, use_cache=use_cache, question_chars=len(question)):
+        buffer = ""
+        try:
+            chunks, from_cache = await run_in(_llm_executor, stream_sql, question, db_path, use_cache=use_cache)
+            with span("llm"):
+                async for chunk in iterate_in(_llm_executor, chunks):
+                    buffer += chunk
+                    yield _line({"chunk": chunk})
+        except LLMError as e:
+            record_error(e)
+            yield _line({"error": f"generation failed: {e}"})
+            return
+        sql_query, error = clean_sql(buffer), None
+        if not from_cache:
+            with span("validate"):
+                first_error = await run_in(_query_executor, validate_sql, sql_query, db_path)
+            sql_query, error, _ = await run_in(_llm_executor, validate_and_repair, question, sql_query, db_path,
+                                               error=first_error)
+            if error is None:
+                await run_in(_query_executor, remember_sql, question, sql_query, db_path)
+        if error:
+            record_error(error)
+        yield _line({"sql": sql_query, "from_cache": from_cache, "error": error})
+
+
+async def generate(request):
+    """{"question", "use_cache"?, "stream"?} -> {"sql", "from_cache", "error"}; streamed as chunks first"""
+    db_path = request.app.state.db_path
+    body = await _json_body(request)
+    question = _field(body, "question", str)
+    use_cache = bool(body.get("use_cache", True))
+    if body.get("stream"):
+        return StreamingResponse(_generate_stream(question, db_path, use_cache), media_type=NDJSON_MEDIA_TYPE)
+
+    with api_trace("generate", use_cache=use_cache, question_chars=len(question)):
+        try:
+            sql_query, from_cache, error = await run_in(_llm_executor, generate_sql, question, db_path,
+                                                        use_cache=use_cache)
+        except LLMError as e:
+            raise HTTPException(502, f"generation failed: {e}")
+        if error:
+            record_error(error)
+    return JSONResponse({"sql": sql_query, "from_cache": from_cache, "error": error})
+
+
+async def ask(request):
+    """{"question", "format"?, "max_rows"?, "timeout"?, "use_cache"?} -> the rows of the generated SQL"""
+    db_path = request.app.state.db_path
+    body = await _json_body(request)
+    question = _field(body, "question", str)
+    fmt = _result_format(body)
+    max_rows = _field(body, "max_rows", int, RESULT_MAX_ROWS)
+    timeout = _field(body, "timeout", float, QUERY_TIMEOUT)
+    use_cache = bool(body.get("use_cache", True))
+
+    with api_trace("generate", use_cache=use_cache, question_chars=len(question)):
+        try:
+            sql_query, from_cache, error = await run_in(_llm_executor, generate_sql, question, db_path,
+                                                        use_cache=use_cache)
+        except LLMError as e:
+            raise HTTPException(502, f"generation failed: {e}")
+        # generate_sql returns its last attempt even when the repair failed
+        if error:
+            record_error(error)
+            return JSONResponse({"error": f"no valid SQL was generated: {error}", "sql": sql_query}, status_code=422)
+        result = await execute(sql_query, db_path, max_rows, timeout, use_cache)
+    return await result_response(fmt, result, sql=sql_query, from_cache=from_cache)
+
+
+async def execute_sql(request):
+    """{"sql", "format"?, "max_rows"?, "timeout"?, "use_cache"?} -> the rows of a read-only statement"""
+    db_path = request.app.state.db_path
+    body = await _json_body(request)
+    sql_query = _field(body, "sql", str)
+    if not is_read_only(sql_query):
+        raise HTTPException(400, "only SELECT statements can be run")
+    fmt = _result_format(body)
+    max_rows = _field(body, "max_rows", int, RESULT_MAX_ROWS)
+    timeout = _field(body, "timeout", float, QUERY_TIMEOUT)
+    use_cache = bool(body.get("use_cache", True))
+
+    with api_trace("execute", use_cache=use_cache):
+        result = await execute(sql_query, db_path, max_rows, timeout, use_cache)
+    return await result_response(fmt, result, sql=sql_query)
+
+
+async def _save_upload(request, path):
+    size = 0
+    with open(path, "wb") as f:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_MB * 1024 * 1024:
+                raise HTTPException(413, f"upload is larger than {MAX_UPLOAD_MB} MB")
+            f.write(chunk)
+    return size
+
+
+async def import_file(request):
+    """Raw file body, ?filename=NAME.csv|.xlsx|.zip[&table=NAME] -> the import report"""
+    db_path = request.app.state.db_path
+    filename = os.path.basename(request.query_params.get("filename", ""))
+    table = request.query_params.get("table")
+    if not filename.lower().endswith(MULTI_IMPORT_EXTENSIONS + (".zip",)):
+        raise HTTPException(400, "'filename' must name a .csv, .xlsx or .zip file")
+    if table and not filename.lower().endswith(".csv"):
+        raise HTTPException(400, "'table' only applies to a single .csv file")
+
+    with tempfile.TemporaryDirectory(prefix="t2sql_upload_") as directory:
+        path = os.path.join(directory, filename)
+        size = await _save_upload(request, path)
+        if table:
+            start = time.perf_counter()
+            with api_trace("import", mode="csv", tables=1, bytes=size):
+                try:
+                    table, rows = await run_in(_import_executor, import_csv, path, table, db_path)
+                except Exception as e:
+                    raise HTTPException(400, f"import failed: {type(e).__name__}: {e}")
+                annotate(rows=rows)
+            return JSONResponse({"files": [{"file": filename, "tables": [table], "rows": rows, "bytes": size,
+                                            "seconds": round(time.perf_counter() - start, 3), "error": None}]})
+
+        sources = collect_sources([path])
+        if not sources:
+            raise HTTPException(400, "no CSV or XLSX files found in the upload")
+        with api_trace("import", mode="multi", files=len(sources), bytes=size):
+            try:
+                report = await run_in(_import_executor, run_import_job, sources, db_path, IMPORT_WORKERS)
+            except Exception as e:
+                raise HTTPException(400, f"import failed: {type(e).__name__}: {e}")
+            failed = sum(1 for entry in report if entry["error"] is not None)
+            annotate(rows=sum(entry["rows"] for entry in report), failed_files=failed)
+    return JSONResponse({"files": report}, status_code=422 if failed else 200)
+
+
+async def http_error(request, exc):
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+
+
+# Function to build the ASGI app for one database
+def create_app(db_path=DB_PATH, client_concurrency=CLIENT_CONCURRENCY):
+    app = Starlette(
+        routes=[
+            Route("/health", health),
+            Route("/metrics", metrics),
+            Route("/schema", schema),
+            Route("/generate", generate, methods=["POST"]),
+            Route("/ask", ask, methods=["POST"]),
+            Route("/execute", execute_sql, methods=["POST"]),
+            Route("/import", import_file, methods=["POST"]),
+        ],
+        middleware=[Middleware(ClientConcurrencyLimit, limit=client_concurrency)],
+        exception_handlers={HTTPException: http_error},
+    )
+    app.state.db_path = db_path
+    return app
+
+
+app = create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text-to-SQL HTTP API")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default: {DB_PATH})")
+    parser.add_argument("--client-concurrency", type=int, default=CLIENT_CONCURRENCY,
+                        help="requests one client may have in flight (0: no limit)")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.db, args.client_concurrency), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,110 +1,218 @@
 import streamlit as st
-from dotenv import load_dotenv
 import os
-import google.generativeai as genai
 import sqlite3
+import time
 import pandas as pd
-import requests
-import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from db import DB_PATH
+from schema_catalog import get_catalog
+from llm_cache import get_response_cache
+from llm_client import LLMError
+from export_ui import render_export
+from generation import clean_sql, generate_sql, stream_sql, remember_sql, validate_and_repair
+from index_advisor import advise, create_index, get_index_log, paid_off
+from query_results import RESULT_MAX_ROWS, QUERY_TIMEOUT, QueryBudget, QueryInterrupted, fetch_bounded
+from result_cache import cached_fetch
+from sql_validation import validate_sql, get_validation_log
+from tracing import trace, span, traced, annotate, record_error
 
-# Load environment variables
-load_dotenv()
+# Background workers for checks that overlap with generation
+_validation_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sql-validate")
 
-# Configure Gemini API Key
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-API_KEY = os.getenv("GOOGLE_API_KEY")
+# Generated queries running at once across all sessions of the page (SQLite bound)
+GENERATOR_QUERY_WORKERS = int(os.getenv("T2SQL_GENERATOR_QUERY_WORKERS", "4"))
 
-# Gemini API URL
-url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={API_KEY}"
+# Generated queries run here so the page can keep polling for a cancel click
+_query_executor = ThreadPoolExecutor(max_workers=GENERATOR_QUERY_WORKERS, thread_name_prefix="sql-query")
 
-# Function to get database schema
-def get_db_schema(db_path):
-    """Extract complete database schema including tables and their columns"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Get all tables
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [table[0] for table in cursor.fetchall()]
-    
-    schema = {}
-    for table in tables:
-        # Get column information for each table
-        cursor.execute(f"PRAGMA table_info({table});")
-        columns = cursor.fetchall()
-        
-        # Store column details (name, type, nullable, default, pk)
-        schema[table] = [
-            {
-                "name": col[1],
-                "type": col[2],
-                "notnull": col[3],
-                "pk": col[5]
-            } for col in columns
-        ]
-    
-    conn.close()
-    return schema
+# Seconds between checks of a running query
+QUERY_POLL_INTERVAL = 0.25
 
-# Format schema as human-readable text
-def format_schema_for_prompt(schema):
-    schema_text = "DATABASE SCHEMA:\n"
-    
-    for table, columns in schema.items():
-        schema_text += f"Table: {table}\n"
-        schema_text += "Columns:\n"
-        
-        for col in columns:
-            pk_indicator = " (Primary Key)" if col["pk"] == 1 else ""
-            nullable = "NOT NULL" if col["notnull"] == 1 else "NULL"
-            schema_text += f"  - {col['name']} ({col['type']}) {nullable}{pk_indicator}\n"
-        
-        schema_text += "\n"
-    
-    return schema_text
+def _cancel_running_query():
+    # Button callback: runs before the rerun, usually after the stopped run's finally block has already
+    # cancelled its query and dropped the budget, so the notice cannot depend on finding it here
+    st.session_state["generator_cancelled"] = True
+    budget = st.session_state.pop("generator_budget", None)
+    if budget is not None:
+        budget.cancel()
 
-# Function to generate SQL query using Gemini
-def get_gemini_response(schema_text, question, prompt):
-    headers = {"Content-Type": "application/json"}
-    
-    # Include schema in the prompt
-    full_prompt = f"{prompt}\n\n{schema_text}\n\nQuestion: {question}\nSQL Query:"
-    
-    data = {
-        "contents": [{"parts": [{"text": full_prompt}]}]
-    }
+# Function to run a query in the background while offering a cancel button
+def run_with_cancel(sql_query, db_path, max_rows, preview_limit, timeout, use_cache=True):
+    """Return fetch_bounded's QueryResult; raises sqlite3.Error (QueryInterrupted on time-out or cancel).
+
+    The page keeps making Streamlit calls while it waits, so a click on the
+    cancel button stops this run; the finally block then cancels the query.
+    """
+    budget = QueryBudget(timeout=timeout)
+    st.session_state["generator_budget"] = budget
+    future = _query_executor.submit(cached_fetch if use_cache else fetch_bounded, sql_query, db_path,
+                                    max_rows=max_rows, preview_limit=preview_limit, budget=budget)
+    status = st.empty()
+    cancel_slot = st.empty()
+    cancel_slot.button("⛔ Cancel query", key="generator_cancel", on_click=_cancel_running_query)
+    start = time.perf_counter()
+    try:
+        while not wait([future], timeout=QUERY_POLL_INTERVAL).done:
+            status.caption(f"⏳ Running for {time.perf_counter() - start:.1f} s...")
+        return future.result()
+    finally:
+        if not future.done():
+            budget.cancel()
+        st.session_state.pop("generator_budget", None)
+        status.empty()
+        cancel_slot.empty()
+
+def _timing_text(before_ms, after_ms):
+    return f"{before_ms:,.0f} ms → {after_ms:,.0f} ms"
+
+def _time_query(last, db_path):
+    # Always against SQLite: a cached result says nothing about the plan
+    start = time.perf_counter()
+    fetch_bounded(last["sql"], db_path, max_rows=last["max_rows"], preview_limit=last["preview_limit"],
+                  budget=QueryBudget(timeout=last["timeout"]))
+    return (time.perf_counter() - start) * 1000
+
+# Function to show the query plan, its full scans and temp sorts, and one-click index suggestions
+def render_index_advice(db_path):
+    last = st.session_state["generator_last_run"]
+    try:
+        report = advise(last["sql"], db_path)
+    except sqlite3.Error as e:
+        st.caption(f"No plan available: {e}")
+        return
+    st.code(report.plan_text(), language="text")
+    for issue in report.issues():
+        st.warning(f"⚠️ {issue}")
+    if not report.suggestions:
+        st.caption("No index suggestions for this query.")
+    for i, suggestion in enumerate(report.suggestions):
+        st.code(suggestion.sql + ";", language="sql")
+        note = f"Suggested for {suggestion.table}: {suggestion.reason}."
+        if suggestion.history:
+            verdict = "paid off" if paid_off(*suggestion.history) else "did not help"
+            note += f" For this query shape it {verdict} before ({_timing_text(*suggestion.history)})."
+        st.caption(note)
+        if st.button("⚡ Create index", key=f"generator_index_{i}"):
+            with st.spinner(f"Building {suggestion.name}..."):
+                try:
+                    if last["elapsed_ms"] is None:
+                        last["elapsed_ms"] = _time_query(last, db_path)
+                    create_index(suggestion, db_path)
+                    after_ms = _time_query(last, db_path)
+                except sqlite3.Error as e:
+                    st.error(f"❌ Could not create or time the index: {e}")
+                    return
+            get_index_log().record(last["sql"], suggestion, last["elapsed_ms"], after_ms)
+            st.success(f"✅ Created {suggestion.name}: {_timing_text(last['elapsed_ms'], after_ms)}")
+            last["elapsed_ms"] = after_ms
+    entries = get_index_log().entries()
+    if entries:
+        st.caption("Indexes created from suggestions")
+        st.dataframe(pd.DataFrame(entries, columns=["Table", "Index", "Before (ms)", "After (ms)", "Created"])
+                     .assign(Created=lambda df: pd.to_datetime(df["Created"], unit="s")), hide_index=True)
+
+# Function to generate, validate, run and show the answer to one question (one traced request)
+def answer_question(question, db_path, use_cache, streaming, max_rows, preview_limit, timeout):
+    st.subheader("📝 Generated SQL Query:")
+    validation = None
+    if streaming:
+        sql_box = st.empty()
+        try:
+            chunks, from_cache = stream_sql(question, db_path, use_cache=use_cache)
+            buffer = ""
+            start = time.perf_counter()
+            # Only the waits for chunks count as "llm"; rendering them between waits does not
+            for chunk in traced(chunks, "llm"):
+                if not buffer:
+                    annotate(first_chunk_ms=round((time.perf_counter() - start) * 1000, 3))
+                buffer += chunk
+                sql_query = clean_sql(buffer)
+                sql_box.code(sql_query, language="sql")
+                # Start validating the statement as soon as it is syntactically complete
+                if validation is None and sqlite3.complete_statement(sql_query):
+                    validation = (sql_query, _validation_executor.submit(validate_sql, sql_query, db_path))
+        except LLMError as e:
+            record_error(e)
+            st.error(f"❌ {e}")
+            return
+        sql_query = clean_sql(buffer)
+        sql_box.code(sql_query, language="sql")
+    else:
+        with st.spinner("Analyzing database and generating SQL query..."):
+            try:
+                sql_query, from_cache, error = generate_sql(question, db_path, use_cache=use_cache)
+            except LLMError as e:
+                record_error(e)
+                st.error(f"❌ {e}")
+                return
+        st.code(sql_query, language="sql")
     
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+    # Streamed SQL is validated once, here (generate_sql returns its own verdict); the early
+    # check only counts if the model did not keep writing after it started
+    if streaming and from_cache:
+        error = None
+    elif streaming:
+        with span("validate"):
+            if validation is not None and validation[0] == sql_query:
+                first_error = validation[1].result()
+            else:
+                first_error = validate_sql(sql_query, db_path)
+        with st.spinner("Generated SQL failed validation, asking for a repair..." if first_error else "Validating..."):
+            sql_query, error, _ = validate_and_repair(question, sql_query, db_path, error=first_error)
+        if error is None:
+            remember_sql(question, sql_query, db_path)
+        if first_error:
+            st.caption(f"🔧 First attempt failed validation: {first_error}")
+            if error is None:
+                st.code(sql_query, language="sql")
+    if error:
+        record_error(error)
+        st.error(f"❌ SQL Error: {error}")
+        stats = get_validation_log().stats()
+        if stats["invalid"]:
+            st.caption(f"Repairs succeed for {stats['repair_rate']:.0%} of {stats['invalid']} invalid generations")
+        return
     
-    if response.status_code != 200:
-        return f"API Error: {response.status_code}, {response.text}"
+    if from_cache:
+        stats = get_response_cache().stats()
+        st.caption(f"⚡ Served from response cache (hit rate {stats['hit_rate']:.0%}, {stats['entries']} cached answers)")
     
     try:
-        response_json = response.json()
-        candidates = response_json.get("candidates", [])
-        if not candidates:
-            return "No response generated"
-        
-        content = candidates[0].get("content", {}).get("parts", [])
-        if not content:
-            return "No content generated"
-        
-        return content[0].get("text", "No text found").strip()
-    except json.JSONDecodeError:
-        return "Invalid JSON response from API"
-
-# Function to execute SQL
-def read_sql_query(sql, db, params=None):
-    try:
-        conn = sqlite3.connect(db)
-        cur = conn.cursor()
-        cur.execute(sql) if not params else cur.execute(sql, params)
-        rows = cur.fetchall()
-        columns = [desc[0] for desc in cur.description] if cur.description else []
-        conn.close()
-        return rows, columns
+        start = time.perf_counter()
+        with span("query"):
+            result = run_with_cancel(sql_query, db_path, max_rows, preview_limit, timeout, use_cache)
+        response = result.rows
+        annotate(rows=len(result.rows), truncated=bool(result.truncated), result_cache_hit=result.cached)
+        # Kept for the plan and index advice below, which runs again on its own reruns
+        st.session_state["generator_last_run"] = {
+            "sql": sql_query, "elapsed_ms": None if result.cached else (time.perf_counter() - start) * 1000,
+            "max_rows": max_rows, "preview_limit": preview_limit, "timeout": timeout,
+        }
+    except QueryInterrupted as e:
+        response = e
+        record_error(e)
     except sqlite3.Error as e:
-        return str(e), []
+        response = str(e)
+        record_error(e)
+    
+    st.subheader("📊 Query Results:")
+    if isinstance(response, QueryInterrupted):
+        st.error(f"⏱️ {response}. Narrow the question, add filters or raise the time limit.")
+    elif isinstance(response, str):
+        st.error(f"❌ SQL Error: {response}")
+    elif response:
+        with span("dataframe"):
+            df = pd.DataFrame(response, columns=result.columns)
+        if result.truncated:
+            st.warning(f"⚠️ {result.notice()}. Export the query below to get every row.")
+        if result.cached:
+            st.caption("⚡ Result served from the result cache (no data has changed since it was computed)")
+        with span("render"):
+            st.dataframe(df)
+        # Remembered so the export below survives the rerun its button triggers
+        st.session_state["generator_last_sql"] = sql_query
+    else:
+        st.info("ℹ️ Query executed successfully, but no data was returned.")
 
 # Main Streamlit App
 def run_sql_generator():
@@ -112,11 +220,10 @@ def run_sql_generator():
     st.subheader("📝 Enter Your Question")
     
     # Database path
-    db_path = "dynamic.db"
+    db_path = DB_PATH
     
-    # Get database schema
-    schema = get_db_schema(db_path)
-    formatted_schema = format_schema_for_prompt(schema)
+    # Get database schema (rebuilt only when the schema version changes)
+    formatted_schema = get_catalog(db_path).prompt_text()
     
     # Display schema in an expandable section
     with st.expander("View Database Schema"):
@@ -124,51 +231,36 @@ def run_sql_generator():
     
     # User input
     question = st.text_input("Write your question here:", key="input")
+    use_cache = not st.checkbox("Skip caches", value=False, help="Always ask Gemini and run the query, even when the answer or its result is cached")
+    streaming = st.checkbox("Stream SQL as it is generated", value=True)
+    max_rows = st.number_input("Rows to show", min_value=1, value=RESULT_MAX_ROWS, step=1000,
+                               help="Larger results are cut off here; use the export below for every row")
+    preview_limit = st.checkbox("Add LIMIT to the query", value=True,
+                                help="Lets SQLite stop after the rows shown instead of producing the whole result")
+    timeout = st.number_input("Time limit (s)", min_value=0.0, value=QUERY_TIMEOUT, step=5.0,
+                              help="Queries running longer are stopped; 0 means no limit")
     submit = st.button("🚀 Generate SQL & Fetch Data")
     
-    # Base prompt for Gemini
-    base_prompt = """
-You are an expert SQL query generator. Your task is to generate accurate SQL queries based on natural language questions and the provided database schema.
-
-### Rules:
-1️⃣ Generate only the raw SQL query - no explanations, no backticks, no "SQL" keyword
-2️⃣ Use ONLY the exact table and column names from the provided schema
-3️⃣ Ensure all string comparisons are case-insensitive using LOWER()
-4️⃣ Be precise and specific - don't include columns that don't exist in the schema
-5️⃣ Use appropriate joins when querying across multiple tables
-6️⃣ If the question is ambiguous, make reasonable assumptions based on the schema
-7️⃣ Include only the SQL query in your response - nothing else
-"""
+    if st.session_state.pop("generator_cancelled", False):
+        st.warning("⛔ Query cancelled.")
     
     if submit:
         if not question:
             st.warning("Please enter a question.")
             return
         
-        with st.spinner("Analyzing database and generating SQL query..."):
-            sql_query = get_gemini_response(formatted_schema, question, base_prompt)
-            # Clean up any code formatting that might have been added
-            sql_query = sql_query.strip().replace("```sql", "").replace("```", "").strip()
-        
-        st.subheader("📝 Generated SQL Query:")
-        st.code(sql_query, language="sql")
-        
-        with st.spinner("Fetching data from the database..."):
-            response, columns = read_sql_query(sql_query, db_path)
-        
-        st.subheader("📊 Query Results:")
-        if isinstance(response, str):
-            st.error(f"❌ SQL Error: {response}")
-        elif response:
-            df = pd.DataFrame(response, columns=columns)
-            st.dataframe(df)
-        else:
-            st.info("ℹ️ Query executed successfully, but no data was returned.")
-
-# Cache the schema to avoid repeated database reads
-@st.cache_data(ttl=600)  # Cache for 10 minutes
-def cached_schema(db_path):
-    return get_db_schema(db_path)
+        with trace("generate", streaming=streaming, use_cache=use_cache, question_chars=len(question)):
+            answer_question(question, db_path, use_cache, streaming, int(max_rows), preview_limit, float(timeout))
+    
+    if "generator_last_run" in st.session_state:
+        with st.expander("🔍 Query plan & index advice"):
+            render_index_advice(db_path)
+    
+    last_sql = st.session_state.get("generator_last_sql")
+    if last_sql:
+        with st.expander("📥 Export query results"):
+            st.code(last_sql, language="sql")
+            render_export(last_sql, "query_results", key="generator_export", db_path=db_path, timeout=float(timeout))
 
 if __name__ == "__main__":
     run_sql_generator()
@@ -0,0 +1,45 @@
+import re
+
+# Tokens of a SQL statement: quoted names, strings, numbers, words, operators, punctuation
+_TOKEN = re.compile(
+    r"""\s+|--[^\n]*|/\*.*?\*/"""
+    r"""|(?P<ident>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])"""
+    r"""|(?P<string>'(?:[^']|'')*')"""
+    r"""|(?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+)"""
+    r"""|(?P<word>[A-Za-z_][A-Za-z0-9_$]*)"""
+    r"""|(?P<op><=|>=|<>|!=|==|<<|>>|\|\||[-+*/%=<>(),.;?&|~])"""
+    # Anything else is kept as its own token, so no character of a statement is ever dropped
+    r"""|(?P<other>\S)""",
+    re.DOTALL,
+)
+
+_KEYWORDS = {
+    "select", "from", "where", "join", "inner", "left", "right", "full", "outer", "cross", "natural", "on",
+    "using", "group", "order", "by", "having", "limit", "offset", "as", "and", "or", "not", "in", "is",
+    "null", "like", "glob", "between", "exists", "case", "when", "then", "else", "end", "distinct", "all",
+    "union", "intersect", "except", "asc", "desc", "with", "values", "collate", "escape", "cast", "nulls",
+    "first", "last", "true", "false", "current_date", "current_time", "current_timestamp", "filter", "over",
+}
+
+
+def _unquote(token):
+    if token[0] in "\"`[":
+        return token[1:-1].replace('""', '"')
+    return token
+
+
+# Function to split SQL into (kind, text) tokens: keyword, name, string, number, op or other
+def sql_tokens(sql):
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind is None:
+            continue
+        text = match.group(kind)
+        if kind == "word" and text.lower() in _KEYWORDS:
+            tokens.append(("keyword", text.lower()))
+        elif kind in ("word", "ident"):
+            tokens.append(("name", _unquote(text)))
+        else:
+            tokens.append((kind, text.lower() if kind == "op" else text))
+    return tokens
@@ -0,0 +1,172 @@
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from db import DB_PATH, SIDE_DB_PATH, read_connection, side_store, write_connection, is_internal_table
+from sql_text import sql_tokens
+from query_results import is_read_only
+from schema_catalog import get_catalog
+
+# Authorizer actions a plain SELECT needs while it is prepared; anything else is denied
+ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+# Double-quoted names, looked for outside string literals
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_QUOTED_NAME = re.compile(r'"((?:[^"]|"")+)"')
+
+VALIDATION_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS _t2sql_validation_log (
+    id INTEGER PRIMARY KEY,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    repair_ms REAL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+class InvalidSQLError(sqlite3.DatabaseError):
+    """Generated SQL that failed validation (and its repair); `error` is the reason"""
+
+    def __init__(self, sql, error):
+        super().__init__(error)
+        self.sql = sql
+        self.error = error
+
+
+# Function to check generated SQL without running it
+def validate_sql(sql, db_path=DB_PATH):
+    """Return None when sql is a single SELECT over existing tables and columns, else the reason it is not.
+
+    The statement is prepared with EXPLAIN on a pooled read-only connection
+    while an authorizer records every table and column it touches and denies
+    anything but reads.
+    """
+    if not sql.strip():
+        return "No SQL statement was generated"
+    if sum(1 for token in sql_tokens(sql.strip().rstrip(";")) if token == ("op", ";")):
+        return "Only a single SQL statement is allowed"
+    if not is_read_only(sql):
+        return "Only SELECT statements are allowed"
+
+    read = {}
+    denied = []
+
+    def authorizer(action, arg1, arg2, database, trigger):
+        if action not in ALLOWED_ACTIONS:
+            denied.append(action)
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_READ and arg1:
+            read.setdefault(arg1, set()).add(arg2)
+        return sqlite3.SQLITE_OK
+
+    try:
+        with read_connection(db_path) as conn:
+            conn.set_authorizer(authorizer)
+            try:
+                conn.execute(f"EXPLAIN {sql}").fetchall()
+            finally:
+                conn.set_authorizer(None)
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        if denied:
+            return "Only SELECT statements are allowed"
+        return str(e)
+
+    # Internal bookkeeping tables are not part of the schema the model is shown
+    catalog = get_catalog(db_path)
+    for table in read:
+        if is_internal_table(table):
+            return f"{table} is an internal table and cannot be queried"
+        if not catalog.table_exists(table):
+            return f"no such table: {table}"
+
+    # SQLite reads a double-quoted name it cannot resolve as a string literal; catch that hallucination here
+    tokens = sql_tokens(sql)
+    names = {table.lower() for table in catalog.tables()}
+    names |= {column["name"].lower() for table in catalog.tables() for column in catalog.columns(table)}
+    quoted = _quoted_names(sql)
+    names |= {token[1].lower() for token in tokens if token[0] == "name"} - {name.lower() for name in quoted}
+    names |= _declared_names(tokens)
+    for name in quoted:
+        if name.lower() not in names:
+            return (f'no such column: "{name}" (double quotes are for table and column names; '
+                    f"use single quotes for text values)")
+    return None
+
+
+def _declared_names(tokens):
+    """Lower-cased names the statement defines itself: CTEs, their column lists and aliases (with or without AS)"""
+    declared = set()
+    for i, (kind, text) in enumerate(tokens):
+        if kind != "name":
+            continue
+        previous = tokens[i - 1] if i else (None, None)
+        # x AS (...) or x(a, b) AS (...) is a common table expression
+        end = i
+        if tokens[i + 1:i + 2] == [("op", "(")]:
+            depth = 0
+            for end in range(i + 1, len(tokens)):
+                depth += {"(": 1, ")": -1}.get(tokens[end][1], 0) if tokens[end][0] == "op" else 0
+                if not depth:
+                    break
+        if tokens[end + 1:end + 3] == [("keyword", "as"), ("op", "(")]:
+            declared.add(text.lower())
+            declared |= {name.lower() for kind, name in tokens[i + 1:end] if kind == "name"}
+        # An alias follows AS, or comes straight after an expression or a table reference
+        elif (previous in (("keyword", "as"), ("keyword", "end"), ("op", ")"))
+              or previous[0] in ("name", "string", "number")):
+            declared.add(text.lower())
+    return declared
+
+
+def _quoted_names(sql):
+    return {match.group(1).replace('""', '"') for match in _QUOTED_NAME.finditer(_STRING_LITERAL.sub("''", sql))}
+
+
+class ValidationLog:
+    """Outcome of every validated generation: ok, repaired or failed, with the repair latency"""
+
+    def __init__(self, path=SIDE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                with write_connection(self.path) as conn:
+                    conn.execute(VALIDATION_LOG_SCHEMA)
+                self._ready = True
+
+    def record(self, outcome, error=None, repair_ms=None):
+        self._ensure_schema()
+        with write_connection(self.path) as conn:
+            conn.execute(
+                "INSERT INTO _t2sql_validation_log (outcome, error, repair_ms, created_at) VALUES (?, ?, ?, ?)",
+                (outcome, error, repair_ms, time.time()),
+            )
+
+    def stats(self):
+        self._ensure_schema()
+        with read_connection(self.path) as conn:
+            counts = dict(conn.execute("SELECT outcome, COUNT(*) FROM _t2sql_validation_log GROUP BY outcome"))
+            latencies = [row[0] for row in conn.execute(
+                "SELECT repair_ms FROM _t2sql_validation_log WHERE repair_ms IS NOT NULL")]
+        repairs = counts.get("repaired", 0) + counts.get("failed", 0)
+        total = repairs + counts.get("ok", 0)
+        return {
+            "validated": total,
+            "invalid": repairs,
+            "repaired": counts.get("repaired", 0),
+            "invalid_rate": repairs / total if total else 0.0,
+            "repair_rate": counts.get("repaired", 0) / repairs if repairs else 0.0,
+            "repair_ms_median": statistics.median(latencies) if latencies else None,
+        }
+
+
+# Function to get the process-wide validation log
+def get_validation_log():
+    return side_store(ValidationLog)
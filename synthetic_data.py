@@ -0,0 +1,168 @@
+"""Deterministic synthetic data for benchmarks and local testing.
+
+    python synthetic_data.py db bench.db --tables 20 --columns 12 --rows 100000
+    python synthetic_data.py csv people.csv --size-mb 50
+    python synthetic_data.py xlsx people.xlsx --rows 100000 --sheets 3
+
+The same arguments and --seed always produce the same data.
+"""
+import argparse
+import csv
+import datetime
+import os
+import random
+import re
+import shutil
+import sqlite3
+import zipfile
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+# Column types cycled through after the leading id column
+COLUMN_TYPES = ["TEXT", "INTEGER", "REAL", "DATE", "TEXT", "BOOLEAN"]
+COLUMN_NAMES = ["name", "quantity", "amount", "created_on", "category", "active"]
+
+# Small vocabularies so text columns have realistic repetition (and something to filter on)
+WORDS = ["north", "south", "east", "west", "alpha", "beta", "gamma", "delta", "red", "green", "blue", "amber"]
+CATEGORIES = ["Sales", "Engineering", "Support", "Marketing", "Finance", "Operations"]
+
+# Rows inserted per executemany() call
+INSERT_BATCH_ROWS = 10000
+
+_DAY_ZERO = datetime.date(2015, 1, 1)
+
+
+def column_names(columns):
+    # id first, then readable names (suffixed once they repeat) so prompts look like real schemas
+    names = ["id"]
+    for index in range(1, columns):
+        base = COLUMN_NAMES[(index - 1) % len(COLUMN_NAMES)]
+        repeat = (index - 1) // len(COLUMN_NAMES)
+        names.append(f"{base}_{repeat + 1}" if repeat else base)
+    return names
+
+
+def column_types(columns):
+    return ["INTEGER"] + [COLUMN_TYPES[(index - 1) % len(COLUMN_TYPES)] for index in range(1, columns)]
+
+
+def _value(col_type, index, rng):
+    if col_type == "INTEGER":
+        return rng.randrange(1000)
+    if col_type == "REAL":
+        return round(rng.random() * 10000, 2)
+    if col_type == "DATE":
+        return (_DAY_ZERO + datetime.timedelta(days=rng.randrange(3650))).isoformat()
+    if col_type == "BOOLEAN":
+        return rng.randrange(2)
+    # "category" columns are low-cardinality (something to filter on); "name" columns are freer text
+    if COLUMN_NAMES[(index - 1) % len(COLUMN_NAMES)] == "category":
+        return rng.choice(CATEGORIES)
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.randrange(100000)}"
+
+
+# Function to yield `rows` rows for a table with the given column types
+def iter_rows(types, rows, seed=0, start=0):
+    rng = random.Random(seed)
+    for row_id in range(start, start + rows):
+        yield (row_id,) + tuple(_value(col_type, index, rng) for index, col_type in enumerate(types) if index)
+
+
+# Function to build a database of N tables with M columns and R rows each
+def make_database(path, tables=10, columns=8, rows=10000, seed=0):
+    if os.path.exists(path):
+        os.unlink(path)
+    names = column_names(columns)
+    types = column_types(columns)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        for table_index in range(tables):
+            table = f"table_{table_index}"
+            columns_sql = ", ".join(f'"{name}" {col_type}' for name, col_type in zip(names, types))
+            conn.execute(f'CREATE TABLE "{table}" ({columns_sql})')
+            insert_sql = f'INSERT INTO "{table}" VALUES ({", ".join("?" * columns)})'
+            generated = iter_rows(types, rows, seed + table_index)
+            while True:
+                batch = [row for _, row in zip(range(INSERT_BATCH_ROWS), generated)]
+                if not batch:
+                    break
+                conn.executemany(insert_sql, batch)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+# Function to write a CSV of roughly size_mb megabytes; returns the number of data rows
+def make_csv(path, size_mb=10, columns=8, seed=0):
+    target = int(size_mb * 1024 * 1024)
+    types = column_types(columns)
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(column_names(columns))
+        for row in iter_rows(types, 1 << 62, seed):
+            writer.writerow(row)
+            rows += 1
+            # Checking the position every row would dominate; the overshoot is at most one block
+            if rows % 1000 == 0 and f.tell() >= target:
+                break
+    return rows
+
+
+def _add_dimensions(path, refs):
+    # openpyxl's write-only mode leaves out <dimension>; without it, read-only mode
+    # scans the whole sheet just to learn its size. Excel always writes one.
+    partial = f"{path}.tmp"
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            match = re.match(r"xl/worksheets/sheet(\d+)\.xml$", item.filename)
+            if match and b"<dimension " not in data:
+                ref = refs[int(match.group(1)) - 1]
+                data = data.replace(b"<sheetViews>", f'<dimension ref="{ref}"/><sheetViews>'.encode("ascii"), 1)
+            target.writestr(item, data)
+    shutil.move(partial, path)
+
+
+# Function to write an .xlsx workbook with `sheets` sheets of `rows` rows each
+def make_xlsx(path, rows=10000, columns=8, sheets=1, seed=0):
+    names = column_names(columns)
+    types = column_types(columns)
+    workbook = Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet {sheet_index + 1}")
+        sheet.append(names)
+        for row in iter_rows(types, rows, seed + sheet_index):
+            sheet.append(list(row))
+    workbook.save(path)
+    _add_dimensions(path, [f"A1:{get_column_letter(columns)}{rows + 1}"] * sheets)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic databases, CSV and XLSX files")
+    parser.add_argument("kind", choices=["db", "csv", "xlsx"])
+    parser.add_argument("path")
+    parser.add_argument("--tables", type=int, default=10, help="tables in a generated database")
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=10000, help="rows per table or sheet")
+    parser.add_argument("--size-mb", type=float, default=10, help="approximate CSV size")
+    parser.add_argument("--sheets", type=int, default=1, help="sheets in a generated workbook")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.kind == "db":
+        make_database(args.path, args.tables, args.columns, args.rows, args.seed)
+    elif args.kind == "csv":
+        rows = make_csv(args.path, args.size_mb, args.columns, args.seed)
+        print(f"{rows:,} rows")
+    else:
+        make_xlsx(args.path, args.rows, args.columns, args.sheets, args.seed)
+    print(f"Wrote {args.path} ({os.path.getsize(args.path) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+"""Command-line interface to the toolkit: the same generation, import and export as the app, without Streamlit.
+
+    python t2sql.py ask "What is the average salary per department?"
+    python t2sql.py ask "Top 10 products by sales" --format csv > top10.csv
+    python t2sql.py import people.csv exports/ nightly.zip
+    python t2sql.py import people.csv --table staff
+    python t2sql.py export --table people people.parquet
+    python t2sql.py export --sql "SELECT * FROM people WHERE age > 40" older.csv.gz
+
+Each command imports only the modules it needs, so --help and quick commands start fast.
+Exit status is 0 on success, 1 when the command failed and 2 for usage errors.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from db import DB_PATH
+
+# Widest a column gets in --format table output
+TABLE_MAX_WIDTH = 60
+
+# --format choices of the export command, by export.EXPORT_FORMATS name
+EXPORT_FORMAT_NAMES = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+
+
+def fail(message):
+    print(f"t2sql: {message}", file=sys.stderr)
+    return 1
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    text = str(value).replace("\n", " ")
+    return text if len(text) <= TABLE_MAX_WIDTH else text[:TABLE_MAX_WIDTH - 1] + "…"
+
+
+# Function to print rows as an aligned text table, CSV or JSON lines
+def write_rows(columns, rows, fmt, out=sys.stdout):
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows(rows)
+    elif fmt == "json":
+        for row in rows:
+            out.write(json.dumps(dict(zip(columns, row)), default=str) + "\n")
+    else:
+        cells = [[_cell(value) for value in row] for row in rows]
+        widths = [max([len(str(column))] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+        out.write("  ".join(str(column).ljust(width) for column, width in zip(columns, widths)).rstrip() + "\n")
+        out.write("  ".join("-" * width for width in widths) + "\n")
+        for row in cells:
+            out.write("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip() + "\n")
+
+
+def cmd_ask(args):
+    import sqlite3
+    from generation import ask, generate_sql
+    from llm_client import LLMError
+    from query_results import QUERY_TIMEOUT
+    from sql_validation import InvalidSQLError
+    from tracing import trace
+
+    try:
+        with trace("generate", interface="cli", question_chars=len(args.question)):
+            if args.sql_only:
+                sql_query, _, error = generate_sql(args.question, args.db, use_cache=not args.no_cache)
+                if error:
+                    raise InvalidSQLError(sql_query, error)
+                print(sql_query)
+                return 0
+            answer = ask(args.question, args.db, max_rows=args.max_rows,
+                         timeout=QUERY_TIMEOUT if args.timeout is None else args.timeout, use_cache=not args.no_cache)
+    except LLMError as e:
+        return fail(f"generation failed: {e}")
+    except InvalidSQLError as e:
+        print(e.sql, file=sys.stderr)
+        return fail(f"no valid SQL was generated: {e.error}")
+    except sqlite3.Error as e:
+        return fail(f"query failed: {e}")
+
+    # The SQL goes to stderr for csv/json so stdout stays machine-readable
+    print(answer.sql, file=sys.stdout if args.format == "table" else sys.stderr)
+    if args.format == "table":
+        print()
+    write_rows(answer.result.columns, answer.result.rows, args.format)
+    notes = [note for note in (answer.result.notice(), "SQL from response cache" if answer.from_cache else None,
+                               "rows from result cache" if answer.result.cached else None) if note]
+    if notes:
+        print(f"({'; '.join(notes)})", file=sys.stderr)
+    return 0
+
+
+def _progress_printer(total_files):
+    # Progress on one rewritten stderr line, only when someone is watching
+    if not sys.stderr.isatty():
+        return None
+
+    def report(files_done, rows_done, elapsed):
+        rate = rows_done / elapsed if elapsed else 0
+        print(f"\r{files_done} / {total_files} files · {rows_done:,} rows · {rate:,.0f} rows/s",
+              end="", file=sys.stderr, flush=True)
+    return report
+
+
+def cmd_import(args):
+    from importer import IMPORT_WORKERS, collect_sources, import_csv, run_import_job
+    from tracing import trace, annotate
+
+    start = time.perf_counter()
+    if args.table:
+        if len(args.paths) != 1 or not args.paths[0].lower().endswith(".csv"):
+            return fail("--table needs exactly one .csv file")
+        try:
+            with trace("import", mode="csv", interface="cli", tables=1):
+                table, rows = import_csv(args.paths[0], args.table, args.db)
+                annotate(rows=rows)
+        except Exception as e:
+            return fail(f"import failed: {type(e).__name__}: {e}")
+        print(f"{rows:,} rows imported into {table} in {time.perf_counter() - start:.1f} s")
+        return 0
+
+    sources = collect_sources(args.paths)
+    if not sources:
+        return fail("no CSV or XLSX files found")
+    try:
+        with trace("import", mode="multi", interface="cli", files=len(sources),
+                   bytes=sum(source["bytes"] for source in sources)):
+            report = run_import_job(sources, args.db, args.workers or IMPORT_WORKERS, progress=_progress_printer(len(sources)))
+            annotate(rows=sum(entry["rows"] for entry in report),
+                     failed_files=sum(1 for entry in report if entry["error"] is not None))
+    except Exception as e:
+        return fail(f"import failed: {type(e).__name__}: {e}")
+    if sys.stderr.isatty():
+        print(file=sys.stderr)
+
+    failed = [entry for entry in report if entry["error"] is not None]
+    for entry in report:
+        if entry["error"] is None:
+            print(f"{entry['file']}: {entry['rows']:,} rows → {', '.join(entry['tables'])}")
+        else:
+            print(f"{entry['file']}: FAILED {entry['error']}", file=sys.stderr)
+    print(f"{sum(entry['rows'] for entry in report):,} rows from {len(report) - len(failed)} files "
+          f"in {time.perf_counter() - start:.1f} s")
+    return 1 if failed else 0
+
+
+def cmd_export(args):
+    import sqlite3
+    from export import export_query, format_for_path
+    from query_results import is_read_only
+    from schema_catalog import get_catalog
+
+    if args.table:
+        if not get_catalog(args.db).table_exists(args.table):
+            return fail(f"no such table: {args.table}")
+        sql = f'SELECT * FROM "{args.table}"'
+    elif not is_read_only(args.sql):
+        return fail("only SELECT statements can be exported")
+    else:
+        sql = args.sql
+    try:
+        fmt = EXPORT_FORMAT_NAMES[args.format] if args.format else format_for_path(args.output)
+    except ValueError as e:
+        return fail(str(e))
+
+    start = time.perf_counter()
+    try:
+        rows = export_query(sql, args.output, fmt, db_path=args.db)
+    except sqlite3.Error as e:
+        return fail(f"export failed: {e}")
+    print(f"{rows:,} rows written to {args.output} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="t2sql", description="Text-to-SQL Toolkit without the web UI")
+    parser.add_argument("--db", default=DB_PATH, help=f"SQLite database (default: {DB_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ask = commands.add_parser("ask", help="generate SQL for a question and run it")
+    ask.add_argument("question")
+    ask.add_argument("--format", choices=["table", "csv", "json"], default="table", help="how rows are printed")
+    ask.add_argument("--max-rows", type=int, default=1000, help="rows to fetch at most (export for more)")
+    ask.add_argument("--timeout", type=float, default=None, help="seconds the query may run (default: T2SQL_QUERY_TIMEOUT)")
+    ask.add_argument("--sql-only", action="store_true", help="print the generated SQL without running it")
+    ask.add_argument("--no-cache", action="store_true", help="always ask the model and run the query")
+    ask.set_defaults(handler=cmd_ask)
+
+    load = commands.add_parser("import", help="import CSV/XLSX files, directories or zip archives")
+    load.add_argument("paths", nargs="+")
+    load.add_argument("--table", help="table name for a single CSV file (default: from the file name)")
+    load.add_argument("--workers", type=int, default=None, help="parse processes for multi-file imports")
+    load.set_defaults(handler=cmd_import)
+
+    export = commands.add_parser("export", help="write a table or query result to CSV, gzip CSV or Parquet")
+    export.add_argument("output", help="file to write; the format follows its suffix unless --format is given")
+    source = export.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table")
+    source.add_argument("--sql")
+    export.add_argument("--format", choices=sorted(EXPORT_FORMAT_NAMES))
+    export.set_defaults(handler=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
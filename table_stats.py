@@ -0,0 +1,120 @@
+import sqlite3
+import time
+from db import DB_PATH, read_connection, write_connection
+
+# Internal table holding one row of statistics per user table
+STATS_TABLE = "_t2sql_table_stats"
+
+# Rows ANALYZE samples per index when estimating counts for tables without statistics
+ANALYSIS_LIMIT = 1000
+
+CREATE_STATS_SQL = f"""
+CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+    table_name TEXT PRIMARY KEY,
+    row_count INTEGER,
+    bytes INTEGER,
+    modified_at REAL
+)
+"""
+
+
+# Function to measure a table's on-disk size with the dbstat virtual table (None when SQLite lacks it)
+def table_bytes(conn, table_name):
+    try:
+        row = conn.execute("SELECT pgsize FROM dbstat('main', 1) WHERE name = ?", (table_name,)).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else 0
+
+
+# The record_* functions run on the caller's write connection, inside its transaction,
+# so the statistics commit or roll back together with the change they describe
+
+def record_table_loaded(conn, table_name, row_count):
+    """A table was created or replaced with exactly row_count rows"""
+    conn.execute(CREATE_STATS_SQL)
+    conn.execute(
+        f"""INSERT INTO {STATS_TABLE} (table_name, row_count, bytes, modified_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(table_name) DO UPDATE SET
+            row_count = excluded.row_count, bytes = excluded.bytes, modified_at = excluded.modified_at""",
+        (table_name, row_count, table_bytes(conn, table_name), time.time()),
+    )
+
+
+def record_rows_changed(conn, table_name, delta):
+    """Rows were inserted (delta > 0) or deleted (delta < 0); the byte size is left as last measured"""
+    conn.execute(CREATE_STATS_SQL)
+    # A table with no statistics yet keeps an unknown (NULL) count rather than a wrong one
+    conn.execute(
+        f"""INSERT INTO {STATS_TABLE} (table_name, row_count, bytes, modified_at) VALUES (?, NULL, NULL, ?)
+        ON CONFLICT(table_name) DO UPDATE SET
+            row_count = row_count + ?, modified_at = excluded.modified_at""",
+        (table_name, time.time(), delta),
+    )
+
+
+def record_table_dropped(conn, table_name):
+    conn.execute(CREATE_STATS_SQL)
+    conn.execute(f"DELETE FROM {STATS_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def _stat1_estimates(conn):
+    # sqlite_stat1 only exists after ANALYZE; the first number of each entry is the row count
+    try:
+        rows = conn.execute("SELECT tbl, stat FROM sqlite_stat1").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    estimates = {}
+    for table_name, stat in rows:
+        if stat:
+            count = int(stat.split()[0])
+            estimates[table_name] = max(count, estimates.get(table_name, 0))
+    return estimates
+
+
+# Function to read statistics for many tables with two small queries (no table scans)
+def get_table_stats(tables, db_path=DB_PATH):
+    """Return {table: {"rows", "exact", "bytes", "modified"}} for each table in `tables`.
+
+    Counts kept up to date by the app are exact; otherwise the ANALYZE estimate
+    from sqlite_stat1 is used, and rows is None when neither exists.
+    """
+    with read_connection(db_path) as conn:
+        try:
+            maintained = {
+                row[0]: row[1:]
+                for row in conn.execute(f"SELECT table_name, row_count, bytes, modified_at FROM {STATS_TABLE}")
+            }
+        except sqlite3.OperationalError:
+            maintained = {}
+        estimates = _stat1_estimates(conn)
+
+    stats = {}
+    for table_name in tables:
+        row_count, size, modified = maintained.get(table_name, (None, None, None))
+        exact = row_count is not None
+        if not exact:
+            row_count = estimates.get(table_name)
+        stats[table_name] = {"rows": row_count, "exact": exact, "bytes": size, "modified": modified}
+    return stats
+
+
+# Function to fill in ANALYZE estimates and sizes for tables the app has no statistics for
+def analyze_tables(tables, db_path=DB_PATH):
+    """Run a bounded ANALYZE on each table and store its size; returns the tables analyzed"""
+    missing = [name for name, info in get_table_stats(tables, db_path).items() if info["rows"] is None or info["bytes"] is None]
+    if not missing:
+        return []
+    with write_connection(db_path) as conn:
+        conn.execute(CREATE_STATS_SQL)
+        # analysis_limit makes ANALYZE sample each index instead of reading all of it
+        conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+        for table_name in missing:
+            conn.execute(f'ANALYZE "{table_name}"')
+            conn.execute(
+                f"""INSERT INTO {STATS_TABLE} (table_name, row_count, bytes, modified_at) VALUES (?, NULL, ?, NULL)
+                ON CONFLICT(table_name) DO UPDATE SET bytes = excluded.bytes""",
+                (table_name, table_bytes(conn, table_name)),
+            )
+        conn.execute("PRAGMA analysis_limit=0")
+    return missing
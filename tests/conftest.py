@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The modules sit at the repository root, next to this directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the side database and cached results out of the working directory (read when the modules are imported)
+_side = tempfile.mkdtemp(prefix="t2sql_tests_")
+os.environ.setdefault("T2SQL_SIDE_DB_PATH", os.path.join(_side, "side.db"))
+os.environ.setdefault("T2SQL_RESULT_CACHE_DIR", os.path.join(_side, "results"))
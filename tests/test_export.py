@@ -0,0 +1,51 @@
+import sqlite3
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from export import ParquetSink, export_query
+
+
+def _write(path, batches, columns=("value",)):
+    sink = ParquetSink(str(path), list(columns))
+    for rows in batches:
+        sink.write(rows)
+    sink.close()
+    return pq.read_table(str(path))
+
+
+def test_integer_column_widens_to_float(tmp_path):
+    table = _write(tmp_path / "out.parquet", [[(1,), (2,)], [(2.5,)]])
+    assert table.schema.field("value").type == pa.float64()
+    assert table.column("value").to_pylist() == [1.0, 2.0, 2.5]
+
+
+@pytest.mark.parametrize("first, text", [(1, "1"), (1.5, "1.5")])
+def test_numbers_widen_to_strings(tmp_path, first, text):
+    table = _write(tmp_path / "out.parquet", [[(first,), (None,)], [("x",)]])
+    assert table.schema.field("value").type == pa.string()
+    assert table.column("value").to_pylist() == [text, None, "x"]
+
+
+def test_null_batch_takes_the_type_of_later_batches(tmp_path):
+    table = _write(tmp_path / "out.parquet", [[(None,)], [(7,)]])
+    assert table.schema.field("value").type == pa.int64()
+    assert table.column("value").to_pylist() == [None, 7]
+
+
+def test_integer_a_float_cannot_hold_is_an_error(tmp_path):
+    with pytest.raises(ValueError, match="export as CSV"):
+        _write(tmp_path / "out.parquet", [[(2 ** 60 + 1,)], [(0.5,)]])
+
+
+def test_export_query_parquet(tmp_path):
+    db_path = str(tmp_path / "data.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE t (a INTEGER, b)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, i if i < 3 else i / 2) for i in range(5)])
+    conn.commit()
+    conn.close()
+    path = tmp_path / "t.parquet"
+    assert export_query("SELECT a, b FROM t ORDER BY a", str(path), fmt="Parquet", db_path=db_path, batch_rows=2) == 5
+    table = pq.read_table(str(path))
+    assert table.column("a").to_pylist() == [0, 1, 2, 3, 4]
+    assert table.column("b").to_pylist() == [0.0, 1.0, 2.0, 1.5, 2.0]
@@ -0,0 +1,26 @@
+import pytest
+from db import read_connection
+from importer import import_csv
+
+
+def _columns(db_path, table):
+    with read_connection(db_path) as conn:
+        return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def test_duplicate_headers_get_pandas_suffixes(tmp_path):
+    path = tmp_path / "people.csv"
+    path.write_text("id,name,name,,name.1\n1,a,b,c,d\n2,e,f,g,h\n", encoding="utf-8")
+    db_path = str(tmp_path / "import.db")
+    table, rows = import_csv(str(path), db_path=db_path)
+    assert rows == 2
+    assert _columns(db_path, table) == ["id", "name", "name.2", "Unnamed: 3", "name.1"]
+    with read_connection(db_path) as conn:
+        assert conn.execute(f'SELECT * FROM "{table}" ORDER BY id').fetchall() == [(1, "a", "b", "c", "d"), (2, "e", "f", "g", "h")]
+
+
+def test_names_differing_only_in_case_are_rejected(tmp_path):
+    path = tmp_path / "cased.csv"
+    path.write_text("Name,name\n1,2\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        import_csv(str(path), db_path=str(tmp_path / "import.db"))
@@ -0,0 +1,40 @@
+import pytest
+from llm_client import GeminiClient, LLMError
+from mock_gemini_server import start_mock_server
+
+SQL = "SELECT id, name FROM customers ORDER BY name;"
+
+
+def _client(**server_options):
+    server, base_url = start_mock_server(chunk_delay=0, sql=SQL, **server_options)
+    return server, GeminiClient(api_key="test", base_url=base_url, max_retries=0)
+
+
+def test_stream_yields_the_whole_answer():
+    server, client = _client()
+    try:
+        chunks = list(client.stream("question"))
+    finally:
+        server.shutdown()
+    assert len(chunks) > 1
+    assert "".join(chunks) == SQL
+
+
+def test_generate_returns_the_whole_answer():
+    server, client = _client()
+    try:
+        assert client.generate("question") == SQL
+    finally:
+        server.shutdown()
+
+
+def test_dropped_stream_raises_llm_error():
+    server, client = _client(drop_after=2)
+    chunks = []
+    try:
+        with pytest.raises(LLMError, match="stream interrupted"):
+            for chunk in client.stream("question"):
+                chunks.append(chunk)
+    finally:
+        server.shutdown()
+    assert "".join(chunks) == SQL[:16]
@@ -0,0 +1,28 @@
+import sqlite3
+import pytest
+from result_cache import ResultCache, cached_fetch
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (a, b, c)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", [(1, 1, 1), (2, 1.5, "x"), (3, None, None)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("sql, cached", [
+    ("SELECT a FROM t", True),
+    ("SELECT a, b FROM t", False),
+    ("SELECT a, c FROM t", False),
+])
+def test_hit_returns_the_rows_of_the_miss(tmp_path, db_path, sql, cached):
+    cache = ResultCache(path=str(tmp_path / "side.db"), directory=str(tmp_path / "results"))
+    miss = cached_fetch(sql, db_path, cache=cache)
+    hit = cached_fetch(sql, db_path, cache=cache)
+    assert hit.cached is cached
+    assert hit.rows == miss.rows
+    assert [[type(value) for value in row] for row in hit.rows] == [[type(value) for value in row] for row in miss.rows]
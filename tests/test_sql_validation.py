@@ -0,0 +1,39 @@
+import sqlite3
+import pytest
+from sql_validation import validate_sql
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "shop.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE orders (id INTEGER, customer TEXT, amount REAL)")
+    conn.execute("CREATE TABLE customers (name TEXT, city TEXT)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("sql", [
+    'WITH "totals" AS (SELECT customer, SUM(amount) AS total FROM orders GROUP BY customer) SELECT * FROM "totals"',
+    'WITH t("who", "sum") AS (SELECT customer, SUM(amount) FROM orders GROUP BY customer) SELECT "who", "sum" FROM t',
+    'SELECT o."id", SUM(amount) "total" FROM orders o GROUP BY o."id" ORDER BY "total"',
+    'SELECT c.name FROM customers "c" WHERE "c".city = \'Oslo\'',
+    'SELECT CASE WHEN amount > 10 THEN 1 ELSE 0 END "big" FROM orders ORDER BY "big"',
+])
+def test_declared_names_are_accepted(db_path, sql):
+    assert validate_sql(sql, db_path) is None
+
+
+def test_quoted_unknown_name_is_rejected(db_path):
+    assert validate_sql('SELECT id FROM orders WHERE customer = "Alice"', db_path).startswith('no such column: "Alice"')
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("SELECT * FROM missing", "no such table: missing"),
+    ("SELECT name FROM sqlite_master", "sqlite_master is an internal table and cannot be queried"),
+    ("SELECT 1; SELECT 2", "Only a single SQL statement is allowed"),
+    ("DELETE FROM orders", "Only SELECT statements are allowed"),
+])
+def test_invalid_statements(db_path, sql, reason):
+    assert validate_sql(sql, db_path) == reason
@@ -0,0 +1,345 @@
+import contextvars
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from db import SIDE_DB_PATH, read_connection, side_store, write_connection
+
+# Also append every trace to this JSONL file; empty means the side table only
+QUERY_LOG_JSONL = os.getenv("T2SQL_QUERY_LOG_JSONL", "")
+
+# Traces kept in the query log; older ones are deleted as new ones arrive
+QUERY_LOG_MAX_TRACES = int(os.getenv("T2SQL_QUERY_LOG_MAX_TRACES", "20000"))
+
+# Port of the Prometheus text-format endpoint; 0 leaves it off
+METRICS_PORT = int(os.getenv("T2SQL_METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("T2SQL_METRICS_HOST", "127.0.0.1")
+
+# Histogram bucket bounds, in seconds, for the stage durations served to Prometheus
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+QUERY_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS _t2sql_query_log (
+    id INTEGER PRIMARY KEY,
+    trace_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    total_ms REAL NOT NULL,
+    stages TEXT NOT NULL,
+    attributes TEXT NOT NULL,
+    error TEXT
+)
+"""
+
+
+class Trace:
+    """Timings of one request (a generated question, an import) split into named stages.
+
+    A stage entered more than once (one span per CSV chunk, say) accumulates.
+    Attributes hold sizes, row counts and cache hit flags.
+    """
+
+    def __init__(self, kind, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.stages = {}
+        self.error = None
+        self.started_at = time.time()
+        self.total_ms = None
+        self._start = time.perf_counter()
+
+    def add_time(self, stage, elapsed_ms):
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed_ms
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(stage, (time.perf_counter() - start) * 1000)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+
+    def as_dict(self):
+        return {
+            "trace_id": self.trace_id, "kind": self.kind, "started_at": self.started_at,
+            "total_ms": round(self.total_ms, 3) if self.total_ms is not None else None,
+            "stages": {stage: round(ms, 3) for stage, ms in self.stages.items()},
+            "attributes": self.attributes, "error": self.error,
+        }
+
+
+_current = contextvars.ContextVar("t2sql_trace", default=None)
+
+
+# Function to add a finished trace to the Prometheus metrics and the query log
+def record_trace(current):
+    get_metrics().observe(current)
+    try:
+        get_query_log().record(current)
+    except (sqlite3.Error, OSError):
+        # Instrumentation must never break the request it measures
+        pass
+
+
+# Function to trace one request; spans opened anywhere below it (same thread) are attributed to it
+@contextmanager
+def trace(kind, recorder=record_trace, **attributes):
+    """recorder is called with the finished Trace; an event loop passes one that records off its thread"""
+    current = Trace(kind, **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = current.error or f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.finish()
+        recorder(current)
+
+
+def current_trace():
+    return _current.get()
+
+
+# Function to time a stage of the current trace; does nothing outside a trace
+@contextmanager
+def span(stage):
+    current = _current.get()
+    if current is None:
+        yield None
+        return
+    with current.span(stage):
+        yield current
+
+
+# Function to add attributes (sizes, row counts, cache hits) to the current trace
+def annotate(**attributes):
+    current = _current.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+# Function to mark the current trace as failed without raising
+def record_error(message):
+    current = _current.get()
+    if current is not None:
+        current.error = str(message)
+
+
+# Function to count the time spent producing each item of an iterable (reading CSV chunks, say) as a stage
+def traced(iterable, stage):
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            current = _current.get()
+            if current is not None:
+                current.add_time(stage, (time.perf_counter() - start) * 1000)
+        yield item
+
+
+def percentile(values, fraction):
+    # Nearest rank: always one of the observed values
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+class QueryLog:
+    """Finished traces, newest last, bounded to QUERY_LOG_MAX_TRACES rows"""
+
+    def __init__(self, path=SIDE_DB_PATH, jsonl_path=QUERY_LOG_JSONL, max_traces=QUERY_LOG_MAX_TRACES):
+        self.path = path
+        self.jsonl_path = jsonl_path
+        self.max_traces = max_traces
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _ensure_schema(self):
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                with write_connection(self.path) as conn:
+                    conn.execute(QUERY_LOG_SCHEMA)
+                self._ready = True
+
+    def record(self, trace):
+        self._ensure_schema()
+        record = trace.as_dict()
+        with write_connection(self.path) as conn:
+            cursor = conn.execute(
+                "INSERT INTO _t2sql_query_log (trace_id, kind, started_at, total_ms, stages, attributes, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record["trace_id"], record["kind"], record["started_at"], record["total_ms"],
+                 json.dumps(record["stages"]), json.dumps(record["attributes"], default=str), record["error"]),
+            )
+            conn.execute("DELETE FROM _t2sql_query_log WHERE id <= ?", (cursor.lastrowid - self.max_traces,))
+        if self.jsonl_path:
+            with self._lock, open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def kinds(self):
+        self._ensure_schema()
+        with read_connection(self.path) as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT kind FROM _t2sql_query_log ORDER BY kind")]
+
+    def recent(self, kind=None, limit=1000):
+        """Return the newest `limit` traces (as dicts), newest first"""
+        self._ensure_schema()
+        sql = "SELECT trace_id, kind, started_at, total_ms, stages, attributes, error FROM _t2sql_query_log"
+        params = []
+        if kind:
+            sql += " WHERE kind = ?"
+            params.append(kind)
+        with read_connection(self.path) as conn:
+            rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [
+            {"trace_id": trace_id, "kind": kind_, "started_at": started_at, "total_ms": total_ms,
+             "stages": json.loads(stages), "attributes": json.loads(attributes), "error": error}
+            for trace_id, kind_, started_at, total_ms, stages, attributes, error in rows
+        ]
+
+    def stage_summary(self, kind=None, limit=1000):
+        """Return {stage: {"count", "p50_ms", "p95_ms", "p99_ms", "mean_ms"}} over the newest `limit` traces"""
+        samples = {}
+        for record in self.recent(kind, limit):
+            for stage, ms in record["stages"].items():
+                samples.setdefault(stage, []).append(ms)
+            if record["total_ms"] is not None:
+                samples.setdefault("total", []).append(record["total_ms"])
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.50),
+                "p95_ms": percentile(values, 0.95),
+                "p99_ms": percentile(values, 0.99),
+                "mean_ms": sum(values) / len(values),
+            }
+            for stage, values in samples.items()
+        }
+
+    def clear(self):
+        self._ensure_schema()
+        with write_connection(self.path) as conn:
+            conn.execute("DELETE FROM _t2sql_query_log")
+
+
+class Metrics:
+    """In-process counters and stage histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._traces = {}      # (kind, status) -> count
+        self._stages = {}      # (kind, stage) -> [bucket counts..., +Inf count, sum seconds]
+        self._cache = {}       # (kind, cache, hit) -> count
+
+    def _observe_stage(self, kind, stage, seconds):
+        histogram = self._stages.setdefault((kind, stage), [0] * (len(self.buckets) + 1) + [0.0])
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[len(self.buckets)] += 1
+        histogram[-1] += seconds
+
+    def observe(self, trace):
+        with self._lock:
+            status = "error" if trace.error else "ok"
+            self._traces[(trace.kind, status)] = self._traces.get((trace.kind, status), 0) + 1
+            for stage, ms in trace.stages.items():
+                self._observe_stage(trace.kind, stage, ms / 1000)
+            if trace.total_ms is not None:
+                self._observe_stage(trace.kind, "total", trace.total_ms / 1000)
+            # Attributes named <cache>_cache_hit count lookups and hits per cache
+            for name, value in trace.attributes.items():
+                if name.endswith("_cache_hit") and isinstance(value, bool):
+                    key = (trace.kind, name[:-len("_cache_hit")], value)
+                    self._cache[key] = self._cache.get(key, 0) + 1
+
+    def render(self):
+        lines = [
+            "# HELP t2sql_traces_total Traced requests by kind and outcome.",
+            "# TYPE t2sql_traces_total counter",
+        ]
+        with self._lock:
+            for (kind, status), count in sorted(self._traces.items()):
+                lines.append(f't2sql_traces_total{{kind="{kind}",status="{status}"}} {count}')
+            lines += [
+                "# HELP t2sql_stage_duration_seconds Time spent in each stage of a request.",
+                "# TYPE t2sql_stage_duration_seconds histogram",
+            ]
+            for (kind, stage), histogram in sorted(self._stages.items()):
+                labels = f'kind="{kind}",stage="{stage}"'
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f't2sql_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f't2sql_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram[len(self.buckets)]}')
+                lines.append(f"t2sql_stage_duration_seconds_sum{{{labels}}} {histogram[-1]:.6f}")
+                lines.append(f"t2sql_stage_duration_seconds_count{{{labels}}} {histogram[len(self.buckets)]}")
+            lines += [
+                "# HELP t2sql_cache_lookups_total Cache lookups by cache and result.",
+                "# TYPE t2sql_cache_lookups_total counter",
+            ]
+            for (kind, cache, hit), count in sorted(self._cache.items()):
+                result = "hit" if hit else "miss"
+                lines.append(f't2sql_cache_lookups_total{{kind="{kind}",cache="{cache}",result="{result}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics = Metrics()
+_server = None
+_server_lock = threading.Lock()
+
+
+def get_metrics():
+    return _metrics
+
+
+# Function to get the process-wide query log
+def get_query_log():
+    return side_store(QueryLog)
+
+
+# Function to serve /metrics for Prometheus once per process; returns the server, or None when disabled
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,319 @@
+import csv
+import io
+import os
+import random
+import re
+import numpy as np
+import pandas as pd
+
+# Rows read from the top of the file, plus rows sampled from the rest of it
+SAMPLE_HEAD_ROWS = int(os.getenv("T2SQL_SAMPLE_HEAD_ROWS", "500"))
+SAMPLE_RANDOM_ROWS = int(os.getenv("T2SQL_SAMPLE_RANDOM_ROWS", "1500"))
+
+# Share of non-null values allowed to break a type before falling back to TEXT
+TYPE_TOLERANCE = float(os.getenv("T2SQL_TYPE_TOLERANCE", "0.02"))
+
+# Column types offered in the importer
+SQL_TYPES = ["TEXT", "INTEGER", "REAL", "DATE", "DATETIME", "BOOLEAN", "BLOB"]
+
+NULL_TOKENS = {"", "na", "n/a", "nan", "null", "none", "nil", "-", "#n/a"}
+TRUE_TOKENS = {"true", "t", "yes", "y"}
+FALSE_TOKENS = {"false", "f", "no", "n"}
+
+INTEGER_PATTERN = r"[+-]?\d+"
+REAL_PATTERN = r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?"
+
+# Value shapes checked with a regex first; each group captures one field, in the order the format's
+# directives name them, so a format is probed with array arithmetic on the captured numbers
+DATE_PATTERNS = [
+    (r"(\d{4})-(\d{1,2})-(\d{1,2})", ["%Y-%m-%d"]),
+    (r"(\d{4})/(\d{1,2})/(\d{1,2})", ["%Y/%m/%d"]),
+    (r"(\d{1,2})/(\d{1,2})/(\d{4})", ["%d/%m/%Y", "%m/%d/%Y"]),
+    (r"(\d{1,2})-(\d{1,2})-(\d{4})", ["%d-%m-%Y", "%m-%d-%Y"]),
+    (r"(\d{1,2})\.(\d{1,2})\.(\d{4})", ["%d.%m.%Y"]),
+]
+DATETIME_PATTERNS = [
+    (r"(\d{4})-(\d{1,2})-(\d{1,2})[ T](\d{1,2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?(?:Z|[+-](\d{2}):?(\d{2}))?",
+     ["ISO8601"]),
+    (r"(\d{1,2})/(\d{1,2})/(\d{4}) (\d{1,2}):(\d{2}):(\d{2})", ["%d/%m/%Y %H:%M:%S", "%m/%d/%Y %H:%M:%S"]),
+    (r"(\d{1,2})/(\d{1,2})/(\d{4}) (\d{1,2}):(\d{2})", ["%d/%m/%Y %H:%M", "%m/%d/%Y %H:%M"]),
+]
+
+# Fields captured by the ISO8601 pattern; "zH" and "zM" are the UTC offset
+ISO8601_FIELDS = ["Y", "m", "d", "H", "M", "S", "zH", "zM"]
+
+# Years strftime can write; dates outside them are kept as text
+MIN_YEAR, MAX_YEAR = 1, 9999
+
+# Upper bound of each time field, and the days of each month outside leap years
+FIELD_LIMITS = {"H": 23, "M": 59, "S": 59, "zH": 23, "zM": 59}
+MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Cheap pre-filter so only date-looking columns pay for date checks
+DATE_LIKE = r"^\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}"
+
+
+def _random_rows(raw, start, size, count, width, rng, encoding):
+    # Jump to random byte offsets and keep the next complete line that parses to the right width
+    rows = []
+    seen = set()
+    for offset in sorted(rng.randrange(start, size) for _ in range(count)):
+        raw.seek(offset)
+        raw.readline()
+        line_start = raw.tell()
+        if line_start in seen:
+            continue
+        seen.add(line_start)
+        line = raw.readline()
+        if not line:
+            continue
+        parsed = next(csv.reader([line.decode(encoding, errors="replace")]), [])
+        if len(parsed) == width:
+            rows.append(parsed)
+    return rows
+
+
+def _reservoir_rows(reader, count, width, rng):
+    # Algorithm R over the remaining rows, for streams that cannot seek
+    rows = []
+    for seen, row in enumerate(reader):
+        if len(row) != width:
+            continue
+        if len(rows) < count:
+            rows.append(row)
+        else:
+            slot = rng.randint(0, seen)
+            if slot < count:
+                rows[slot] = row
+    return rows
+
+
+def _decoded_lines(raw, encoding):
+    for line in iter(raw.readline, b""):
+        yield line.decode(encoding, errors="replace")
+
+
+def _csv_columns(header):
+    # The import reads rows with pd.read_csv, so its column names (name.1 for a repeated name,
+    # "Unnamed: 3" for a blank one) come from pandas too
+    line = io.StringIO()
+    csv.writer(line).writerow(header)
+    line.seek(0)
+    return list(pd.read_csv(line, nrows=0).columns)
+
+
+# Function to reject column names a table cannot be created with
+def check_columns(columns):
+    """Raise ValueError when there are no columns, a name holds a double quote or two names differ only in case"""
+    if not len(columns):
+        raise ValueError("The file has no header row")
+    seen = {}
+    for column in map(str, columns):
+        if '"' in column:
+            raise ValueError(f"Column name {column!r} contains a double quote")
+        if column.lower() in seen:
+            raise ValueError(f"Column names {seen[column.lower()]!r} and {column!r} differ only in case, "
+                             f"which SQLite treats as the same column")
+        seen[column.lower()] = column
+
+
+# Function to sample a CSV without parsing all of it
+def sample_csv(source, head_rows=SAMPLE_HEAD_ROWS, sample_rows=SAMPLE_RANDOM_ROWS, encoding="utf-8-sig", seed=0):
+    """Return a DataFrame of raw string values: the first rows plus a random sample of the rest.
+
+    Seekable binary sources are sampled at random byte offsets, so the cost depends
+    on the sample size only; other sources fall back to a reservoir sample.
+    """
+    rng = random.Random(seed)
+    raw = source if hasattr(source, "read") else open(source, "rb")
+    try:
+        if raw.seekable():
+            raw.seek(0)
+        reader = csv.reader(_decoded_lines(raw, encoding))
+        header = next(reader, [])
+        columns = _csv_columns(header) if header else []
+        check_columns(columns)
+        rows = [row for _, row in zip(range(head_rows), reader) if len(row) == len(header)]
+
+        if sample_rows and raw.seekable():
+            head_end = raw.tell()
+            size = raw.seek(0, io.SEEK_END)
+            if size > head_end:
+                rows += _random_rows(raw, head_end, size, sample_rows, len(header), rng, encoding)
+        elif sample_rows:
+            rows += _reservoir_rows(reader, sample_rows, len(header), rng)
+    finally:
+        if raw is not source:
+            raw.close()
+        elif raw.seekable():
+            raw.seek(0)
+    return pd.DataFrame(rows, columns=columns, dtype="string")
+
+
+def _parse_dates(values, fmt):
+    # Values with a UTC offset are converted to UTC, whether a chunk has one offset or several;
+    # values without one are taken as they are
+    return pd.to_datetime(values, format=fmt, errors="coerce", utc=True)
+
+
+def _captured_numbers(values, pattern):
+    """Array of the numbers pattern's groups capture, one row per value (all of which match it).
+
+    Groups an optional part skipped are NaN. The capture runs in Arrow, once per distinct value.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    groups = iter(range(pattern.count("(")))
+    named = re.sub(r"\((?!\?)", lambda _: f"(?P<g{next(groups)}>", pattern)
+    array = pa.array(values, type=pa.string())
+    # Arrow-backed Series convert to a chunked array, others to a plain one
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    encoded = pc.dictionary_encode(array)
+    captured = pc.extract_regex(encoded.dictionary, f"^{named}$")
+    fields = [pc.cast(pc.if_else(pc.equal(field, ""), None, field), pa.float64()).to_numpy(zero_copy_only=False)
+              for field in captured.flatten()]
+    return np.column_stack(fields)[encoded.indices.to_numpy(zero_copy_only=False)]
+
+
+def _fits_format(fields, fmt):
+    """Which rows of `fields` (numbers captured by a date pattern) are a real date or time in fmt.
+
+    Mirrors what pd.to_datetime accepts for the shapes in DATE_PATTERNS and
+    DATETIME_PATTERNS, limited to the years normalize_chunk can write back out.
+    """
+    names = ISO8601_FIELDS if fmt == "ISO8601" else re.findall(r"%(\w)", fmt)
+    number = {name: fields[:, index] for index, name in enumerate(names)}
+    year, month, day = number["Y"], number["m"], number["d"]
+    fits = (year >= MIN_YEAR) & (year <= MAX_YEAR) & (month >= 1) & (month <= 12)
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days = MONTH_DAYS[np.clip(month, 1, 12).astype(int) - 1] + ((month == 2) & leap)
+    fits &= (day >= 1) & (day <= days)
+    for name, limit in FIELD_LIMITS.items():
+        if name in number:
+            # Optional groups that did not match are NaN, which is fine
+            fits &= ~(number[name] > limit)
+    return fits
+
+
+def _infer_dates(columns, values, column_ids, null, non_null, candidates, required, results):
+    # Only values of date-looking columns are checked, and each format is parsed once for all of them
+    rows = np.isin(column_ids, candidates) & ~null
+    subset = values[rows]
+    subset_ids = column_ids[rows]
+    best = {index: 0.0 for index in candidates}
+    pending = set(candidates)
+
+    for sql_type, patterns in (("DATE", DATE_PATTERNS), ("DATETIME", DATETIME_PATTERNS)):
+        for pattern, formats in patterns:
+            if not pending:
+                break
+            shaped = subset.str.fullmatch(pattern).fillna(False).to_numpy(dtype=bool)
+            shape = np.bincount(subset_ids[shaped], minlength=len(columns)) / np.maximum(non_null, 1)
+            matching = [index for index in pending if shape[index] >= required]
+            if not matching:
+                continue
+            # The numbers are captured once per shape; every format of it is then checked on all columns at once
+            selected = shaped & np.isin(subset_ids, matching)
+            fields = _captured_numbers(subset[selected], pattern)
+            for fmt in formats:
+                matching = [index for index in pending if shape[index] >= required]
+                if not matching:
+                    break
+                parsed = _fits_format(fields, fmt)
+                share = np.bincount(subset_ids[selected][parsed], minlength=len(columns)) / np.maximum(non_null, 1)
+                for index in matching:
+                    best[index] = max(best[index], float(share[index]))
+                    if share[index] >= required:
+                        results[columns[index]].update(type=sql_type, confidence=float(share[index]), format=fmt)
+                        pending.discard(index)
+
+    for index in pending:
+        result = results[columns[index]]
+        result["confidence"] = 1.0 - best[index]
+
+
+# Function to infer types for every column of a sampled DataFrame
+def infer_column_types(sample, tolerance=TYPE_TOLERANCE):
+    """Return {column: {"type", "confidence", "nulls", "format"}} for a sample of raw values.
+
+    Every check runs once over all columns flattened into a single array, and the
+    per-column shares come from np.bincount, so wide files cost a handful of passes.
+    """
+    n_rows, n_cols = sample.shape
+    # Columns are joined end to end as Arrow strings, without a round trip through Python objects
+    columns = [sample.iloc[:, index] for index in range(n_cols)] or [pd.Series([], dtype="string")]
+    values = pd.concat(columns, ignore_index=True).astype("string").str.strip()
+    lowered = values.str.lower()
+    column_ids = np.repeat(np.arange(n_cols), n_rows)
+    null = (values.isna() | lowered.isin(NULL_TOKENS)).to_numpy(dtype=bool)
+    non_null = np.bincount(column_ids[~null], minlength=n_cols)
+
+    def shares(mask):
+        hits = mask.fillna(False).to_numpy(dtype=bool) & ~null
+        return np.bincount(column_ids[hits], minlength=n_cols) / np.maximum(non_null, 1)
+
+    bool_share = shares(lowered.isin(TRUE_TOKENS | FALSE_TOKENS))
+    int_share = shares(values.str.fullmatch(INTEGER_PATTERN))
+    real_share = shares(values.str.fullmatch(REAL_PATTERN))
+    date_like = shares(values.str.contains(DATE_LIKE))
+
+    required = 1.0 - tolerance
+    results = {}
+    date_columns = []
+    for index, column in enumerate(sample.columns):
+        nulls = 1.0 - non_null[index] / n_rows if n_rows else 0.0
+        result = {"type": "TEXT", "confidence": 0.0, "nulls": float(nulls), "format": None}
+        results[column] = result
+        if not non_null[index]:
+            continue
+        if bool_share[index] >= required:
+            result.update(type="BOOLEAN", confidence=float(bool_share[index]))
+            continue
+        if int_share[index] >= required:
+            result.update(type="INTEGER", confidence=float(int_share[index]))
+            continue
+        if real_share[index] >= required:
+            result.update(type="REAL", confidence=float(real_share[index]))
+            continue
+
+        if date_like[index] >= required:
+            date_columns.append(index)
+            continue
+
+        # TEXT always fits; confidence reflects how far the best typed candidate fell short
+        result["confidence"] = float(1.0 - max(bool_share[index], int_share[index], real_share[index]))
+
+    if date_columns:
+        _infer_dates(sample.columns, values, column_ids, null, non_null, date_columns, required, results)
+    return results
+
+
+# Function to infer the SQLite type of a single column
+def infer_series_type(series, tolerance=TYPE_TOLERANCE):
+    return infer_column_types(series.to_frame(name="value"), tolerance)["value"]
+
+
+# Function to rewrite one import chunk so BOOLEAN/DATE/DATETIME columns store canonical values
+def normalize_chunk(chunk, col_types, formats=None):
+    """Booleans become 1/0 and dates become ISO-8601 text (in UTC when they carry an offset); unparseable cells are kept as-is"""
+    formats = formats or {}
+    chunk = chunk.copy()
+    for column, sql_type in col_types.items():
+        if column not in chunk.columns:
+            continue
+        values = chunk[column]
+        if sql_type == "BOOLEAN":
+            lowered = values.astype("string").str.strip().str.lower()
+            converted = values.astype(object)
+            converted[lowered.isin(TRUE_TOKENS | {"1"}).fillna(False).to_numpy()] = 1
+            converted[lowered.isin(FALSE_TOKENS | {"0"}).fillna(False).to_numpy()] = 0
+            chunk[column] = converted
+        elif sql_type in ("DATE", "DATETIME"):
+            fmt = formats.get(column) or "ISO8601"
+            parsed = _parse_dates(values, fmt)
+            # The conversion to UTC can also move a value just past the years strftime handles
+            parsed = parsed.where(parsed.dt.year.between(MIN_YEAR, MAX_YEAR))
+            output = "%Y-%m-%d" if sql_type == "DATE" else "%Y-%m-%d %H:%M:%S"
+            chunk[column] = parsed.dt.strftime(output).astype(object).where(parsed.notna(), values)
+    return chunk
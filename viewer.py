@@ -2,73 +2,298 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import io
+import os
+from collections import OrderedDict
+from db import DB_PATH, read_connection, data_version
+from schema_catalog import get_catalog
+from export_ui import render_export
+from schema_editor import drop_table
 
-# Database path constant
-DB_PATH = "dynamic.db"
+# Rows per page offered in the viewer
+PAGE_SIZES = [50, 100, 500, 1000, 5000]
+DEFAULT_PAGE_SIZE = int(os.getenv("T2SQL_VIEWER_PAGE_SIZE", "100"))
+
+# Pages kept in each browser session's cache
+PAGE_CACHE_SIZE = 16
+
+# Filtered row counts stop here and are shown as "N+"
+COUNT_CAP = 10000
+
+# Filter operators and the SQL each one pushes down (values are always bound parameters)
+FILTER_OPERATORS = {
+    "=": "= ?",
+    "≠": "!= ?",
+    "<": "< ?",
+    "≤": "<= ?",
+    ">": "> ?",
+    "≥": ">= ?",
+    "contains": "LIKE ? ESCAPE '\\'",
+    "starts with": "LIKE ? ESCAPE '\\'",
+    "is empty": "IS NULL",
+    "is not empty": "IS NOT NULL",
+}
 
 # Function to fetch available tables
 def get_tables():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    # No special quoting needed for this system table query
-    cur.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = [table[0] for table in cur.fetchall()]
-    conn.close()
-    return tables
-
-# Function to fetch data from a selected table
-def fetch_records(table_name):
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        # Use double quotes for table name to preserve case
-        df = pd.read_sql(f'SELECT * FROM "{table_name}"', conn)
-        conn.close()
-        return df
-    except Exception as e:
-        st.error(f"❌ Could not fetch records: {e}")
-        return pd.DataFrame()
+    return get_catalog(DB_PATH).tables()
+
+# Function to find the columns that identify a row, in order, for keyset pagination
+def keyset_columns(table_name, db_path=DB_PATH):
+    names = {col["name"].lower() for col in get_catalog(db_path).columns(table_name)}
+    with read_connection(db_path) as conn:
+        for alias in ("rowid", "_rowid_", "oid"):
+            if alias in names:
+                continue
+            try:
+                conn.execute(f'SELECT {alias} FROM "{table_name}" LIMIT 0')
+                return [alias]
+            except sqlite3.OperationalError:
+                # WITHOUT ROWID table
+                break
+    primary_key = sorted((col for col in get_catalog(db_path).columns(table_name) if col["pk"]), key=lambda col: col["pk"])
+    return [f'"{col["name"]}"' for col in primary_key]
+
+def _like_pattern(value, prefix_only):
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"{escaped}%" if prefix_only else f"%{escaped}%"
+
+# Function to turn (column, operator, value) filters into a WHERE fragment and its parameters
+def build_filter_sql(filters):
+    clauses = []
+    params = []
+    for column, operator, value in filters:
+        clauses.append(f'"{column}" {FILTER_OPERATORS[operator]}')
+        if operator in ("contains", "starts with"):
+            params.append(_like_pattern(str(value), operator == "starts with"))
+        elif "?" in FILTER_OPERATORS[operator]:
+            params.append(value)
+    return clauses, params
+
+def _keyset_condition(keys, sort_column, descending, cursor):
+    # Rows strictly after the cursor in (sort column, key) order; NULL sort values come last
+    op = "<" if descending else ">"
+    key_list = ", ".join(keys)
+    key_marks = ", ".join("?" for _ in keys)
+    last_sort, last_keys = cursor
+    if sort_column is None:
+        return f"({key_list}) {op} ({key_marks})", list(last_keys)
+    column = f'"{sort_column}"'
+    if last_sort is None:
+        return f"({column} IS NULL AND ({key_list}) {op} ({key_marks}))", list(last_keys)
+    return (
+        f"({column} IS NULL OR {column} {op} ? OR ({column} = ? AND ({key_list}) {op} ({key_marks})))",
+        [last_sort, last_sort, *last_keys],
+    )
+
+# Function to fetch one page of a table with filters and sorting done in SQL
+def fetch_page(table_name, page_size=DEFAULT_PAGE_SIZE, filters=(), sort_column=None, descending=False, cursor=None, db_path=DB_PATH):
+    """Return (DataFrame, next_cursor); next_cursor is None on the last page.
+
+    Pages are read with keyset pagination on the rowid (or the primary key of a
+    WITHOUT ROWID table), so every page costs the same no matter how deep it is.
+    """
+    keys = keyset_columns(table_name, db_path)
+    if not keys:
+        raise ValueError(f"Table '{table_name}' has neither a rowid nor a primary key")
+    key_aliases = [f"__key{index}" for index in range(len(keys))]
+
+    clauses, params = build_filter_sql(filters)
+    if cursor is not None:
+        condition, cursor_params = _keyset_condition(keys, sort_column, descending, cursor)
+        clauses.append(condition)
+        params += cursor_params
+
+    direction = " DESC" if descending else ""
+    order_by = [f"{key}{direction}" for key in keys]
+    if sort_column is not None:
+        order_by = [f'("{sort_column}" IS NULL)', f'"{sort_column}"{direction}'] + order_by
+
+    selected = ", ".join(f"{key} AS {alias}" for key, alias in zip(keys, key_aliases))
+    sql = f'SELECT {selected}, * FROM "{table_name}"'
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY " + ", ".join(order_by) + " LIMIT ?"
+
+    with read_connection(db_path) as conn:
+        result = conn.execute(sql, params + [page_size + 1])
+        columns = [description[0] for description in result.description]
+        rows = result.fetchall()
+
+    # One extra row tells us whether there is a next page
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    df = pd.DataFrame(rows, columns=columns)
+
+    next_cursor = None
+    if has_next:
+        # Cursor values come from the raw row so they bind back with their SQLite types
+        last = rows[-1]
+        last_sort = last[columns.index(sort_column, len(keys))] if sort_column is not None else None
+        next_cursor = (last_sort, tuple(last[:len(keys)]))
+    df = df.iloc[:, len(keys):]
+    return df, next_cursor
+
+# Function to build the full (unpaginated) query behind the current view, for export
+def view_query(table_name, filters=(), sort_column=None, descending=False):
+    clauses, params = build_filter_sql(filters)
+    sql = f'SELECT * FROM "{table_name}"'
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if sort_column is not None:
+        sql += f' ORDER BY ("{sort_column}" IS NULL), "{sort_column}"' + (" DESC" if descending else "")
+    return sql, params
+
+# Function to estimate how many rows match without scanning the whole table
+def approximate_row_count(table_name, filters=(), db_path=DB_PATH):
+    """Return (count, exact); filtered counts are capped at COUNT_CAP."""
+    with read_connection(db_path) as conn:
+        if not filters:
+            # Maintained statistics (or their ANALYZE estimate), then the rowid range, both O(1)
+            stats = get_catalog(db_path).table_stats(table_name)
+            if stats["rows"] is not None:
+                return stats["rows"], stats["exact"]
+            keys = keyset_columns(table_name, db_path)
+            if len(keys) == 1 and keys[0] in ("rowid", "_rowid_", "oid"):
+                low, high = conn.execute(f'SELECT min({keys[0]}), max({keys[0]}) FROM "{table_name}"').fetchone()
+                return (high - low + 1 if high is not None else 0), False
+
+        clauses, params = build_filter_sql(filters)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        count = conn.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 FROM "{table_name}"{where} LIMIT ?)', params + [COUNT_CAP + 1]
+        ).fetchone()[0]
+    return min(count, COUNT_CAP), count <= COUNT_CAP
+
+def _page_cache():
+    if "viewer_page_cache" not in st.session_state:
+        st.session_state["viewer_page_cache"] = OrderedDict()
+    return st.session_state["viewer_page_cache"]
+
+# Function to fetch a page through the per-session cache
+def cached_page(table_name, page_size, filters, sort_column, descending, cursor):
+    # The catalog version and data_version (moved by any commit, from any process) make stale pages unreachable
+    key = (table_name, page_size, tuple(filters), sort_column, descending, cursor,
+           get_catalog(DB_PATH).version, data_version(DB_PATH))
+    cache = _page_cache()
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    page = fetch_page(table_name, page_size, filters, sort_column, descending, cursor)
+    cache[key] = page
+    while len(cache) > PAGE_CACHE_SIZE:
+        cache.popitem(last=False)
+    return page
 
 # Function to delete a table
 def delete_table(table_name):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
     try:
-        # Use double quotes for table name to preserve case
-        cur.execute(f'DROP TABLE "{table_name}";')
-        conn.commit()
-        conn.close()
+        drop_table(table_name, DB_PATH)
         return True
     except sqlite3.Error as e:
         st.error(f"Failed to delete table: {e}")
-        conn.close()
         return False
 
 # Function to fetch table schema
 def get_table_schema(table_name):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
     try:
-        # Use double quotes for table name to preserve case
-        cur.execute(f'PRAGMA table_info("{table_name}");')
-        schema = cur.fetchall()
-        conn.close()
+        schema = [
+            (col["cid"], col["name"], col["type"], col["notnull"], col["default"], col["pk"])
+            for col in get_catalog(DB_PATH).columns(table_name)
+        ]
         return pd.DataFrame(schema, columns=["cid", "name", "type", "notnull", "default_value", "pk"])
     except Exception as e:
         st.error(f"❌ Could not fetch schema: {e}")
-        conn.close()
         return pd.DataFrame()
 
 # Function to check if a table exists
 def table_exists(table_name):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    # Query sqlite_master to check if table exists (case sensitive)
-    cur.execute('SELECT name FROM sqlite_master WHERE type="table" AND name=?', (table_name,))
-    result = cur.fetchone()
-    
-    conn.close()
-    return result is not None
+    # Case sensitive lookup in the schema catalog
+    return get_catalog(DB_PATH).table_exists(table_name)
+
+# Function to render the filter and sort controls; returns (filters, sort_column, descending, page_size)
+def query_controls(table_name, columns):
+    with st.expander("🔎 Filter & Sort", expanded=False):
+        filter_columns = st.multiselect("Filter columns", columns, key=f"filters_{table_name}")
+        filters = []
+        for column in filter_columns:
+            col1, col2 = st.columns([1, 2])
+            with col1:
+                operator = st.selectbox(f"'{column}'", list(FILTER_OPERATORS), key=f"op_{table_name}_{column}")
+            with col2:
+                if "?" in FILTER_OPERATORS[operator]:
+                    value = st.text_input("Value", key=f"value_{table_name}_{column}", label_visibility="hidden")
+                    if value == "":
+                        continue
+                else:
+                    value = None
+            filters.append((column, operator, value))
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sort_choice = st.selectbox("Sort by", ["(table order)"] + columns, key=f"sort_{table_name}")
+        with col2:
+            descending = st.checkbox("Descending", key=f"desc_{table_name}")
+        with col3:
+            page_size = st.selectbox(
+                "Rows per page", PAGE_SIZES,
+                index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE) if DEFAULT_PAGE_SIZE in PAGE_SIZES else 1,
+                key=f"page_size_{table_name}"
+            )
+    sort_column = None if sort_choice == "(table order)" else sort_choice
+    return filters, sort_column, descending, page_size
+
+# Function to render the current page and the navigation buttons
+def show_records(table_name):
+    columns = [col["name"] for col in get_catalog(DB_PATH).columns(table_name)]
+    filters, sort_column, descending, page_size = query_controls(table_name, columns)
+
+    # Page start cursors for the current query; a new table, filter or sort starts over at page 1
+    query = (table_name, tuple(filters), sort_column, descending, page_size)
+    nav = st.session_state.get("viewer_nav")
+    if nav is None or nav["query"] != query:
+        nav = {"query": query, "starts": [None]}
+        st.session_state["viewer_nav"] = nav
+
+    try:
+        df, next_cursor = cached_page(table_name, page_size, filters, sort_column, descending, nav["starts"][-1])
+        count, exact = approximate_row_count(table_name, filters)
+    except (sqlite3.Error, ValueError) as e:
+        st.error(f"❌ Could not fetch records: {e}")
+        return
+
+    page_number = len(nav["starts"])
+    if exact:
+        total = f"{count:,} rows"
+    elif filters:
+        total = f"{count:,}+ rows"
+    else:
+        total = f"~{count:,} rows"
+    first_row = (page_number - 1) * page_size + 1
+    st.caption(f"{total} · page {page_number} (rows {first_row:,}–{first_row + len(df) - 1:,})" if len(df) else total)
+
+    if df.empty:
+        st.warning("⚠️ No records found in this table.")
+    else:
+        st.dataframe(df)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("⏮ First", disabled=page_number == 1):
+            nav["starts"] = [None]
+            st.rerun()
+    with col2:
+        if st.button("◀ Previous", disabled=page_number == 1):
+            nav["starts"].pop()
+            st.rerun()
+    with col3:
+        if st.button("Next ▶", disabled=next_cursor is None):
+            nav["starts"].append(next_cursor)
+            st.rerun()
+
+    # Exports stream every matching row from the database, not just the loaded page
+    with st.expander("📥 Export"):
+        sql, params = view_query(table_name, filters, sort_column, descending)
+        render_export(sql, table_name, params, total_rows=count, key=f"viewer_export_{table_name}")
 
 # Main app function
 def run_table_viewer():
@@ -84,24 +309,9 @@ def run_table_viewer():
         if not table_exists(table_name):
             st.warning(f"⚠️ Table '{table_name}' does not exist or cannot be accessed.")
             return
-            
-        data = None  # Initialize in outer scope
-
-        if st.button("🔍 Load Data"):
-            data = fetch_records(table_name)
-            if not data.empty:
-                st.dataframe(data)
-                
-                # Add export options
-                csv = data.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Download as CSV",
-                    data=csv,
-                    file_name=f"{table_name}.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.warning("⚠️ No records found in this table.")
+
+        # Pages are read on demand, so the records can be shown right away
+        show_records(table_name)
 
         # Schema viewer
         with st.expander("🧬 View Table Schema"):